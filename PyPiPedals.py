@@ -1,37 +1,131 @@
-import sounddevice as sd
 import time
-from config import SAMPLE_RATE, BUFFER_SIZE, INPUT_DEVICE, OUTPUT_DEVICE
-from effects import Clean, EffectChain, Echo, Gain, WahWah, Reverb, Tremolo, Looper
+import numpy as np
+from config import SAMPLE_RATE, BUFFER_SIZE, CHANNELS, INPUT_DEVICE, OUTPUT_DEVICE, INSTRUMENTATION, STATS_CAPACITY, ALLOCATION_DEBUG, ALLOCATION_DEBUG_THRESHOLD
+from config import ENGINE_PROCESS, ENGINE_RT_PRIORITY, ENGINE_CPU, ENGINE_RING_BLOCKS, ENGINE_PREFILL_BLOCKS, AUDIO_BACKEND
+from config import LATENCY_FILE, LOOPER_LATENCY_COMPENSATION
+from config import PRESETS, PRESET_FILE, PEDALS, LIST_DEVICES
+from config import RECORDER_DIR, RECORDER_HEADROOM_SECONDS, RECORDER_SAMPLE_FORMAT, RECORDER_AUTOSTART
+from effects import EffectChain, Looper, PresetBank, LazyEffect
+from effects.presets import load_presets
+from effects.registry import effect_names, setup_executor
+from engine import CallbackStats, AllocationMonitor, EngineProcess, RemoteChain, RemoteLooper, RemotePresets
+from engine import SessionRecorder
+from engine.backends import open_stream, query_devices
+from engine.latency import device_key, load_latency, format_report
 from cli import Menu
 
 class PyPiPedals:
     def __init__(self):
         self.running = True
-        print(sd.query_devices())
-
-        self.effects = [Clean(SAMPLE_RATE), 
-            Echo(SAMPLE_RATE), 
-            Gain(SAMPLE_RATE),
-            WahWah(SAMPLE_RATE),
-            Reverb(SAMPLE_RATE),
-            Tremolo(SAMPLE_RATE)
-        ]
-        
-        self.effect_chain = EffectChain(SAMPLE_RATE)
-        for effect in self.effects:
-            self.effect_chain.add_effect(effect, active=False)
+        if LIST_DEVICES:
+            print(query_devices(AUDIO_BACKEND))
+
+        # Pedal lineup, in menu order, by registered name (plugins included)
+        pedals = PEDALS or effect_names()
+
+        # Whole chains with their own effects, warmed up ahead of use, switched with a crossfade
+        presets = load_presets(PRESET_FILE) if PRESET_FILE else PRESETS
+
+        # Optional engine process: effects run there, the callback only moves audio
+        self.engine = None
+        if ENGINE_PROCESS:
+            self.engine = EngineProcess(pedals, SAMPLE_RATE, BUFFER_SIZE,
+                                        ENGINE_RING_BLOCKS, ENGINE_PREFILL_BLOCKS,
+                                        ENGINE_RT_PRIORITY, ENGINE_CPU, channels=CHANNELS, presets=presets)
+            print(f"Engine process: {self.engine.start()}")
+            self.effect_chain = RemoteChain(self.engine, len(pedals))
+            self.effects = self.effect_chain.effects
+            self.looper = RemoteLooper(self.engine)
+            self.presets = RemotePresets(self.engine)
+        else:
+            # Each effect is imported and built on the setup thread when first enabled
+            self.effects = [LazyEffect(name, SAMPLE_RATE, BUFFER_SIZE, CHANNELS) for name in pedals]
+            self.effects[0].load()
+
+            self.effect_chain = EffectChain(SAMPLE_RATE)
+            for effect in self.effects:
+                self.effect_chain.add_effect(effect, active=False)
+
+            self.looper = Looper(SAMPLE_RATE)
+            # Preset chains warm up on the setup thread, after the first effect
+            self.presets = PresetBank(SAMPLE_RATE, presets, BUFFER_SIZE, CHANNELS, warm=False)
+            setup_executor().submit(self.presets.warm_up)
+
+        # Optional callback timing: one stage per effect, then the looper, then the presets
+        self.stats = None
+        if INSTRUMENTATION and self.engine is None:
+            stage_names = [effect.name for effect in self.effects] + [self.looper.name, "Presets"]
+            self.stats = CallbackStats(SAMPLE_RATE, stage_names, STATS_CAPACITY)
+            self.effect_chain.stats = self.stats
+        self.looper_stage = len(self.effects)
+
+        # Round trip stored by `python -m engine.latency` for these devices, for the looper to compensate
+        key = device_key(INPUT_DEVICE, OUTPUT_DEVICE, SAMPLE_RATE, BUFFER_SIZE, AUDIO_BACKEND)
+        latency = load_latency(LATENCY_FILE, key)
+        if latency is None:
+            print(f"No latency measured for {key}: run `python -m engine.latency` over a loopback cable")
+        else:
+            print(format_report(latency, SAMPLE_RATE, BUFFER_SIZE))
+            if LOOPER_LATENCY_COMPENSATION:
+                # The engine's rings add their own delay to the loop's round trip
+                frames = latency['frames'] + (self.engine.latency_frames if self.engine is not None else 0)
+                print(self.looper.set_latency(frames))
+
+        # Effect output before the looper, preallocated so the callback never allocates
+        # Blocks are (frames, channels) all the way through
+        self.effect_out = np.zeros((BUFFER_SIZE, CHANNELS), dtype="float32")
 
-        self.looper = Looper(SAMPLE_RATE)
-        self.menu = Menu(self.effects, self.effect_chain, self.looper, self.stop)
+        # Optional debug check that nothing allocates inside the callback
+        self.allocations = AllocationMonitor(ALLOCATION_DEBUG_THRESHOLD) if ALLOCATION_DEBUG else None
+
+        # Session recording: the callback only queues blocks, a writer thread does the disk I/O
+        self.recorder = SessionRecorder(SAMPLE_RATE, BUFFER_SIZE, CHANNELS, RECORDER_HEADROOM_SECONDS,
+                                        RECORDER_DIR, RECORDER_SAMPLE_FORMAT)
+        if RECORDER_AUTOSTART:
+            print(self.recorder.start())
+
+        self.menu = Menu(self.effects, self.effect_chain, self.looper, self.stop, self.stats, self.allocations,
+                         self.engine, self.presets, self.recorder)
+
+    def _effect_buffer(self, frames):
+        if len(self.effect_out) < frames:
+            self.effect_out = np.zeros((frames, CHANNELS), dtype="float32")
+        return self.effect_out[:frames]
 
     def audio_callback(self, indata, outdata, frames, time_data, status):
-        audio = indata[:, 0]
+        stats = self.stats
+        if stats is not None:
+            return self._instrumented_callback(indata, outdata, frames, status, stats)
+
+        effect_out = self._effect_buffer(frames)
 
         current_effect = self.menu.get_current_effect()
-        out = current_effect.process(audio, frames)
-        # Always process through looper last
-        out = self.looper.process(out, frames)
-        outdata[:] = out.reshape(-1, 1)
+        current_effect.process_into(indata, effect_out, frames)
+        # Always process through looper last, straight into the output buffer
+        self.looper.process_into(effect_out, outdata, frames)
+        self.recorder.record(indata, outdata, frames)
+
+    def engine_callback(self, indata, outdata, frames, time_data, status):
+        """Callback when the effects run in the engine process: just swap blocks"""
+        self.engine.exchange(indata, outdata)
+        self.recorder.record(indata, outdata, frames)
+
+    def _instrumented_callback(self, indata, outdata, frames, status, stats):
+        """audio_callback with every stage timed into the stats ring"""
+        stats.begin()
+        effect_out = self._effect_buffer(frames)
+
+        # One read of the selection, so the effect and its stage always match
+        current_effect, stage = self.menu.selection
+        if current_effect is self.effect_chain:
+            # The chain times each of its own effects
+            current_effect.process_into(indata, effect_out, frames)
+        else:
+            stats.time_stage(stage, current_effect, indata, effect_out, frames)
+        stats.time_stage(self.looper_stage, self.looper, effect_out, outdata, frames)
+        self.recorder.record(indata, outdata, frames)
+
+        stats.end(frames, status)
 
     def stop(self):
         self.running = False
@@ -41,20 +135,28 @@ class PyPiPedals:
 
         self.menu.start_thread()
 
+        callback = self.audio_callback if self.engine is None else self.engine_callback
+        if self.allocations is not None:
+            callback = self.allocations.wrap(callback)
+
+        stream = None
         try:
-            with sd.Stream(
-                samplerate=SAMPLE_RATE,
-                blocksize=BUFFER_SIZE,
-                dtype="float32",
-                channels=1,
-                callback=self.audio_callback,
-                device=(INPUT_DEVICE, OUTPUT_DEVICE),
-                latency="low"
-            ):
+            stream = open_stream(AUDIO_BACKEND, callback, SAMPLE_RATE, BUFFER_SIZE, CHANNELS,
+                                 (INPUT_DEVICE, OUTPUT_DEVICE))
+            # The menu's timing summary (t) includes the stream's deadline misses, where it counts them
+            self.menu.stream = stream
+            with stream:
                 while self.running:
                     time.sleep(0.1)
         except KeyboardInterrupt:
             self.running = False
+        finally:
+            if hasattr(stream, 'format_summary'):
+                print(stream.format_summary())
+            if self.recorder.recording or self.recorder.error is not None:
+                print(self.recorder.stop())
+            if self.engine is not None:
+                self.engine.stop()
         
         print("\nStopped")
 
@@ -0,0 +1,65 @@
+"""
+Batch rendering throughput against the number of worker processes
+
+Writes a set of synthetic stems to a temporary directory, renders them all
+through the full chain with offline.batch at each worker count and reports
+audio-seconds rendered per wall-second, the speedup over the first count and
+the largest worker's peak memory
+
+    python -m benchmarks.bench_batch
+    python -m benchmarks.bench_batch --stems 32 --seconds 20 --workers 1 2 4 8
+"""
+import argparse
+import os
+import tempfile
+from config import SAMPLE_RATE
+from offline.batch import render_batch, format_stats
+from wavfile import WavWriter
+from .signals import guitar_signal
+
+PRESET = [('Echo', {}), ('Gain', {'drive': 8.0}), ('WahWah', {}), ('Reverb', {}), ('Tremolo', {})]
+
+
+def worker_counts():
+    """1, 2, 4, ... up to the CPU count, and the CPU count itself"""
+    cpus = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 < cpus:
+        counts.append(counts[-1] * 2)
+    if cpus > 1:
+        counts.append(cpus)
+    return counts
+
+
+def write_stems(directory, count, seconds):
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"stem_{i:02d}.wav")
+        with WavWriter(path, SAMPLE_RATE) as writer:
+            writer.write(guitar_signal(SAMPLE_RATE, seconds, seed=i))
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare batch render throughput across worker counts")
+    parser.add_argument('--stems', type=int, default=16, help="files in the batch")
+    parser.add_argument('--seconds', type=float, default=10.0, help="length of each file")
+    parser.add_argument('--workers', type=int, nargs='+', default=None, help="worker counts to try")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        stems = os.path.join(directory, 'in')
+        os.mkdir(stems)
+        inputs = write_stems(stems, args.stems, args.seconds)
+        print(f"{args.stems} stems of {args.seconds:g}s, {' > '.join(name for name, _ in PRESET)}, "
+              f"{os.cpu_count()} CPUs")
+        baseline = None
+        for workers in args.workers or worker_counts():
+            stats = render_batch(PRESET, inputs, os.path.join(directory, 'out'), workers)
+            print(format_stats(stats, baseline))
+            baseline = baseline or stats
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Chain benchmark: the compiled plan against every effect run one by one
+
+For chains of N cheap stages (Gain without oversampling, Clean, and both
+mixed), times a block through the chain's compiled plan, where Clean is left
+out and neighbouring Gains are fused into one pass, and through every
+effect's own process_into() in turn, as the chain used to. Also checks the
+two give the same audio, and times a block while a parameter is changing
+(fused stages then run one by one for that block)
+
+    python -m benchmarks.bench_chain
+    python -m benchmarks.bench_chain --lengths 1 2 4 8 16 --frames 64
+"""
+import argparse
+import time
+import numpy as np
+from config import SAMPLE_RATE, CHANNELS
+from effects import EffectChain, Clean, Gain
+from .signals import guitar_signal
+
+
+def gain():
+    effect = Gain(SAMPLE_RATE)
+    # Oversampling filters have memory, so an oversampled Gain isn't pointwise
+    effect.oversample = 1
+    return effect
+
+
+KINDS = {
+    'Gain': lambda n: [gain() for _ in range(n)],
+    'Clean': lambda n: [Clean(SAMPLE_RATE) for _ in range(n)],
+    'Gain+Clean': lambda n: [gain() if i % 2 == 0 else Clean(SAMPLE_RATE) for i in range(n)],
+}
+
+
+def build(effects):
+    chain = EffectChain(SAMPLE_RATE)
+    for effect in effects:
+        chain.add_effect(effect)
+    return chain
+
+
+def one_by_one(chain):
+    """The same chain with every effect a stage of its own, as before compiling"""
+    chain._plan = tuple(enumerate(chain.effects))
+    return chain
+
+
+def time_per_block(chain, block, blocks, change=False):
+    out = np.empty_like(block)
+    frames = len(block)
+    for _ in range(8):
+        chain.process_into(block, out, frames)
+    start = time.perf_counter()
+    for i in range(blocks):
+        if change:
+            chain.effects[0].set_param('drive', 2.0 + i % 2)
+        chain.process_into(block, out, frames)
+    return (time.perf_counter() - start) / blocks
+
+
+def max_difference(kind, n, signal, frames):
+    planned, plain = build(KINDS[kind](n)), one_by_one(build(KINDS[kind](n)))
+    out_planned, out_plain = np.empty_like(signal[:frames]), np.empty_like(signal[:frames])
+    worst = 0.0
+    for i in range(len(signal) // frames):
+        block = signal[i * frames:(i + 1) * frames]
+        planned.process_into(block, out_planned, frames)
+        plain.process_into(block, out_plain, frames)
+        worst = max(worst, float(np.abs(out_planned - out_plain).max()))
+    return worst
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time compiled chain plans against running every effect")
+    parser.add_argument('--lengths', type=int, nargs='+', default=[1, 2, 4, 8], help="effects per chain")
+    parser.add_argument('--frames', type=int, default=128, help="block size")
+    parser.add_argument('--blocks', type=int, default=2000, help="blocks timed per case")
+    args = parser.parse_args(argv)
+
+    signal = np.repeat(guitar_signal(SAMPLE_RATE, 1.0, seed=1)[:, None], CHANNELS, axis=1)
+    block = np.ascontiguousarray(signal[:args.frames])
+    print(f"{args.frames}-frame blocks, {CHANNELS} channel(s), µs per block\n")
+    print(f"{'chain':<12} {'N':>3} {'stages':>7} {'plan':>8} {'one by one':>11} {'speedup':>8} {'changing':>9} {'max diff':>9}")
+    for kind in KINDS:
+        for n in args.lengths:
+            chain = build(KINDS[kind](n))
+            stages = len(chain._plan)
+            planned = time_per_block(chain, block, args.blocks)
+            plain = time_per_block(one_by_one(build(KINDS[kind](n))), block, args.blocks)
+            changing = time_per_block(chain, block, args.blocks // 4, change=kind != 'Clean')
+            difference = max_difference(kind, n, signal, args.frames)
+            print(f"{kind:<12} {n:>3} {stages:>7} {planned * 1e6:>8.1f} {plain * 1e6:>11.1f} "
+                  f"{plain / planned:>7.1f}x {changing * 1e6:>9.1f} {difference:>9.1e}")
+
+
+if __name__ == "__main__":
+    main()
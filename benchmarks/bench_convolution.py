@@ -0,0 +1,79 @@
+"""
+Convolution benchmark: block cost against IR length, and the IR cache
+
+For each IR length and partition (block) size, times every block through
+the Convolution effect and reports mean and p99 time per block and the load,
+time over the block's real-time deadline. The cost grows with the number of
+partitions, IR length / block size, so longer IRs want bigger blocks. Then
+times preparing one IR's partition spectra from the WAV file against loading
+them from the disk cache
+
+    python -m benchmarks.bench_convolution
+    python -m benchmarks.bench_convolution --ir-seconds 0.2 2 --blocks 128 256
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from config import SAMPLE_RATE
+from effects import Convolution
+from effects.ir import synthetic_ir
+from wavfile import WavWriter
+from .bench_effects import time_blocks
+from .signals import guitar_signal
+
+IR_SECONDS = (0.1, 0.5, 2.0, 8.0)
+BLOCK_SIZES = (64, 128, 256, 512)
+
+
+def write_ir(directory, seconds):
+    path = os.path.join(directory, f"ir_{seconds:g}s.wav")
+    with WavWriter(path, SAMPLE_RATE) as writer:
+        writer.write(synthetic_ir(SAMPLE_RATE, seconds=seconds)[:, 0])
+    return path
+
+
+def cache_report(path, block_size, cache_dir):
+    """Seconds to prepare the spectra from the WAV file, then from the cache"""
+    start = time.perf_counter()
+    cold = Convolution(SAMPLE_RATE, path, block_size, cache_dir)
+    cold_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    warm = Convolution(SAMPLE_RATE, path, block_size, cache_dir)
+    warm_seconds = time.perf_counter() - start
+    assert not cold.from_cache and warm.from_cache
+    return cold_seconds, warm_seconds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time partitioned convolution against IR length and block size")
+    parser.add_argument('--seconds', type=float, default=2.0, help="audio processed per case")
+    parser.add_argument('--ir-seconds', type=float, nargs='+', default=list(IR_SECONDS), help="IR lengths")
+    parser.add_argument('--blocks', type=int, nargs='+', default=list(BLOCK_SIZES), help="block sizes")
+    args = parser.parse_args(argv)
+
+    signal = guitar_signal(SAMPLE_RATE, args.seconds)
+    with tempfile.TemporaryDirectory() as directory:
+        cache_dir = os.path.join(directory, 'cache')
+        paths = {seconds: write_ir(directory, seconds) for seconds in args.ir_seconds}
+
+        print(f"{'IR':>6} {'block':>6} {'partitions':>10} {'mean us':>9} {'p99 us':>9} {'load':>6}")
+        for seconds, path in paths.items():
+            for block_size in args.blocks:
+                effect = Convolution(SAMPLE_RATE, path, block_size, cache_dir=None)
+                times = time_blocks(effect, signal, block_size)
+                deadline = block_size / SAMPLE_RATE
+                print(f"{seconds:>5g}s {block_size:>6} {len(effect.spectra):>10} {times.mean() * 1e6:>9.1f} "
+                      f"{np.percentile(times, 99) * 1e6:>9.1f} {times.mean() / deadline:>5.0%}")
+
+        longest = max(paths)
+        print(f"\npartition spectra of the {longest:g}s IR:")
+        for block_size in args.blocks:
+            cold, warm = cache_report(paths[longest], block_size, cache_dir)
+            print(f"  block {block_size:>4}: from the WAV file {cold * 1e3:.1f} ms, "
+                  f"from the cache {warm * 1e3:.1f} ms ({cold / warm:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Dynamics benchmark: gate and compressor cost across their settings, and accuracy
+
+- cost: mean and p99 time per block for the noise gate and the compressor
+  over a spread of thresholds, ratios and attack/release times. It should
+  be the same for all of them
+- envelope: the block-recursive follower against the same two filters run
+  one sample at a time in Python, the way a textbook version would: the
+  largest difference and the time each takes per block
+- static curve: a steady tone in at each level, and what the compressor and
+  gate let out, against what their settings say
+
+    python -m benchmarks.bench_dynamics
+    python -m benchmarks.bench_dynamics --frames 64 --channels 2
+"""
+import argparse
+import itertools
+import math
+import time
+import numpy as np
+from config import SAMPLE_RATE
+from effects import NoiseGate, Compressor
+from effects.dynamics import Envelope
+from .bench_effects import time_blocks
+from .signals import guitar_signal
+
+THRESHOLDS = (-50.0, -20.0)
+RATIOS = (2.0, 20.0)
+TIMES = ((0.1, 20.0), (10.0, 1000.0))   # (attack, release) ms
+LEVELS = (-60.0, -40.0, -24.0, -12.0, 0.0)
+
+
+def configured(cls, threshold, ratio, attack, release):
+    effect = cls(SAMPLE_RATE)
+    effect.threshold_db = threshold
+    if cls is Compressor:
+        effect.ratio = ratio
+    effect.attack_ms = attack
+    effect.release_ms = release
+    return effect
+
+
+def per_sample_envelope(level, attack_ms, release_ms):
+    """The envelope as a per-sample loop: the reference the block version must match"""
+    attack = math.exp(-1000.0 / (attack_ms * SAMPLE_RATE))
+    release = math.exp(-1000.0 / (release_ms * SAMPLE_RATE))
+    fast = slow = 0.0
+    out = np.empty_like(level)
+    for n, value in enumerate(level):
+        fast = (1 - attack) * value + attack * fast
+        slow = (1 - release) * value + release * slow
+        out[n] = max(fast, slow)
+    return out
+
+
+def envelope_report(signal, frames, attack_ms=5.0, release_ms=150.0):
+    level = np.abs(signal[:SAMPLE_RATE // 2, 0])
+    start = time.perf_counter()
+    reference = per_sample_envelope(level, attack_ms, release_ms)
+    loop_seconds = time.perf_counter() - start
+
+    envelope = Envelope(SAMPLE_RATE, attack_ms, release_ms)
+    blocked = np.empty_like(level)
+    start = time.perf_counter()
+    for position in range(0, len(level), frames):
+        envelope.process(level[position:position + frames], blocked[position:position + frames])
+    block_seconds = time.perf_counter() - start
+    blocks = math.ceil(len(level) / frames)
+    return float(np.abs(blocked - reference).max()), loop_seconds / blocks, block_seconds / blocks
+
+
+def steady_level(effect, level_db, frames, seconds=0.5):
+    """Peak level (dB) out of the effect for a steady 200 Hz square wave at level_db, once settled"""
+    t = np.arange(int(SAMPLE_RATE * seconds) // frames * frames) / SAMPLE_RATE
+    tone = (10 ** (level_db / 20) * np.sign(np.sin(2 * np.pi * 200 * t))).astype('float32')
+    out = np.empty_like(tone)
+    for start in range(0, len(tone), frames):
+        effect.process_into(tone[start:start + frames], out[start:start + frames], frames)
+    return 20 * math.log10(max(np.abs(out[len(out) // 2:]).max(), 1e-9))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the noise gate and compressor across their settings")
+    parser.add_argument('--frames', type=int, default=128, help="block size")
+    parser.add_argument('--channels', type=int, default=1, help="channels per block")
+    parser.add_argument('--seconds', type=float, default=2.0, help="audio timed per case")
+    args = parser.parse_args(argv)
+
+    signal = np.repeat(guitar_signal(SAMPLE_RATE, args.seconds)[:, None], args.channels, axis=1)
+    deadline = args.frames / SAMPLE_RATE
+    print(f"{args.frames}-frame blocks at {SAMPLE_RATE} Hz, {args.channels} channel(s), "
+          f"deadline {deadline * 1e6:.0f} us\n")
+    print(f"{'effect':<11} {'threshold':>9} {'ratio':>6} {'attack ms':>10} {'release ms':>11} "
+          f"{'mean us':>8} {'p99 us':>8}")
+    for cls in (NoiseGate, Compressor):
+        ratios = RATIOS if cls is Compressor else (None,)
+        for threshold, ratio, (attack, release) in itertools.product(THRESHOLDS, ratios, TIMES):
+            times = time_blocks(configured(cls, threshold, ratio, attack, release), signal, args.frames)
+            print(f"{cls.__name__:<11} {threshold:>9.0f} {ratio or '-':>6} {attack:>10g} {release:>11g} "
+                  f"{times.mean() * 1e6:>8.1f} {np.percentile(times, 99) * 1e6:>8.1f}")
+
+    error, loop, block = envelope_report(signal, args.frames)
+    print(f"\nenvelope follower per {args.frames}-frame block: per-sample loop {loop * 1e6:.0f} us, "
+          f"block-recursive {block * 1e6:.1f} us, largest difference {error:.1e}")
+
+    compressor = Compressor(SAMPLE_RATE)
+    gate = NoiseGate(SAMPLE_RATE)
+    print(f"\nsteady tone through the compressor (threshold {compressor.threshold_db:g} dB, "
+          f"ratio {compressor.ratio:g}, knee {compressor.knee_db:g} dB, makeup {compressor.makeup_db:g} dB) "
+          f"and the gate (threshold {gate.threshold_db:g} dB, range {gate.range_db:g} dB)")
+    print(f"{'in dB':>6} {'compressor':>11} {'hard knee':>10} {'gate':>7}")
+    for level in LEVELS:
+        over = max(0.0, level - compressor.threshold_db)
+        expected = level - over + over / compressor.ratio + compressor.makeup_db
+        print(f"{level:>6.0f} {steady_level(Compressor(SAMPLE_RATE), level, args.frames):>11.1f} "
+              f"{expected:>10.1f} {steady_level(NoiseGate(SAMPLE_RATE), level, args.frames):>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
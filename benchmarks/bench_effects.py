@@ -0,0 +1,154 @@
+"""
+Real-time-factor benchmark for every effect and some typical chains
+
+For each block size, times every process() call and reports mean, p99 and
+max time per block against the deadline of frames / SAMPLE_RATE. Results
+are also written as JSON so runs from different commits can be compared
+
+    python -m benchmarks.bench_effects
+    python -m benchmarks.bench_effects --output new.json --compare old.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import time
+import numpy as np
+from config import SAMPLE_RATE
+from effects import EffectChain, Looper
+from effects.registry import effect_names, effect_class
+from .signals import guitar_signal
+
+BLOCK_SIZES = (32, 64, 128, 256, 1024)
+
+CHAINS = (
+    ('Echo', 'Reverb'),
+    ('WahWah', 'Tremolo', 'Echo'),
+    ('Gain', 'Echo', 'Reverb'),
+    ('Clean', 'Echo', 'Gain', 'WahWah', 'Reverb', 'Tremolo'),
+)
+
+
+def single_effect_cases():
+    """(label, factory) for every registered effect, and the Looper"""
+    cases = []
+    for name in effect_names():
+        cls = effect_class(name)
+        cases.append((name, lambda cls=cls: cls(SAMPLE_RATE)))
+    cases.append(('Looper (empty)', lambda: Looper(SAMPLE_RATE)))
+    cases.append(('Looper (playing)', playing_looper))
+    return cases
+
+
+def chain_cases():
+    def factory(names):
+        chain = EffectChain(SAMPLE_RATE)
+        for name in names:
+            chain.add_effect(effect_class(name)(SAMPLE_RATE), active=True)
+        return chain
+    return [(' > '.join(names), lambda names=names: factory(names)) for names in CHAINS]
+
+
+def playing_looper():
+    """Looper already holding a 4 second loop and playing it back"""
+    looper = Looper(SAMPLE_RATE)
+    loop = guitar_signal(SAMPLE_RATE, 4.0, seed=1)
+    looper.loop_buffer[:len(loop)] = loop[:, None]
+    looper.loop_length = len(loop)
+    looper.is_playing = True
+    return looper
+
+
+def time_blocks(effect, signal, frames, warmup=8):
+    """Time every block of `signal` (mono or (frames, channels)) through process_into, as the callback runs it"""
+    blocks = len(signal) // frames
+    times = np.empty(blocks)
+    out = np.empty_like(signal[:frames])
+    for i in range(warmup):
+        effect.process_into(signal[i * frames:(i + 1) * frames], out, frames)
+    for i in range(blocks):
+        block = signal[i * frames:(i + 1) * frames]
+        start = time.perf_counter()
+        effect.process_into(block, out, frames)
+        times[i] = time.perf_counter() - start
+    return times
+
+
+def run(seconds, block_sizes):
+    signal = guitar_signal(SAMPLE_RATE, seconds)
+    results = []
+    for label, factory in single_effect_cases() + chain_cases():
+        for frames in block_sizes:
+            times = time_blocks(factory(), signal, frames)
+            deadline = frames / SAMPLE_RATE
+            results.append({
+                'effect': label,
+                'frames': frames,
+                'deadline_us': deadline * 1e6,
+                'mean_us': times.mean() * 1e6,
+                'p99_us': np.percentile(times, 99) * 1e6,
+                'max_us': times.max() * 1e6,
+                'load': times.mean() / deadline,
+                'blocks': len(times),
+            })
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results, previous=None):
+    baseline = {(r['effect'], r['frames']): r for r in previous['results']} if previous else {}
+    header = f"{'effect':<48} {'frames':>6} {'mean us':>9} {'p99 us':>9} {'max us':>9} {'deadline':>9} {'load':>6}"
+    if baseline:
+        header += f" {'vs old':>7}"
+    print(header)
+    for r in results:
+        flag = " !" if r['max_us'] > r['deadline_us'] else ""
+        line = (f"{r['effect']:<48} {r['frames']:>6} {r['mean_us']:>9.1f} {r['p99_us']:>9.1f} "
+                f"{r['max_us']:>9.1f} {r['deadline_us']:>9.1f} {r['load']:>5.0%}")
+        old = baseline.get((r['effect'], r['frames']))
+        if old:
+            line += f" {r['mean_us'] / old['mean_us']:>6.2f}x"
+        print(line + flag)
+    print("\n! = at least one block missed its deadline")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every effect against the real-time deadline")
+    parser.add_argument('--seconds', type=float, default=2.0, help="audio processed per case")
+    parser.add_argument('--frames', type=int, nargs='+', default=list(BLOCK_SIZES), help="block sizes")
+    parser.add_argument('--output', default=None, help="JSON results path (default bench_<commit>.json)")
+    parser.add_argument('--compare', default=None, help="earlier JSON results to compare means against")
+    args = parser.parse_args(argv)
+
+    commit = git_commit()
+    results = run(args.seconds, args.frames)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_report(results, previous)
+
+    output = args.output or f"bench_{commit or 'local'}.json"
+    with open(output, 'w') as f:
+        json.dump({
+            'commit': commit,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'sample_rate': SAMPLE_RATE,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'results': results,
+        }, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
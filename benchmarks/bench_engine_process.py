@@ -0,0 +1,114 @@
+"""
+Engine process check: the effects in their own process behind a simulated stream
+
+Runs the same chain in-process and through EngineProcess, both driven by a
+SimulatedStream in real time, and reports the audio callback's own time
+(all the effects vs. only swapping blocks through the rings), underruns,
+and whether the engine's output matches the in-process output once its
+added latency is taken off. Runs on Linux without any audio hardware;
+on a single-core machine both processes share the CPU, so expect a few
+underruns there unless the engine gets real-time priority
+
+    python -m benchmarks.bench_engine_process
+    python -m benchmarks.bench_engine_process --seconds 10 --priority 70 --cpu 1
+"""
+import argparse
+import time
+import numpy as np
+from config import SAMPLE_RATE, BUFFER_SIZE
+from engine import Engine, EngineProcess, SimulatedStream
+from .signals import guitar_signal
+
+EFFECT_NAMES = ['Clean', 'Echo', 'Gain', 'WahWah', 'Reverb', 'Tremolo']
+ACTIVE = (1, 2, 3, 4)  # Echo, Gain, WahWah, Reverb
+
+
+class TimedCallback:
+    """Wraps a callback and keeps how long each call took"""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.times = []
+
+    def __call__(self, indata, outdata, frames, time_data, status):
+        start = time.perf_counter()
+        self.callback(indata, outdata, frames, time_data, status)
+        self.times.append(time.perf_counter() - start)
+
+
+def run_stream(callback, signal):
+    timed = TimedCallback(callback)
+    with SimulatedStream(SAMPLE_RATE, BUFFER_SIZE, timed, input_signal=signal, loop=False,
+                         record=True) as stream:
+        while stream.active:
+            time.sleep(0.05)
+    return stream.output()[:, 0], np.array(timed.times)
+
+
+def in_process(signal):
+    engine = Engine(EFFECT_NAMES, SAMPLE_RATE, BUFFER_SIZE)
+    engine.warm_up(BUFFER_SIZE)
+    engine.chain_mode = True
+    for index in ACTIVE:
+        engine.effect_chain.toggle_effect(index)
+
+    def callback(indata, outdata, frames, time_data, status):
+        engine.process_into(indata, outdata, frames)
+
+    return run_stream(callback, signal)
+
+
+def engine_process(signal, priority, cpu):
+    engine = EngineProcess(EFFECT_NAMES, SAMPLE_RATE, BUFFER_SIZE, priority=priority, cpu=cpu)
+    realtime = engine.start()
+    try:
+        engine.call('engine', 'select', value=1.0)
+        for index in ACTIVE:
+            engine.call('chain', 'toggle_effect', index=index)
+
+        def callback(indata, outdata, frames, time_data, status):
+            engine.exchange(indata, outdata)
+
+        output, times = run_stream(callback, signal)
+    finally:
+        engine.stop()
+    return output, times, engine, realtime
+
+
+def describe(label, times):
+    deadline = BUFFER_SIZE / SAMPLE_RATE
+    print(f"  {label:<16} mean {times.mean() * 1e6:8.1f} us   p99 {np.percentile(times, 99) * 1e6:8.1f} us"
+          f"   max {times.max() * 1e6:8.1f} us   (deadline {deadline * 1e6:.0f} us)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--priority', type=int, default=None, help="SCHED_FIFO priority for the engine")
+    parser.add_argument('--cpu', type=int, default=None, help="CPU to pin the engine to")
+    args = parser.parse_args()
+
+    signal = guitar_signal(SAMPLE_RATE, args.seconds)
+    reference, reference_times = in_process(signal)
+    output, engine_times, engine, realtime = engine_process(signal, args.priority, args.cpu)
+
+    print(f"Echo > Gain > Wah-Wah > Reverb, {BUFFER_SIZE} frames at {SAMPLE_RATE} Hz, {args.seconds:g} s")
+    print(f"Engine process: {realtime}")
+    print("Audio callback time:")
+    describe("in-process", reference_times)
+    describe("engine process", engine_times)
+    print(f"Engine latency {engine.latency_frames} frames, underruns {engine.underruns}, "
+          f"overruns {engine.overruns}")
+
+    # Every block the engine delivered on time should match the in-process output
+    # exactly; an underrun replaces one block with silence
+    latency = engine.latency_frames
+    blocks = (len(output) - latency) // BUFFER_SIZE
+    shifted = output[latency:latency + blocks * BUFFER_SIZE].reshape(blocks, BUFFER_SIZE)
+    expected = reference[:blocks * BUFFER_SIZE].reshape(blocks, BUFFER_SIZE)
+    differing = int(np.count_nonzero(np.any(shifted != expected, axis=1)))
+    print(f"Blocks differing from the in-process output: {differing} of {blocks}")
+
+
+if __name__ == "__main__":
+    main()
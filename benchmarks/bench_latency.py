@@ -0,0 +1,89 @@
+"""
+Latency benchmark: round-trip measurement through the simulated loopback, and looper compensation
+
+- measure: for each test signal and simulated cable delay, the measured
+  round trip against the configured one, how clearly the signal came back
+  and how long measuring took, with --noise added to the input
+- overdub: a loop played out of the simulated cable and overdubbed as it
+  comes back, the way a player plays along. Reports how far the layer
+  lands from the audio it was played to, without and with compensation
+
+    python -m benchmarks.bench_latency
+    python -m benchmarks.bench_latency --delays 2 5 20 50 --noise 0.3
+"""
+import argparse
+import time
+import numpy as np
+from config import SAMPLE_RATE, BUFFER_SIZE, CHANNELS
+from effects import Looper
+from engine import SimulatedStream
+from engine.latency import SIGNALS, measure_latency, find_delay
+from .signals import guitar_signal
+
+
+def measure(signal, delay, noise, repeats):
+    """Measure one simulated cable; returns (result, seconds taken)"""
+    hiss = np.random.default_rng(0).normal(0.0, noise, SAMPLE_RATE).astype('float32') if noise else None
+
+    def open_stream(callback):
+        return SimulatedStream(SAMPLE_RATE, BUFFER_SIZE, callback, CHANNELS, input_signal=hiss, loopback=delay)
+
+    start = time.perf_counter()
+    result = measure_latency(open_stream, SAMPLE_RATE, signal, repeats)
+    return result, time.perf_counter() - start
+
+
+def overdub_offset(delay, compensate, loop_seconds=1.0):
+    """Frames between where an overdub of the returning loop lands and where it was heard"""
+    looper = Looper(SAMPLE_RATE)
+    loop = guitar_signal(SAMPLE_RATE, loop_seconds, seed=1)
+    looper.loop_buffer[:len(loop)] = loop[:, None]
+    looper.loop_length = len(loop)
+    looper.is_playing = True
+    looper.set_latency(delay if compensate else 0)
+
+    def callback(indata, outdata, frames, time_data, status):
+        looper.process_into(indata, outdata, frames)
+        # Only the loop goes out, so the cable doesn't feed the input back on itself
+        outdata -= indata
+
+    with SimulatedStream(SAMPLE_RATE, BUFFER_SIZE, callback, CHANNELS, loopback=delay):
+        time.sleep(0.2)
+        looper.start_overdub()
+        # Less than once round, so the layer never plays back into itself
+        time.sleep(loop_seconds * 0.8)
+        looper.stop_overdub()
+    layer = looper.layers[-1].buffer[:len(loop), 0]
+    lag, _ = find_delay(loop, np.concatenate((layer, layer)))
+    looper.clear_loop()
+    return lag % len(loop)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check latency measurement and looper compensation on a simulated cable")
+    parser.add_argument('--delays', type=float, nargs='+', default=[3.0, 10.0, 25.0], help="cable delays in ms")
+    parser.add_argument('--noise', type=float, default=0.1, help="RMS of the noise added to the input")
+    parser.add_argument('--repeats', type=int, default=3, help="runs per measurement")
+    args = parser.parse_args(argv)
+    delays = [max(BUFFER_SIZE, int(round(ms * SAMPLE_RATE / 1000))) for ms in args.delays]
+
+    print(f"{BUFFER_SIZE}-frame blocks at {SAMPLE_RATE} Hz, input noise RMS {args.noise:g}\n")
+    print(f"{'signal':<6} {'delay':>6} {'measured':>9} {'error':>6} {'spread':>7} {'clarity':>8} {'time s':>7}")
+    for signal in SIGNALS:
+        for delay in delays:
+            try:
+                result, seconds = measure(signal, delay, args.noise, args.repeats)
+            except RuntimeError as error:
+                print(f"{signal:<6} {delay:>6} {error}")
+                continue
+            print(f"{signal:<6} {delay:>6} {result['frames']:>9} {result['frames'] - delay:>+6} "
+                  f"{result['spread']:>7} {result['clarity']:>8.0f} {seconds:>7.2f}")
+
+    print("\noverdub lands this many frames after the audio it was played to")
+    print(f"{'delay':>6} {'uncompensated':>14} {'compensated':>12}")
+    for delay in delays:
+        print(f"{delay:>6} {overdub_offset(delay, False):>14} {overdub_offset(delay, True):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Looper benchmark: long loops from the memory-mapped storage
+
+- record and play: a loop of --minutes, played at --speed times real time so
+  the pager thread keeps up the way it would live. Reports block time (mean,
+  p99, worst) against the deadline, and the peak resident memory (Linux)
+- save and load: writing the loop to a WAV file and mapping it back, then
+  overdubbing the loaded loop, which copies it into the scratch storage first
+- clear: time to clear the loop; nothing is reallocated, its pages are dropped
+- layers: block time playing a short loop with 0 to --layers overdubs, and
+  while overdubbing one, for float32 and int16 layers. Playback reads the
+  cached mixdown, so it should not grow with the layer count
+
+    python -m benchmarks.bench_looper
+    python -m benchmarks.bench_looper --minutes 10 --speed 16
+    python -m benchmarks.bench_looper --minutes 0 --layers 16
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from config import SAMPLE_RATE, BUFFER_SIZE, LOOPER_MAX_SECONDS, LOOPER_WINDOW_SECONDS
+from effects import Looper
+from .signals import guitar_signal
+
+
+def resident_mb():
+    """This process's resident memory in MB, where /proc has it"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float('nan')
+
+
+def run(looper, signal, out, blocks, frames, speed):
+    """Process `blocks` blocks paced at `speed` x real time; returns (block times, peak MB)"""
+    times = np.empty(blocks)
+    peak = resident_mb()
+    pace = frames / SAMPLE_RATE / speed
+    start = time.perf_counter()
+    for i in range(blocks):
+        position = (i * frames) % (len(signal) - frames)
+        block_start = time.perf_counter()
+        looper.process_into(signal[position:position + frames], out, frames)
+        times[i] = time.perf_counter() - block_start
+        if i % 1024 == 0:
+            peak = max(peak, resident_mb())
+        # Sleep off the rest of this block's share of time
+        delay = start + (i + 1) * pace - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    return times, max(peak, resident_mb())
+
+
+def report(label, times, peak, deadline):
+    print(f"{label:<8} {times.mean() * 1e6:>9.1f} {np.percentile(times, 99) * 1e6:>9.1f} "
+          f"{times.max() * 1e6:>9.1f} {np.percentile(times, 99) / deadline:>7.0%} {peak:>8.1f}")
+
+
+def layer_costs(signal, out, frames, layers, formats=('float32', 'int16'), seconds=10.0):
+    """Mean block time (us) playing with each number of layers, and overdubbing the next, per format"""
+    blocks = int(seconds * SAMPLE_RATE / frames)
+    costs = {}
+    for layer_format in formats:
+        looper = Looper(SAMPLE_RATE)
+        looper.layer_format = layer_format
+        looper.is_recording = True
+        run(looper, signal, out, blocks, frames, float('inf'))
+        looper.stop_recording()
+        for count in range(layers + 1):
+            play, _ = run(looper, signal, out, blocks, frames, float('inf'))
+            looper.start_overdub()
+            dub, _ = run(looper, signal, out, blocks, frames, float('inf'))
+            looper.stop_overdub()
+            costs[layer_format, count] = (play.mean() * 1e6, dub.mean() * 1e6)
+        looper.clear_loop()
+    return costs
+
+
+def long_loop(signal, out, frames, loop_seconds, speed):
+    """Record, play, save, load, overdub and clear one long loop"""
+    deadline = frames / SAMPLE_RATE
+    looper = Looper(SAMPLE_RATE)
+    # Straight to recording, no count-in
+    looper.is_recording = True
+    blocks = int(loop_seconds * SAMPLE_RATE / frames)
+    loop_mb = blocks * frames * 4 / 2 ** 20
+    print(f"{loop_seconds / 60:g} min loop ({loop_mb:.0f} MB), {LOOPER_WINDOW_SECONDS:g} s window, "
+          f"{frames}-frame blocks ({deadline * 1e3:.2f} ms), {speed:g}x real time")
+    print(f"\n{'':<8} {'mean us':>9} {'p99 us':>9} {'worst us':>9} {'p99':>7} {'peak MB':>8}")
+    print(f"{'start':<8} {'':>9} {'':>9} {'':>9} {'':>7} {resident_mb():>8.1f}")
+    report('record', *run(looper, signal, out, blocks, frames, speed), deadline)
+    looper.stop_recording()
+    report('play', *run(looper, signal, out, blocks, frames, speed), deadline)
+
+    path = os.path.join(tempfile.mkdtemp(), 'loop.wav')
+    start = time.perf_counter()
+    looper.save_loop(path)
+    saved = time.perf_counter() - start
+    start = time.perf_counter()
+    looper.load_loop(path)
+    loaded = time.perf_counter() - start
+    print(f"\nsave: {saved * 1e3:.1f} ms, load (mapped): {loaded * 1e3:.2f} ms")
+    looper.toggle_playback()
+    report('loaded', *run(looper, signal, out, blocks, frames, speed), deadline)
+
+    # Overdubbing a loaded loop copies it into the scratch storage first
+    start = time.perf_counter()
+    looper.start_overdub()
+    copied = time.perf_counter() - start
+    print(f"\noverdub start (copy to scratch): {copied * 1e3:.1f} ms")
+    report('overdub', *run(looper, signal, out, blocks, frames, speed), deadline)
+    looper.stop_overdub()
+
+    start = time.perf_counter()
+    looper.clear_loop()
+    cleared = time.perf_counter() - start
+    print(f"\nclear: {cleared * 1e3:.2f} ms, resident after: {resident_mb():.1f} MB")
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the Looper on long, memory-mapped loops")
+    parser.add_argument('--minutes', type=float, default=5.0, help="loop length")
+    parser.add_argument('--speed', type=float, default=8.0, help="times real time to record and play at")
+    parser.add_argument('--frames', type=int, default=BUFFER_SIZE, help="block size")
+    parser.add_argument('--layers', type=int, default=8, help="overdub layers to stack")
+    args = parser.parse_args(argv)
+    frames = args.frames
+    loop_seconds = min(args.minutes * 60, LOOPER_MAX_SECONDS)
+    signal = np.ascontiguousarray(guitar_signal(SAMPLE_RATE, 4.0)[:, None])
+    out = np.zeros((frames, 1), dtype='float32')
+
+    if loop_seconds > 0:
+        long_loop(signal, out, frames, loop_seconds, args.speed)
+
+    costs = layer_costs(signal, out, frames, args.layers)
+    print(f"\n{'layers':>6} {'play us':>9} {'dub us':>9} {'int16 play':>11} {'int16 dub':>10}")
+    for count in range(args.layers + 1):
+        (play, dub), (play16, dub16) = costs['float32', count], costs['int16', count]
+        print(f"{count:>6} {play:>9.1f} {dub:>9.1f} {play16:>11.1f} {dub16:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
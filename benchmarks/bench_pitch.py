@@ -0,0 +1,91 @@
+"""
+Pitch shifter benchmark: block cost against the deadline, latency and accuracy
+
+- cost: for each analysis frame size and hop, times every block of a guitar
+  signal through PitchShifter and reports mean, p99 and max time per block
+  against the deadline, and the latency the frame size adds. The cost
+  lands on the blocks that complete a hop, so p99 and max are the numbers
+  that matter
+- accuracy: a sine through each shift, and the frequency that comes out;
+  and the streaming STFT with nothing changed in between, which should give
+  the input back exactly, latency_frames late
+
+    python -m benchmarks.bench_pitch
+    python -m benchmarks.bench_pitch --frames 64 --sizes 1024:256 2048:512 --channels 2
+"""
+import argparse
+import numpy as np
+from config import SAMPLE_RATE, PITCH_FRAME_SIZE
+from effects import PitchShifter
+from effects.stft import StreamingSTFT
+from .bench_effects import time_blocks
+from .signals import guitar_signal
+
+SIZES = ('512:128', '1024:256', '1024:512', '2048:512')
+SHIFTS = (-12.0, -5.0, 7.0, 12.0)
+
+
+def peak_frequency(signal):
+    spectrum = np.abs(np.fft.rfft(signal * np.hanning(len(signal))))
+    return np.fft.rfftfreq(len(signal), 1 / SAMPLE_RATE)[spectrum.argmax()]
+
+
+def shifted_frequency(semitones, frequency=220.0, seconds=1.0, frames=128):
+    """The main frequency out of the shifter, fully wet, for a steady sine in"""
+    shifter = PitchShifter(SAMPLE_RATE)
+    shifter.semitones = semitones
+    shifter.mix = 1.0
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    sine = (0.5 * np.sin(2 * np.pi * frequency * t)).astype('float32')
+    out = np.empty_like(sine)
+    for start in range(0, len(sine) - frames + 1, frames):
+        shifter.process_into(sine[start:start + frames], out[start:start + frames], frames)
+    # Once it has settled
+    return peak_frequency(out[len(out) // 2:])
+
+
+def reconstruction_error(frame_size, hop, frames, channels):
+    """Largest difference between the input and an untouched STFT's output, lined up by its latency"""
+    stft = StreamingSTFT(frame_size, hop, channels)
+    signal = np.random.default_rng(0).standard_normal((SAMPLE_RATE, channels)).astype('float32')
+    out = np.empty_like(signal)
+    for start in range(0, len(signal), frames):
+        stft.process(signal[start:start + frames], out[start:start + frames], lambda spectrum: None)
+    latency = stft.latency_frames
+    return float(np.abs(out[latency:] - signal[:-latency]).max())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the phase-vocoder pitch shifter against the callback deadline")
+    parser.add_argument('--frames', type=int, default=128, help="block size")
+    parser.add_argument('--sizes', nargs='+', default=list(SIZES), help="analysis frame size:hop pairs")
+    parser.add_argument('--channels', type=int, default=1, help="channels per block")
+    parser.add_argument('--seconds', type=float, default=4.0, help="audio timed per case")
+    args = parser.parse_args(argv)
+
+    signal = np.repeat(guitar_signal(SAMPLE_RATE, args.seconds)[:, None], args.channels, axis=1)
+    deadline = args.frames / SAMPLE_RATE
+    print(f"{args.frames}-frame blocks at {SAMPLE_RATE} Hz, {args.channels} channel(s), "
+          f"deadline {deadline * 1e6:.0f} us\n")
+    print(f"{'frame':>6} {'hop':>5} {'latency ms':>11} {'mean us':>8} {'p99 us':>8} {'max us':>8} "
+          f"{'max load':>9} {'STFT error':>11}")
+    for size in args.sizes:
+        frame_size, hop = (int(value) for value in size.split(':'))
+        shifter = PitchShifter(SAMPLE_RATE, frame_size, hop)
+        times = time_blocks(shifter, signal, args.frames)
+        error = reconstruction_error(frame_size, hop, args.frames, args.channels)
+        flag = " !" if times.max() > deadline else ""
+        print(f"{frame_size:>6} {hop:>5} {shifter.latency_frames / SAMPLE_RATE * 1000:>11.1f} "
+              f"{times.mean() * 1e6:>8.1f} {np.percentile(times, 99) * 1e6:>8.1f} {times.max() * 1e6:>8.1f} "
+              f"{times.max() / deadline:>8.0%} {error:>11.1e}{flag}")
+    print("\n! = at least one block missed its deadline")
+
+    print(f"\n220 Hz sine through each shift, {PITCH_FRAME_SIZE}-sample frames "
+          f"(bins {SAMPLE_RATE / PITCH_FRAME_SIZE:.0f} Hz apart)")
+    print(f"{'semitones':>10} {'expected Hz':>12} {'measured Hz':>12}")
+    for semitones in SHIFTS:
+        print(f"{semitones:>+10.0f} {220.0 * 2 ** (semitones / 12):>12.1f} {shifted_frequency(semitones):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Preset switching benchmark: how long a switch takes and what the crossfade costs
+
+For every pair of presets, switches between them the way the menu does,
+while a guitar plays through the bank block by block, and reports:
+- prepare: time select() spends resetting and warming the new chain (menu
+  thread, not the audio thread)
+- latency: from select() returning to the switch being complete, which is at
+  most one block plus the crossfade
+- steady and fade: mean time per block before the switch and p99 during it,
+  as a share of the block deadline, against PRESET_CROSSFADE_BUDGET.
+  Switches over the budget fade out and in one chain at a time (dip)
+
+    python -m benchmarks.bench_presets
+    python -m benchmarks.bench_presets --frames 64 --crossfade-ms 10
+"""
+import argparse
+import time
+import numpy as np
+from config import SAMPLE_RATE, BUFFER_SIZE, PRESETS, PRESET_FILE, PRESET_CROSSFADE_MS, PRESET_CROSSFADE_BUDGET
+from effects import PresetBank
+from effects.presets import load_presets
+from .signals import guitar_signal
+
+
+def switch(bank, index, signal, out, frames, position, settle_blocks=32):
+    """
+    Play `settle_blocks`, switch to preset `index` and play until the switch is done
+    Returns (prepare s, latency s, steady block times, fade block times, next signal position)
+    """
+    def play():
+        nonlocal position
+        if position + frames > len(signal):
+            position = 0
+        start = time.perf_counter()
+        bank.process_into(signal[position:position + frames], out, frames)
+        position += frames
+        return time.perf_counter() - start
+
+    steady = np.array([play() for _ in range(settle_blocks)])
+    start = time.perf_counter()
+    bank.select(index)
+    selected = time.perf_counter()
+    fade = []
+    while bank.switching():
+        fade.append(play())
+    # Audio time from the request to the end of the fade: blocks played since
+    latency = len(fade) * frames / SAMPLE_RATE
+    return selected - start, latency, steady, np.array(fade), position
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time preset switches and the crossfade's extra CPU")
+    parser.add_argument('--frames', type=int, default=BUFFER_SIZE, help="block size")
+    parser.add_argument('--crossfade-ms', type=float, default=PRESET_CROSSFADE_MS)
+    parser.add_argument('--budget', type=float, default=PRESET_CROSSFADE_BUDGET,
+                        help="share of the block deadline a crossfade block may take")
+    args = parser.parse_args(argv)
+
+    presets = load_presets(PRESET_FILE) if PRESET_FILE else PRESETS
+    bank = PresetBank(SAMPLE_RATE, presets, args.frames, 1, args.crossfade_ms, args.budget)
+    signal = np.ascontiguousarray(guitar_signal(SAMPLE_RATE, 4.0)[:, None])
+    out = np.zeros((args.frames, 1), dtype='float32')
+    deadline = args.frames / SAMPLE_RATE
+
+    print(f"{len(presets)} presets, {args.frames}-frame blocks ({deadline * 1e3:.2f} ms), "
+          f"{args.crossfade_ms:g} ms crossfade, budget {args.budget:.0%} of the deadline\n")
+    print(f"{'switch':<22} {'mode':>5} {'prepare ms':>10} {'latency ms':>10} "
+          f"{'steady':>7} {'fade p99':>8} {'budget':>7}")
+    position = 0
+    worst = 0.0
+    for source in range(len(presets)):
+        for target in range(len(presets)):
+            if source == target:
+                continue
+            if bank.current != source:
+                _, _, _, _, position = switch(bank, source, signal, out, args.frames, position)
+            prepare, latency, steady, fade, position = switch(bank, target, signal, out, args.frames, position)
+            fade_load = np.percentile(fade, 99) / deadline
+            worst = max(worst, fade_load)
+            label = f"{bank.names[source]} -> {bank.names[target]}"
+            print(f"{label:<22} {'dip' if bank.dip else 'cross':>5} {prepare * 1e3:>10.2f} {latency * 1e3:>10.2f} "
+                  f"{steady.mean() / deadline:>7.0%} {fade_load:>8.0%} "
+                  f"{'ok' if fade_load <= args.budget else 'OVER':>7}")
+    print(f"\nworst crossfade block: {worst:.0%} of the deadline (budget {args.budget:.0%})")
+
+
+if __name__ == "__main__":
+    main()
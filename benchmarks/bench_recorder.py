@@ -0,0 +1,94 @@
+"""
+Session recorder benchmark: what recording costs the callback, and what a slow disk costs the recording
+
+Feeds blocks through SessionRecorder.record() in real time, as the audio
+callback would, while the writer thread's disk writes stall for --stall-ms
+every --stall-every seconds (an SD card flushing its cache). For each ring
+headroom it reports the time record() takes per block and how many blocks
+were dropped: none, as long as the headroom covers the longest stall. Each
+headroom is also run once with no stalls, where nothing should ever drop,
+however small the ring
+
+    python -m benchmarks.bench_recorder
+    python -m benchmarks.bench_recorder --stall-ms 1500 --headroom 0.5 1 2
+"""
+import argparse
+import tempfile
+import time
+import numpy as np
+from config import SAMPLE_RATE, BUFFER_SIZE
+from engine import recorder as recorder_module
+from engine import SessionRecorder
+from wavfile import WavWriter
+from .signals import guitar_signal
+
+
+class StallingWriter(WavWriter):
+    """WavWriter whose writes block now and then, like a slow card; one schedule for all files"""
+    stall = 0.0
+    every = 1.0
+    next_stall = 0.0
+
+    def write(self, audio):
+        now = time.monotonic()
+        if self.stall and now >= StallingWriter.next_stall:
+            StallingWriter.next_stall = now + self.every
+            time.sleep(self.stall)
+        super().write(audio)
+
+
+def run(headroom, seconds, frames, directory):
+    """Record `seconds` in real time; returns (record() times, recorder)"""
+    recorder = SessionRecorder(SAMPLE_RATE, frames, 1, headroom, directory)
+    signal = np.ascontiguousarray(guitar_signal(SAMPLE_RATE, 4.0)[:, None])
+    processed = np.ascontiguousarray(signal[::-1])
+    recorder.start()
+    blocks = int(seconds * SAMPLE_RATE / frames)
+    times = np.empty(blocks)
+    start = time.perf_counter()
+    for i in range(blocks):
+        position = (i * frames) % (len(signal) - frames)
+        block_start = time.perf_counter()
+        recorder.record(signal[position:position + frames], processed[position:position + frames], frames)
+        times[i] = time.perf_counter() - block_start
+        delay = start + (i + 1) * frames / SAMPLE_RATE - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    recorder.stop()
+    return times, recorder
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time session recording and count blocks lost to disk stalls")
+    parser.add_argument('--seconds', type=float, default=5.0, help="recording length per headroom")
+    parser.add_argument('--frames', type=int, default=BUFFER_SIZE, help="block size")
+    parser.add_argument('--stall-ms', type=float, default=750.0, help="how long each disk stall lasts")
+    parser.add_argument('--stall-every', type=float, default=2.0, help="seconds between stalls")
+    parser.add_argument('--headroom', type=float, nargs='+', default=[0.1, 0.25, 0.5, 1.0, 2.0],
+                        help="ring sizes to try, in seconds")
+    args = parser.parse_args(argv)
+    deadline = args.frames / SAMPLE_RATE
+
+    StallingWriter.every = args.stall_every
+    recorder_module.WavWriter = StallingWriter
+
+    print(f"{args.frames}-frame blocks ({deadline * 1e3:.2f} ms), disk stalls of {args.stall_ms:g} ms "
+          f"every {args.stall_every:g} s\n")
+    print(f"{'headroom s':>10} {'mean us':>8} {'p99 us':>8} {'worst us':>9} {'dropped':>8} {'written s':>10} "
+          f"{'no stall':>9}")
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for headroom in args.headroom:
+                StallingWriter.stall = 0.0
+                _, steady = run(headroom, args.seconds, args.frames, directory)
+                StallingWriter.stall = args.stall_ms / 1e3
+                times, recorder = run(headroom, args.seconds, args.frames, directory)
+                print(f"{recorder.headroom:>10.2f} {times.mean() * 1e6:>8.1f} {np.percentile(times, 99) * 1e6:>8.1f} "
+                      f"{times.max() * 1e6:>9.1f} {recorder.dropped:>8} {recorder.written / SAMPLE_RATE:>10.2f} "
+                      f"{steady.dropped:>9}")
+    finally:
+        recorder_module.WavWriter = WavWriter
+
+
+if __name__ == "__main__":
+    main()
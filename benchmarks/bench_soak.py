@@ -0,0 +1,83 @@
+"""
+Soak test: the whole app on the simulated backend, driven through its menu
+
+Runs PyPiPedals with AUDIO_BACKEND = 'simulated' for --minutes, as it runs
+live: the callback on the wall-clock schedule, fed --input (silence, 'sine',
+'noise' or a WAV file), and the menu thread taking a random command every
+--interval seconds on average: effect and mode switches, chain toggles,
+presets and every looper operation. At the end it reports the deadline
+misses the simulated stream counted, and exits with status 1 if there were
+more than --max-misses, so a CI job can catch latency regressions
+
+    python -m benchmarks.bench_soak --minutes 1
+    python -m benchmarks.bench_soak --minutes 240 --input noise --max-misses 10
+"""
+import argparse
+import collections
+import contextlib
+import os
+import random
+import sys
+import time
+import config
+
+# Looper commands come up most: they change the most state in the callback
+LOOPER_COMMANDS = ["", "", "", "d", "d", "u", "U", "x"]
+MODE_COMMANDS = ["c", "s", "r", "t"]
+
+
+def command_source(menu, seconds, interval, seed, counts):
+    """A read_command for the menu: random commands for `seconds`, then quit"""
+    rng = random.Random(seed)
+    end = time.monotonic() + seconds
+    effects = [str(i) for i in range(1, len(menu.effects) + 1)]
+    presets = ["P"] if menu.presets is not None else []
+
+    def read_command():
+        time.sleep(rng.expovariate(1.0 / interval))
+        if time.monotonic() >= end:
+            return "q"
+        choice = rng.choice([LOOPER_COMMANDS, MODE_COMMANDS, effects, effects, presets or effects])
+        command = rng.choice(choice)
+        counts[command or "enter"] += 1
+        return command
+
+    return read_command
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soak the app on the simulated backend and count deadline misses")
+    parser.add_argument('--minutes', type=float, default=1.0, help="how long to run")
+    parser.add_argument('--input', default='sine', help="simulated input: none, sine, noise or a WAV file")
+    parser.add_argument('--interval', type=float, default=0.5, help="mean seconds between menu commands")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the command sequence")
+    parser.add_argument('--max-misses', type=int, default=None, help="fail if more deadlines than this are missed")
+    args = parser.parse_args(argv)
+
+    # Before the app's modules read them
+    config.AUDIO_BACKEND = 'simulated'
+    config.SIMULATED_INPUT = None if args.input == 'none' else args.input
+    import PyPiPedals
+
+    counts = collections.Counter()
+    start = time.monotonic()
+    # The menu prints after every command: keep it out of the report
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        app = PyPiPedals.PyPiPedals()
+        app.menu.read_command = command_source(app.menu, args.minutes * 60, args.interval, args.seed, counts)
+        app.run()
+    elapsed = time.monotonic() - start
+
+    stream = app.menu.stream
+    print(f"{elapsed / 60:.1f} min on the simulated backend, input {args.input}, "
+          f"{sum(counts.values())} menu commands")
+    print("  " + ", ".join(f"{command} x{count}" for command, count in sorted(counts.items())))
+    print(stream.format_summary())
+    if args.max_misses is not None and stream.misses > args.max_misses:
+        print(f"FAIL: {stream.misses} deadline misses, at most {args.max_misses} allowed")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
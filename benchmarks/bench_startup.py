@@ -0,0 +1,82 @@
+"""
+Startup benchmark: time from launching PyPiPedals to its first processed block
+
+Starts a fresh interpreter per run (imports are only slow the first time),
+builds the app on the simulated stream and times, from the moment the
+process was launched:
+- imports: the interpreter and every module PyPiPedals imports
+- built: PyPiPedals() constructed, menu and all
+- first block: the first callback has run, the time to first sound
+- all ready: every pedal and preset chain built and warmed up as well
+
+Effects are built when first enabled, on a background setup thread, so the
+first block only waits for the first pedal. --eager builds everything before
+the first block, the way startup used to work, for comparison
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10 --eager
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+
+# Run in the child; time.monotonic() is one clock for every process on the machine
+CHILD = """
+import contextlib, io, json, sys, time
+stamps = {}
+import config
+config.AUDIO_BACKEND = 'simulated'
+import numpy as np
+import PyPiPedals
+stamps['imports'] = time.monotonic()
+with contextlib.redirect_stdout(io.StringIO()):
+    app = PyPiPedals.PyPiPedals()
+stamps['built'] = time.monotonic()
+if EAGER:
+    for effect in app.effects:
+        effect.wait()
+    app.presets.warm_up()
+block = np.zeros((config.BUFFER_SIZE, config.CHANNELS), dtype='float32')
+out = np.zeros_like(block)
+app.audio_callback(block, out, config.BUFFER_SIZE, None, None)
+stamps['first block'] = time.monotonic()
+for effect in app.effects:
+    effect.wait()
+app.presets.warm_up()
+stamps['all ready'] = time.monotonic()
+print(json.dumps(stamps))
+"""
+
+STAGES = ('imports', 'built', 'first block', 'all ready')
+
+
+def run_once(eager):
+    """Seconds from launch to each stage, for one fresh process"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    start = time.monotonic()
+    result = subprocess.run([sys.executable, '-c', CHILD.replace('EAGER', str(eager))],
+                            cwd=root, capture_output=True, text=True, check=True)
+    stamps = json.loads(result.stdout.strip().splitlines()[-1])
+    return {stage: stamps[stage] - start for stage in STAGES}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time from launch to PyPiPedals' first processed block")
+    parser.add_argument('--runs', type=int, default=5, help="fresh processes per mode, median reported")
+    parser.add_argument('--eager', action='store_true', help="also time building everything up front")
+    args = parser.parse_args(argv)
+
+    modes = [('lazy', False)] + ([('eager', True)] if args.eager else [])
+    print(f"{'mode':<6} " + " ".join(f"{stage + ' ms':>14}" for stage in STAGES))
+    for label, eager in modes:
+        runs = [run_once(eager) for _ in range(args.runs)]
+        medians = [np.median([run[stage] for run in runs]) * 1e3 for stage in STAGES]
+        print(f"{label:<6} " + " ".join(f"{median:>14.0f}" for median in medians))
+
+
+if __name__ == "__main__":
+    main()
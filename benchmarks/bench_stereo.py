@@ -0,0 +1,58 @@
+"""
+Stereo cost benchmark: every effect and chain on mono vs. two-channel blocks
+
+Times the same guitar through each effect as (frames, 1) blocks and as
+(frames, 2) blocks (a second, different take on the other channel) and
+reports the stereo / mono ratio. Every effect keeps its per-channel state in
+arrays and runs all channels in one pass, so the ratio should stay well
+under 2x
+
+    python -m benchmarks.bench_stereo
+    python -m benchmarks.bench_stereo --frames 64 256 --seconds 4
+"""
+import argparse
+import numpy as np
+from config import SAMPLE_RATE
+from .bench_effects import single_effect_cases, chain_cases, time_blocks
+from .signals import guitar_signal
+
+BLOCK_SIZES = (64, 128, 256)
+
+
+def cases():
+    # The playing Looper case is filled with a mono loop, which a stereo block would clear
+    return [(label, factory) for label, factory in single_effect_cases() + chain_cases()
+            if label != 'Looper (playing)']
+
+
+def best_mean(factory, signal, frames, repeats):
+    """Lowest mean block time over a few runs, each with a fresh effect"""
+    return min(time_blocks(factory(), signal, frames).mean() for _ in range(repeats))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare each effect's stereo and mono cost")
+    parser.add_argument('--seconds', type=float, default=2.0, help="audio processed per case")
+    parser.add_argument('--frames', type=int, nargs='+', default=list(BLOCK_SIZES), help="block sizes")
+    parser.add_argument('--repeats', type=int, default=3, help="runs per case, best one kept")
+    args = parser.parse_args(argv)
+
+    left = guitar_signal(SAMPLE_RATE, args.seconds)
+    right = guitar_signal(SAMPLE_RATE, args.seconds, seed=1)
+    mono = np.ascontiguousarray(left[:, None])
+    stereo = np.ascontiguousarray(np.stack((left, right), axis=1))
+
+    print(f"{'effect':<48} {'frames':>6} {'mono us':>9} {'stereo us':>10} {'ratio':>6}")
+    ratios = []
+    for label, factory in cases():
+        for frames in args.frames:
+            mono_time = best_mean(factory, mono, frames, args.repeats)
+            stereo_time = best_mean(factory, stereo, frames, args.repeats)
+            ratio = stereo_time / mono_time
+            ratios.append(ratio)
+            print(f"{label:<48} {frames:>6} {mono_time * 1e6:>9.1f} {stereo_time * 1e6:>10.1f} {ratio:>5.2f}x")
+    print(f"\nstereo / mono: median {np.median(ratios):.2f}x, worst {max(ratios):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""Synthetic test signals for benchmarks"""
+import numpy as np
+
+
+def guitar_signal(sample_rate, seconds, seed=0):
+    """
+    Plucked-string-like test signal: a new note every quarter second,
+    each a stack of decaying harmonics with a little noise on the attack
+    """
+    rng = np.random.default_rng(seed)
+    total = int(sample_rate * seconds)
+    out = np.zeros(total)
+    note_length = sample_rate // 4
+    t = np.arange(note_length * 4) / sample_rate
+
+    for start in range(0, total, note_length):
+        f0 = 82.41 * 2 ** (rng.integers(0, 36) / 12)  # low E up three octaves
+        note = np.zeros(len(t))
+        for harmonic in range(1, 9):
+            if f0 * harmonic >= sample_rate / 2:
+                break
+            decay = np.exp(-t * (2.0 + harmonic))
+            note += np.sin(2 * np.pi * f0 * harmonic * t + rng.uniform(0, 2 * np.pi)) * decay / harmonic
+        attack = min(len(t), sample_rate // 100)
+        note[:attack] += 0.2 * rng.standard_normal(attack) * np.linspace(1, 0, attack)
+        end = min(total, start + len(t))
+        out[start:end] += note[:end - start]
+
+    out *= 0.5 / np.abs(out).max()
+    return out.astype('float32')
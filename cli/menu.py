@@ -1,7 +1,8 @@
 import threading
 
 class Menu:
-    def __init__(self, effects, effect_chain, looper, on_quit_callback):
+    def __init__(self, effects, effect_chain, looper, on_quit_callback, stats=None, allocations=None, engine=None,
+                 presets=None, recorder=None):
         self.effects = effects
         self.effect_chain = effect_chain
         self.current_effect_idx = 0
@@ -9,18 +10,118 @@ class Menu:
         self.running = True
         self.on_quit = on_quit_callback
         self.chain_mode = False
+        # What the audio callback runs: (effect or chain, its timing stage), always
+        # replaced as a whole so the callback never sees half of a change
+        self.selection = (effects[0], 0)
+        self.stats = stats
+        self.allocations = allocations
+        # engine.EngineProcess when the effects run in their own process
+        self.engine = engine
+        # effects.PresetBank (or the engine's), played in preset mode
+        self.presets = presets
+        self.preset_mode = False
+        # Timing stage of the presets: after every effect and the looper
+        self.preset_stage = len(effects) + 1
+        # engine.SessionRecorder, toggled with R
+        self.recorder = recorder
+        # The open audio stream, once there is one; a simulated one counts its deadline misses
+        self.stream = None
 
     def get_current_effect (self):
+        return self.selection[0]
+
+    def _sync_selection(self):
+        """Publish the selected effect (or the chain) to the callback, or to the engine process"""
+        if self.preset_mode:
+            # The engine went into preset mode with its preset switch
+            self.selection = (self.presets, self.preset_stage)
+            return
+        effect = self.effect_chain if self.chain_mode else self.effects[self.current_effect_idx]
+        self.selection = (effect, self.current_effect_idx)
+        if self.engine is not None:
+            self.engine.call('engine', 'select', index=self.current_effect_idx, value=float(self.chain_mode))
+
+    def _select_preset(self, choice):
+        """Switch to a preset by number or name; the chain crossfades in from the next block"""
+        names = self.presets.names
+        if choice.isdigit():
+            index = int(choice) - 1
+        elif choice in names:
+            index = names.index(choice)
+        else:
+            print(f"\n unknown preset, choose from: {', '.join(names)}")
+            return
+        try:
+            message = self.presets.select(index)
+        except ValueError as error:
+            print(f"\n {error}")
+            return
+        self.preset_mode = True
+        self.chain_mode = False
+        self._sync_selection()
+        self.display_menu()
+        print(f"\n {message}")
+
+    def _load(self, effect):
+        """Enable an effect; one built in the background says so if that fails"""
+        future = effect.load()
+        if future is not None:
+            future.add_done_callback(lambda _: self._report_failure(effect))
+
+    def _report_failure(self, effect):
+        if getattr(effect, 'error', None) is not None:
+            print(f"\n {effect.name}")
+
+    def _param_command(self, args):
+        """p [n] [name value]: list or set the parameters of the selected effect (effect n in chain mode)"""
+        if self.preset_mode:
+            print("\n presets keep their own settings; switch to single (s) or chain (c) mode to edit parameters")
+            return
         if self.chain_mode:
-            return self.effect_chain
-        return self.effects[self.current_effect_idx]
+            if not args or not args[0].isdigit() or not 1 <= int(args[0]) <= len(self.effects):
+                print("usage: p <effect number> [name value]")
+                return
+            effect = self.effects[int(args[0]) - 1]
+            args = args[1:]
+        else:
+            effect = self.effects[self.current_effect_idx]
+
+        if not args:
+            names = effect.param_names()
+            if getattr(effect, 'error', None) is not None:
+                print(f"\n {effect.name}")
+                return
+            print(f"\n {effect.name} parameters:" if names else f"\n {effect.name} has no parameters")
+            for name in names:
+                print(f"    {name} = {effect.get_param(name)}")
+        elif len(args) == 2:
+            try:
+                value = effect.set_param(args[0], args[1])
+            except (AttributeError, ValueError) as error:
+                print(f"\n {error}")
+                return
+            print(f"\n {effect.name} {args[0]} -> {value}")
+        else:
+            print("usage: p [name value]")
 
     def display_menu(self):
         print("PyPiPedals")
         print("----------")
 
         print(f"\n[LOOPER: {self.looper.get_status()}]")
-        if not self.chain_mode:
+        if self.recorder is not None:
+            print(f"[SESSION: {self.recorder.get_status()}]")
+        if self.preset_mode:
+            print('\n[PRESET MODE]')
+            print('\nPresets:')
+            for i, name in enumerate(self.presets.names, 1):
+                marker = "->" if i-1 == self.presets.selected else " "
+                print(f"    {marker} {i}. {name}")
+            print("\nCommands:")
+            print(" 1-9 : switch preset (crossfades)")
+            print(" c   : switch to chain mode")
+            print(" s   : switch to single effect mode")
+        elif not self.chain_mode:
             print('\n[SINGLE EFFECT MODE]')
             print('\nEffects:')
             for i, effect in enumerate(self.effects, 1):
@@ -28,14 +129,20 @@ class Menu:
                 print(f"    {marker} {i}. {effect.name}")
             print("\nCommands:")
             print(" 1-9 : select effect")
+            print(" p   : show parameters, p <name> <value> to set one")
             print(" c   : switch to chain mode")
+            if self.presets is not None:
+                print(" P   : preset mode (P <n or name> to switch straight to one)")
         else:
             print("\n[Chain mode - Multiple effects]")
             print("\nEffect Chain:")
             print(self.effect_chain.get_status_display())
             print(" 1-9 : Toggle effect on/off")
+            print(" p n : show effect n's parameters, p n <name> <value> to set one")
             print(" s   : Switch to single effect mode")
             print(" r   : Reset All effects")
+            if self.presets is not None:
+                print(" P   : preset mode (P <n or name> to switch straight to one)")
         
 
 
@@ -43,27 +150,55 @@ class Menu:
         print("  L    : Start recording loop")
         print("  l    : Stop recording / Toggle playback")
         print("  x    : Clear loop")
+        print("  d    : Start / stop overdubbing a layer")
+        print("  u, U : Undo / redo the last layer")
+        print("  w <file> : Save loop to a WAV file, o <file> : load one")
+        if self.recorder is not None:
+            print(" R   : start / stop recording the session (dry and processed)")
+        if self._has_timing():
+            print(" t   : show callback timing")
         print(" Q   : quit")
         print("----------")
 
+    def _has_timing(self):
+        return (self.stats is not None or self.allocations is not None or self.engine is not None
+                or hasattr(self.stream, 'format_summary'))
+
+    def read_command(self):
+        """The next command line; None once there's no more input"""
+        try:
+            return input("> ").strip()
+        except EOFError:
+            return None
+
     def run(self):
         self.display_menu()
 
         while self.running:
-            choice = input("> ").strip()
+            choice = self.read_command()
+            if choice is None:
+                # No terminal (a headless run or a CI soak): the audio carries on without the menu
+                print("\n no more input, menu closed; the audio keeps running")
+                break
             
             if choice.isdigit():
                 idx = int(choice) - 1
 
-                if not self.chain_mode:
+                if self.preset_mode:
+                    self._select_preset(choice)
+                elif not self.chain_mode:
                     if 0 <= idx < len(self.effects):
+                        self._load(self.effects[idx])
                         self.current_effect_idx = idx
+                        self._sync_selection()
                         self.display_menu()
                         print(f"\n {self.effects[idx].name} enabled")
                     else:
                         print("Invalid effect number")
                 else:
                     if self.effect_chain.toggle_effect(idx):
+                        if self.effect_chain.is_active(idx):
+                            self._load(self.effect_chain.effects[idx])
                         self.display_menu()
                         status = "ON" if self.effect_chain.is_active(idx) else "OFF"
                         print(f"\n {self.effect_chain.effects[idx].name} toggled {status}")
@@ -71,14 +206,18 @@ class Menu:
                         print("invalid effect number")
             elif choice == "c" and not self.chain_mode:
                 self.chain_mode = True
+                self.preset_mode = False
+                self._sync_selection()
                 self.display_menu()
                 print("\n switched to chain mode")
-            elif choice == "s" and self.chain_mode:
+            elif choice == "s" and (self.chain_mode or self.preset_mode):
                 self.chain_mode = False
+                self.preset_mode = False
+                self._sync_selection()
                 self.display_menu()
                 print("\n Switched to single effect mode")
             elif choice == "r" and self.chain_mode:
-                self.effect_chain.reset()
+                self.effect_chain.request_reset()
                 print("\n all effects reset")
                 # Looper controls
             # Looper controls - SPACEBAR (empty string = just pressing Enter)
@@ -101,6 +240,42 @@ class Menu:
                 msg = self.looper.clear_loop()
                 self.display_menu()
                 print(f"\n♪ {msg}")
+            elif choice == "d":
+                if self.looper.is_overdubbing:
+                    msg = self.looper.stop_overdub()
+                else:
+                    msg = self.looper.start_overdub()
+                print(f"\n♪ {msg}")
+            elif choice in ("u", "U"):
+                msg = self.looper.undo() if choice == "u" else self.looper.redo()
+                print(f"\n♪ {msg}")
+            elif choice == "R" and self.recorder is not None:
+                msg = self.recorder.stop() if self.recorder.recording else self.recorder.start()
+                self.display_menu()
+                print(f"\n● {msg}")
+            elif choice[:2] in ("w ", "o ") and choice[2:].strip():
+                path = choice[2:].strip()
+                if choice[0] == "w":
+                    msg = self.looper.save_loop(path)
+                else:
+                    msg = self.looper.load_loop(path)
+                    self.display_menu()
+                print(f"\n♪ {msg}")
+            elif choice == "t" and self._has_timing():
+                if self.stats is not None:
+                    print(self.stats.format_summary())
+                if self.allocations is not None:
+                    print(self.allocations.format_summary())
+                if self.engine is not None:
+                    print(self.engine.format_summary())
+                if hasattr(self.stream, 'format_summary'):
+                    print(self.stream.format_summary())
+            elif choice.split()[:1] == ["p"]:
+                self._param_command(choice.split()[1:])
+            elif choice.split()[:1] == ["P"] and self.presets is not None:
+                # Bare P goes back to the preset last played
+                args = choice.split()[1:] or [str(self.presets.selected + 1)]
+                self._select_preset(args[0])
             elif choice == "q":
                 print("exiting...")
                 self.running = False
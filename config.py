@@ -1,12 +1,105 @@
 #Audio setup
 SAMPLE_RATE = 48000
 BUFFER_SIZE = 128
+CHANNELS = 1  # 2 for a stereo rig; every effect keeps separate state per channel
 
 INPUT_DEVICE = 1
 OUTPUT_DEVICE = 1
+LIST_DEVICES = False   # Print the sound devices at startup
+
+# Pedal lineup by registered name, in menu order; plugin effects go by their
+# entry point name. None for every registered effect. Each is built when first enabled
+PEDALS = ['Clean', 'Echo', 'Gain', 'WahWah', 'Reverb', 'Tremolo', 'Convolution', 'PitchShifter',
+          'NoiseGate', 'Compressor']
+
+# Callback timing instrumentation (shown with 't' in the menu)
+INSTRUMENTATION = False
+STATS_CAPACITY = 4096
+# Flag memory allocations inside the callback with tracemalloc (debug only, slow)
+ALLOCATION_DEBUG = False
+# Peak bytes allocated within one callback before it is flagged
+# Scalars and array views stay well below this; any block-sized temporary goes over
+ALLOCATION_DEBUG_THRESHOLD = 1024
+
+# Run the effects in their own process; audio passes through shared memory
+ENGINE_PROCESS = False
+ENGINE_RT_PRIORITY = 70     # SCHED_FIFO priority for that process, where allowed
+ENGINE_CPU = None           # Pin that process to this CPU
+ENGINE_RING_BLOCKS = 8
+ENGINE_PREFILL_BLOCKS = 1   # Added latency in blocks: the time the engine has per block
+# Where the audio comes from: 'sounddevice' for the sound card, or 'simulated' for a
+# stream on the same schedule with no device, counting every deadline the callback misses
+AUDIO_BACKEND = 'sounddevice'
+SIMULATED_INPUT = None         # None for silence, 'sine', 'noise', or a WAV file at SAMPLE_RATE (looped)
+SIMULATED_LOOPBACK_MS = None   # Feed the simulated output back into its input this much later, like a loopback cable
+
+# ROUND-TRIP LATENCY: measured over a loopback cable with `python -m engine.latency`, stored per device
+LATENCY_FILE = '~/.config/pypipedals/latency.json'
+LATENCY_SIGNAL = 'chirp'   # or 'mls'
+LATENCY_REPEATS = 3        # Runs per measurement; the median is kept
+
+# SESSION RECORDER: the dry input and the final output, to a pair of WAV files per session
+RECORDER_DIR = '~/pypipedals-sessions'
+RECORDER_HEADROOM_SECONDS = 2.0   # Audio queued between the callback and the disk: how long the disk may stall
+RECORDER_SAMPLE_FORMAT = 'float32'  # or 'pcm16' for half the size
+RECORDER_AUTOSTART = False        # Record every session from startup
+
+# PRESETS: whole chains, built and warmed up at startup, switched with a crossfade
+# Each is (name, [(effect class name, {parameter: value}), ...])
+PRESETS = [
+    ('clean', [('Clean', {})]),
+    ('ambient', [('Echo', {'delay_ms': 450.0, 'feedback': 0.5, 'mix': 0.4}), ('Reverb', {'room_size': 0.9})]),
+    ('crunch', [('Gain', {'drive': 12.0, 'curve': 'tube'}), ('Reverb', {'wet_level': 0.2})]),
+    ('funk', [('WahWah', {}), ('Gain', {'drive': 4.0}), ('Echo', {'mix': 0.25})]),
+]
+PRESET_FILE = None          # JSON presets file (see effects/presets.py), used instead of PRESETS
+PRESET_CROSSFADE_MS = 20.0  # Equal-power crossfade between the old and new chain
+# Share of the block deadline a crossfade block, running both chains, may take;
+# above it the switch fades the old chain out, then the new one in
+PRESET_CROSSFADE_BUDGET = 0.5
+
+# CONVOLUTION PARAMS
+CONVOLUTION_IR = None   # Impulse response WAV (room or cabinet); None uses a built-in synthetic room
+# Partition spectra of IR files, keyed by file hash, sample rate and block size
+CONVOLUTION_CACHE_DIR = '~/.cache/pypipedals/ir'
+# Collect every block into whole partitions through a FIFO: a block costs the same
+# whatever its length, but the convolved signal is one partition late
+CONVOLUTION_BUFFERED = False
+
+# GAIN (DRIVE) PARAMS
+GAIN_DRIVE = 20.0
+GAIN_CURVE = 'tanh'     # 'tanh', 'tube' or 'hardclip'
+GAIN_OVERSAMPLE = 2     # 1 (off), 2 or 4
+GAIN_LEVEL = 0.5
+
+# PITCH SHIFTER PARAMS (phase vocoder; the shifted signal comes PITCH_FRAME_SIZE samples late)
+PITCH_SEMITONES = -12.0   # -12 = an octave down (octaver), +12 an octave up
+PITCH_MIX = 0.5
+PITCH_FRAME_SIZE = 1024   # Analysis frame: bins sample_rate / size apart; longer tracks low notes better
+PITCH_HOP = 256           # Frames overlap by FRAME_SIZE / HOP; the hop needn't match BUFFER_SIZE
+
+# NOISE GATE PARAMS
+GATE_THRESHOLD_DB = -60.0  # Below this (dBFS) the gate closes
+GATE_RANGE_DB = 80.0       # How far down it goes when closed
+GATE_ATTACK_MS = 1.0
+GATE_RELEASE_MS = 150.0
+
+# COMPRESSOR PARAMS
+COMPRESSOR_THRESHOLD_DB = -24.0
+COMPRESSOR_RATIO = 4.0
+COMPRESSOR_ATTACK_MS = 10.0
+COMPRESSOR_RELEASE_MS = 150.0
+COMPRESSOR_KNEE_DB = 6.0
+COMPRESSOR_MAKEUP_DB = 6.0
 
 # ECHO PARAMS
 ECHO_DELAY_MS = 350
 ECHO_FEEDBACK = 0.35
 ECHO_MIX = 0.5
-ECHO_MAX_SECTIONS = 2.0
\ No newline at end of file
+ECHO_MAX_SECTIONS = 2.0
+# LOOPER PARAMS
+LOOPER_MAX_SECONDS = 600.0     # Longest loop; stored in a sparse scratch file, so unused length costs nothing
+LOOPER_WINDOW_SECONDS = 30.0   # Loop audio kept in RAM around the play/record position
+LOOPER_SCRATCH_DIR = None      # Where the scratch file goes; None uses the system temp directory
+LOOPER_LAYER_FORMAT = 'float32'  # Overdub layers kept for undo: 'float32', or 'int16' for half the space
+LOOPER_LATENCY_COMPENSATION = True  # Shift recordings back by the measured round trip, to line up with what was heard
@@ -0,0 +1,235 @@
+import numpy as np
+from config import BUFFER_SIZE, CONVOLUTION_IR, CONVOLUTION_CACHE_DIR, CONVOLUTION_BUFFERED
+from .base import Effect
+from .params import Param
+from .ir import synthetic_ir, partition_spectra, cached_spectra
+
+# Blocks up to this size are transformed by one matrix product: at these sizes
+# that is faster than numpy.fft, and unlike numpy.fft it allocates nothing
+DFT_MAX_BLOCK = 128
+
+_dft_matrices_cache = {}
+
+
+def _dft_matrices(block_size):
+    """
+    Real DFT of a block zero-padded to two blocks, and its inverse, as real
+    matrices working on spectra stored as interleaved (re, im) pairs
+    Returns forward (block, 2 * bins) and inverse (2 * block, 2 * bins)
+    """
+    if block_size not in _dft_matrices_cache:
+        n = 2 * block_size
+        bins = block_size + 1
+        angles = 2 * np.pi * np.outer(np.arange(block_size), np.arange(bins)) / n
+        forward = np.empty((block_size, 2 * bins))
+        forward[:, 0::2] = np.cos(angles)
+        forward[:, 1::2] = -np.sin(angles)
+
+        # Every bin but DC and Nyquist stands for itself and its mirror image
+        weights = np.full(bins, 2.0 / n)
+        weights[0] = weights[-1] = 1.0 / n
+        angles = 2 * np.pi * np.outer(np.arange(n), np.arange(bins)) / n
+        inverse = np.empty((n, 2 * bins))
+        inverse[:, 0::2] = weights * np.cos(angles)
+        inverse[:, 1::2] = -weights * np.sin(angles)
+        _dft_matrices_cache[block_size] = (forward.astype('float32'), inverse.astype('float32'))
+    return _dft_matrices_cache[block_size]
+
+
+class Convolution(Effect):
+    """
+    Convolution: a real room or speaker cabinet, from its impulse response
+
+    Key Concepts:
+    - Impulse response (IR): how a space answers a single click; convolving
+      a signal with it puts the signal in that space (reverb) or through
+      that speaker (cab sim)
+    - Uniformly partitioned convolution: the IR is cut into block-sized
+      partitions. Each new block is transformed once, and its spectrum is
+      multiplied by partition 0, last block's by partition 1, and so on
+    - Frequency-domain delay line: the spectra of the last few input blocks,
+      one per partition, so nothing is transformed twice
+    - Overlap-add: each block's result is two blocks long; the second half
+      is added into the next block's output
+    - Block lengths: a block that isn't whole partitions is convolved as far
+      as it goes, the rest of its partition taken as silence, which is exact
+      for the samples it has; the partition is finished by the blocks after.
+      No latency, but a partition may be worked out more than once. With
+      buffered=True every block goes through a FIFO instead: one partition
+      each, always one partition late (latency_frames)
+
+    Direct convolution costs one multiply per IR sample per output sample;
+    this costs one complex multiply-add per partition and frequency bin per
+    block, so seconds-long IRs fit in the callback
+    """
+
+    PARAMS = {
+        'wet_level': Param(0.0, 1.0),
+        'dry_level': Param(0.0, 1.0),
+    }
+
+    def __init__(self, sample_rate, ir_path=CONVOLUTION_IR, block_size=BUFFER_SIZE,
+                 cache_dir=CONVOLUTION_CACHE_DIR, buffered=CONVOLUTION_BUFFERED):
+        # Convolution parameters - set BEFORE super().__init__()
+        self.wet_level = 0.3     # Convolved signal (1.0 with dry 0.0 for a cab sim)
+        self.dry_level = 0.7     # Direct signal
+        self.block_size = block_size
+        self.cache_dir = cache_dir
+        self.buffered = buffered
+        self.ir_path = ir_path
+        self.spectra, self.from_cache = self._ir_spectra(ir_path, sample_rate)
+        # Spectra of a newly loaded IR, swapped in by the audio thread
+        self._pending_spectra = None
+
+        super().__init__(sample_rate)
+
+    def _ir_spectra(self, ir_path, sample_rate):
+        if ir_path is None:
+            return partition_spectra(synthetic_ir(sample_rate), self.block_size), False
+        return cached_spectra(ir_path, sample_rate, self.block_size, self.cache_dir)
+
+    def load_ir(self, ir_path):
+        """
+        Switch to another IR (None for the built-in room); call from any thread but the audio one
+        The spectra are prepared here; the effect switches over at the start of its next block
+        """
+        spectra, self.from_cache = self._ir_spectra(ir_path, self.sample_rate)
+        self.ir_path = ir_path
+        self._pending_spectra = spectra
+
+    def reset(self):
+        block = self.block_size
+        bins = block + 1
+        partitions, ir_channels, _ = self.spectra.shape
+        # Channel c is convolved with IR channel c (wrapping round, so a mono IR serves every channel)
+        self.channel_spectra = np.ascontiguousarray(self.spectra[:, np.arange(self.channels) % ir_channels])
+
+        # Frequency-domain delay line, stored twice over so the newest `partitions`
+        # spectra are always one contiguous slice, newest first
+        self.fdl = np.zeros((2 * partitions, self.channels, bins), dtype='complex64')
+        self.fdl_position = 0
+        self.products = np.zeros_like(self.channel_spectra)
+        self.spectrum_sum = np.zeros((self.channels, bins), dtype='complex64')
+        self.partition_weights = np.ones(partitions, dtype='complex64')
+        # Second half of the last block's result, waiting to be added
+        self.overlap = np.zeros((block, self.channels), dtype='float32')
+        # numpy.fft path only: zero-padded input and transposed result
+        self.padded = np.zeros((self.channels, 2 * block), dtype='float32')
+        self.result_rows = np.zeros((self.channels, 2 * block), dtype='float32')
+
+        # The partition coming in, zero past what has arrived, and how much has;
+        # buffered, fifo_out is the last partition's output being played out
+        self.latency_frames = block if self.buffered else 0
+        self.fifo_in = np.zeros((block, self.channels), dtype='float32')
+        self.fifo_out = np.zeros((block, self.channels), dtype='float32')
+        self.fifo_fill = 0
+
+    @property
+    def name(self):
+        return "Convolution"
+
+    def _forward(self, block, spectrum):
+        """Spectrum (channels, bins) of a (block_size, channels) block zero-padded to two blocks"""
+        if self.block_size <= DFT_MAX_BLOCK:
+            forward, _ = _dft_matrices(self.block_size)
+            np.dot(block.T, forward, out=spectrum.view(np.float32))
+        else:
+            self.padded[:, :self.block_size] = block.T
+            np.fft.rfft(self.padded, axis=-1, out=spectrum)
+
+    def _inverse(self, spectrum, result):
+        """Two blocks of output (2 * block_size, channels) from a (channels, bins) spectrum"""
+        if self.block_size <= DFT_MAX_BLOCK:
+            _, inverse = _dft_matrices(self.block_size)
+            np.dot(inverse, spectrum.view(np.float32).T, out=result)
+        else:
+            np.fft.irfft(spectrum, 2 * self.block_size, axis=-1, out=self.result_rows)
+            result[:] = self.result_rows.T
+
+    def _convolve_partition(self, block, out, start=0):
+        """
+        Output samples start:start + len(out) of the partition whose input is
+        `block` (block_size, channels). start=0 begins a new partition; the
+        partition is done once its last output sample is
+        """
+        size = self.block_size
+        partitions = len(self.channel_spectra)
+        end = start + len(out)
+
+        # Newest spectrum goes in front of the previous ones; a partition
+        # coming in pieces replaces its own spectrum each time
+        if start == 0:
+            self.fdl_position = (self.fdl_position - 1) % partitions
+        position = self.fdl_position
+        newest = self.fdl[position]
+        self._forward(block, newest)
+        self.fdl[position + partitions] = newest
+
+        # Each partition times the input spectrum from that many blocks ago, summed over partitions
+        np.multiply(self.fdl[position:position + partitions], self.channel_spectra, out=self.products)
+        np.dot(self.partition_weights, self.products.reshape(partitions, -1), out=self.spectrum_sum.reshape(-1))
+
+        # Overlap-add: this result's first half plus the previous one's second half
+        result = self._scratch('result', (2 * size, self.channels))
+        self._inverse(self.spectrum_sum, result)
+        np.add(result[start:end], self.overlap[start:end], out=out)
+        if end == size:
+            self.overlap[:] = result[size:]
+
+    def _convolve_direct(self, audio, wet):
+        """Any block length, no latency: whole partitions straight through, parts of one as far as they go"""
+        size = self.block_size
+        frames = len(audio)
+        position = 0
+        while position < frames:
+            fill = self.fifo_fill
+            count = min(frames - position, size - fill)
+            if count == size:
+                self._convolve_partition(audio[position:position + size], wet[position:position + size])
+            else:
+                if fill == 0:
+                    self.fifo_in[:] = 0.0
+                self.fifo_in[fill:fill + count] = audio[position:position + count]
+                self._convolve_partition(self.fifo_in, wet[position:position + count], fill)
+                self.fifo_fill = (fill + count) % size
+            position += count
+
+    def _convolve_buffered(self, audio, wet):
+        """Any block length: collect whole partitions in a FIFO and hand back the previous one's output"""
+        size = self.block_size
+        frames = len(audio)
+        position = 0
+        while position < frames:
+            fill = self.fifo_fill
+            count = min(frames - position, size - fill)
+            self.fifo_in[fill:fill + count] = audio[position:position + count]
+            wet[position:position + count] = self.fifo_out[fill:fill + count]
+            self.fifo_fill = fill + count
+            position += count
+            if self.fifo_fill == size:
+                self._convolve_partition(self.fifo_in, self.fifo_out)
+                self.fifo_fill = 0
+
+    def process_into(self, audio, out, frames):
+        """
+        Convolve with the IR. Unbuffered there is no latency at any block
+        length; buffered, the convolved signal, not the dry one, is one
+        partition late
+        """
+        pending = self._pending_spectra
+        if pending is not None:
+            self._pending_spectra = None
+            self.spectra = pending
+            self.reset()
+        audio, out = self._channel_views(audio, out)
+        self._update_params()
+
+        wet = self._scratch('wet', audio.shape)
+        if self.buffered:
+            self._convolve_buffered(audio, wet)
+        else:
+            self._convolve_direct(audio, wet)
+
+        np.multiply(audio, self._param('dry_level', audio.shape), out=out)
+        wet *= self._param('wet_level', audio.shape)
+        out += wet
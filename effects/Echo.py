@@ -1,32 +1,83 @@
 import numpy as np
 from config import SAMPLE_RATE, ECHO_DELAY_MS, ECHO_FEEDBACK, ECHO_MIX, ECHO_MAX_SECTIONS
 from .base import Effect
+from .circular import read_circular, write_circular
+from .params import Param
 
 class Echo(Effect):
+    # The delay time switches at a block boundary: ramping it would bend the pitch of the echoes
+    PARAMS = {
+        'delay_ms': Param(1.0, ECHO_MAX_SECTIONS * 1000.0, ramp=None),
+        'feedback': Param(0.0, 0.95),
+        'mix': Param(0.0, 1.0),
+    }
+
+    def __init__(self, sample_rate):
+        # Echo parameters - set BEFORE super().__init__()
+        self.delay_ms = float(ECHO_DELAY_MS)
+        self.feedback = ECHO_FEEDBACK
+        self.mix = ECHO_MIX
+
+        super().__init__(sample_rate)
+
     def reset(self):
-        self.echo_delay_samples = int(self.sample_rate * (ECHO_DELAY_MS / 1000.0))
+        self.echo_delay_samples = self._delay_samples()
         self.echo_buffer_size = int(self.sample_rate * ECHO_MAX_SECTIONS)
-        self.echo_buffer = np.zeros(self.echo_buffer_size, dtype="float32")
+        # One column per channel, so every channel is delayed in the same pass
+        self.echo_buffer = np.zeros((self.echo_buffer_size, self.channels), dtype="float32")
         self.echo_write_idx = 0
 
     @property
     def name(self):
         return "Echo"
 
-    def process(self, audio, frames):
-        out = np.zeros_like(audio)
-        for i in range(frames):
-            read_idx = (self.echo_write_idx - self.echo_delay_samples) % self.echo_buffer_size
-            delayed_sample = self.echo_buffer[read_idx]
+    def _delay_samples(self):
+        # Never the whole buffer: the read would land on the sample being written
+        return min(int(self.sample_rate * (self.delay_ms / 1000.0)), int(self.sample_rate * ECHO_MAX_SECTIONS) - 1)
+
+    def _process_block(self, dry, block_out, mix, feedback):
+        """
+        Process one block of dry input into block_out in one go
+
+        Only valid while the block is no longer than the delay: every sample
+        read then comes from before the block, so nothing read depends on
+        something written in the same block
+        mix and feedback are numbers, or one per sample while they ramp
+        """
+        length = len(dry)
+        read_idx = (self.echo_write_idx - self.echo_delay_samples) % self.echo_buffer_size
+
+        wet = self._scratch('wet', dry.shape)
+        scaled = self._scratch('scaled', dry.shape)
+        read_circular(self.echo_buffer, read_idx, wet)
+
+        # out = (1 - mix) * dry + mix * wet, as dry + mix * (wet - dry)
+        np.subtract(wet, dry, out=scaled)
+        scaled *= mix
+        np.add(dry, scaled, out=block_out)
+
+        # buffer = dry + wet * feedback
+        np.multiply(wet, feedback, out=scaled)
+        scaled += dry
+        write_circular(self.echo_buffer, self.echo_write_idx, scaled)
 
-            dry = audio[i]
-            wet = delayed_sample
+        self.echo_write_idx = (self.echo_write_idx + length) % self.echo_buffer_size
 
-            out_sample = (1.0 - ECHO_MIX) * dry + ECHO_MIX * wet
-            out[i] = out_sample
+    def process_into(self, audio, out, frames):
+        audio, out = self._channel_views(audio, out)
+        self._update_params()
+        self.echo_delay_samples = self._delay_samples()
+        mix = self._param('mix', audio.shape)
+        feedback = self._param('feedback', audio.shape)
 
-            self.echo_buffer[self.echo_write_idx] = dry + delayed_sample * ECHO_FEEDBACK
+        # Longest run of samples whose delayed reads were all written before the run started
+        step = self.echo_delay_samples % self.echo_buffer_size or self.echo_buffer_size
 
-            self.echo_write_idx = (self.echo_write_idx + 1) % self.echo_buffer_size
-        
-        return out
\ No newline at end of file
+        if step >= frames:
+            self._process_block(audio, out, mix, feedback)
+        else:
+            # Delay shorter than the block: fall back to delay-sized sub-blocks
+            for start in range(0, frames, step):
+                stop = min(start + step, frames)
+                self._process_block(audio[start:stop], out[start:stop], self._part(mix, start, stop),
+                                    self._part(feedback, start, stop))
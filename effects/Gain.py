@@ -1,14 +1,71 @@
+import numpy as np
+from config import GAIN_DRIVE, GAIN_CURVE, GAIN_OVERSAMPLE, GAIN_LEVEL
 from .base import Effect
+from .params import Param
+from .waveshaper import Waveshaper, Oversampler, CURVES
 
 class Gain(Effect):
+    """
+    Gain: Overdrive / distortion by waveshaping
+
+    Key Concepts:
+    - Drive: boosting the signal into a nonlinear transfer curve
+    - Waveshaping: output = curve(input), looked up from a precomputed table
+    - Oversampling: the curve adds harmonics above Nyquist; running it at
+      2x or 4x the sample rate and filtering keeps them from aliasing back
+    """
+
+    PARAMS = {
+        'drive': Param(1.0, 100.0, ramp='exponential'),
+        'curve': Param(choices=CURVES),
+        'oversample': Param(choices=(1, 2, 4)),
+        'level': Param(0.0, 2.0),
+    }
+
+    def __init__(self, sample_rate):
+        # Drive parameters - set BEFORE super().__init__()
+        self.drive = GAIN_DRIVE            # Input boost into the curve
+        self.curve = GAIN_CURVE            # 'tanh', 'tube', 'hardclip'
+        self.oversample = GAIN_OVERSAMPLE  # 1 (off), 2 or 4
+        self.level = GAIN_LEVEL            # Output level after the curve
+
+        super().__init__(sample_rate)
+
+    def reset(self):
+        self.shaper = Waveshaper(self.curve)
+        self._oversamplers = {}
+
     @property
     def name(self):
         return "Gain"
 
-    def process(self, audio, frames):
-        out = audio * -20.0
-        print("before")
-        print(audio)
-        print("after")
-        print(out)
-        return out
\ No newline at end of file
+    def pointwise(self):
+        # Oversampling filters carry history from block to block
+        if self.oversample > 1:
+            return None
+        return [('scale', self.drive), ('curve', self.curve), ('scale', self.level)]
+
+    def _drive_and_shape(self, signal, out, time_axis=0):
+        """Boost `signal` and run it through the curve, into `out`"""
+        np.multiply(signal, self._param('drive', signal.shape, time_axis), out=out)
+        self.shaper.process(out, out)
+
+    def _drive_and_shape_oversampled(self, signal, out):
+        """_drive_and_shape for the oversampler, whose channels are rows with time along them"""
+        self._drive_and_shape(signal, out, -1)
+
+    def process_into(self, audio, out, frames):
+        audio, out = self._channel_views(audio, out)
+        self._update_params()
+        self.shaper.curve = self.curve
+
+        if self.oversample > 1:
+            oversampler = self._oversamplers.get(self.oversample)
+            if oversampler is None:
+                oversampler = Oversampler(self.oversample, self.channels)
+                self._oversamplers[self.oversample] = oversampler
+            oversampler.process(audio, out, self._drive_and_shape_oversampled)
+        else:
+            self._drive_and_shape(audio, out)
+
+        out *= self._param('level', out.shape)
@@ -1,10 +1,41 @@
 import numpy as np
+from config import LOOPER_MAX_SECONDS, LOOPER_WINDOW_SECONDS, LOOPER_SCRATCH_DIR, LOOPER_LAYER_FORMAT
+from wavfile import WavReader, WavWriter, WAVE_FORMAT_IEEE_FLOAT
 from .base import Effect
+from .lfo import LFO
+from .loopstore import LoopStorage
+
+# int16 layer samples per unit of float audio
+INT16_SCALE = 32767.0
 
 class Looper(Effect):
+    """
+    Records a loop and plays it back under the input
+
+    The loop lives in a memory-mapped scratch file (see loopstore.py), so it
+    can run for many minutes with only a window of it in RAM. The file is made
+    once: a new recording or a clear only resets the length and positions
+
+    Overdubs are layers over the first take. Playback reads one mixdown, which
+    each overdub adds its samples to as they're recorded, so it costs the same
+    however many layers there are. Every layer is also kept on its own (in its
+    own scratch file, as int16 with LOOPER_LAYER_FORMAT = 'int16'), so undo()
+    can take it back out of the mixdown and redo() put it back in
+
+    With the round-trip latency set (set_latency()), recordings line up with
+    what the player heard rather than with when their playing reached the
+    input, which is that much later. A first take starts and stops that much
+    after the count-in and the stop, and overdubs go that far back in the loop
+    """
+
     def __init__(self, sample_rate):
-        self.max_loop_seconds = 30.0  # Maximum loop length
+        self.max_loop_seconds = LOOPER_MAX_SECONDS  # Maximum loop length
         self.max_loop_samples = int(self.max_loop_seconds * sample_rate)
+        self.storage = None
+        self.layer_format = LOOPER_LAYER_FORMAT
+        self.layers = []   # Overdub layers in the mixdown, oldest first
+        self.undone = []   # Layers taken out by undo(), the last one undone last
+        self.latency_frames = 0  # Round trip from output to input, compensated for when recording
 
         # Metronome / count-in defaults - set BEFORE calling super().__init__
         self.default_bpm = 120
@@ -20,8 +51,27 @@ class Looper(Effect):
         # note: base.__init__ calls reset(), so no need to call self.reset() again here
 
     def reset(self):
-        # Loop buffer
-        self.loop_buffer = np.zeros(self.max_loop_samples, dtype='float32')
+        # Loop storage, one column per channel; only rebuilt when the channel count changes
+        if self.storage is None or self.storage.channels != self.channels:
+            if self.storage is not None:
+                self.storage.close()
+            window = int(LOOPER_WINDOW_SECONDS * self.sample_rate)
+            self.storage = LoopStorage(self.max_loop_samples, self.channels, window, LOOPER_SCRATCH_DIR)
+            self.storage.start_pager(self._pager_state)
+        self._clear()
+
+    def _clear(self):
+        """Forget the loop: back to the scratch storage, with every index and state reset"""
+        # Stop playback before the buffer changes under it
+        self.is_playing = False
+        self.is_overdubbing = False
+        self.dub_layer = None
+        for layer in self.layers + self.undone:
+            layer.close()
+        self.layers = []
+        self.undone = []
+        self.storage.clear()
+        self.loop_buffer = self.storage.buffer
         self.loop_length = 0
         self.loop_position = 0
 
@@ -29,6 +79,10 @@ class Looper(Effect):
         self.is_recording = False
         self.is_playing = False
         self.record_position = 0
+        # Latency compensation: input left to skip at the start of a take, and to record after its stop
+        self.record_skip = 0
+        self.record_tail = 0
+        self.tail_position = 0
 
         # Count-in / metronome states
         self.is_counting_in = False
@@ -52,8 +106,7 @@ class Looper(Effect):
         duration = duration or self.default_click_duration
         amp = amp if amp is not None else self.default_click_amp
         length = max(1, int(duration * self.sample_rate))
-        t = np.arange(length) / float(self.sample_rate)
-        sine = np.sin(2.0 * np.pi * freq * t)
+        sine = LFO(self.sample_rate, rate=freq).generate(length)
         window = np.hanning(length)
         click = (sine * window * amp).astype('float32')
         return click
@@ -63,7 +116,7 @@ class Looper(Effect):
         Defaults: bpm=120, beats=4 (4-beat count-in).
         """
         # Reset loop state before a new recording
-        self.reset()
+        self._clear()
 
         # Configure count-in / metronome
         self.count_in_bpm = bpm or self.default_bpm
@@ -90,7 +143,11 @@ class Looper(Effect):
             return "Count-in cancelled"
 
         if self.is_recording and self.record_position > 0:
-            self.loop_length = self.record_position
+            # The last `latency_frames` the player played are still on their way in:
+            # playback starts now, and they're recorded onto the loop's end as they arrive
+            self.record_tail = min(self.latency_frames, self.max_loop_samples - self.record_position)
+            self.tail_position = self.record_position
+            self.loop_length = self.record_position + self.record_tail
             self.is_recording = False
             self.is_playing = True
             self.loop_position = 0
@@ -98,23 +155,173 @@ class Looper(Effect):
             return f"Loop saved ({duration:.1f}s) - Playing back"
         return "No loop recorded"
 
+    def set_latency(self, frames):
+        """Round trip from output to input in frames, as measured by engine.latency; 0 turns compensation off"""
+        self.latency_frames = max(0, int(frames))
+        return f"Looper latency compensation {self.latency_frames / self.sample_rate * 1000:.1f} ms"
+
     def stop_playback(self):
         """Stop loop playback"""
+        self._finish_overdub()
         self.is_playing = False
         return "Loop stopped"
 
     def toggle_playback(self):
         """Toggle playback on/off (keep loop in memory)"""
         if self.loop_length > 0:
+            self._finish_overdub()
             self.is_playing = not self.is_playing
             return "Playing" if self.is_playing else "Paused"
         return "No loop to play"
 
     def clear_loop(self):
         """Clear the current loop"""
-        self.reset()
+        self._clear()
         return "Loop cleared"
 
+    def start_overdub(self):
+        """Record a new layer over the loop, from where it's playing, until stop_overdub()"""
+        if self.is_recording or self.is_counting_in or self.record_tail:
+            return "Stop recording first"
+        if self.loop_length == 0:
+            return "No loop to overdub"
+        if self.is_overdubbing:
+            return "Already overdubbing"
+        if self.loop_buffer is not self.storage.scratch:
+            self._to_scratch()
+
+        window = int(LOOPER_WINDOW_SECONDS * self.sample_rate)
+        layer = LoopStorage(self.loop_length, self.channels, window, LOOPER_SCRATCH_DIR, self.layer_format)
+        layer.start_pager(self._layer_pager_state)
+        # A new take replaces whatever was undone
+        for undone in self.undone:
+            undone.close()
+        self.undone = []
+        self.layers.append(layer)
+        # The layer is in place before the audio thread is told to write it
+        self.dub_layer = layer.buffer
+        self.is_overdubbing = True
+        self.is_playing = True
+        return f"Overdubbing layer {len(self.layers)}"
+
+    def stop_overdub(self):
+        """Keep the layer being overdubbed; playback carries on"""
+        if not self.is_overdubbing:
+            return "Not overdubbing"
+        self._finish_overdub()
+        return f"Layer {len(self.layers)} added"
+
+    def _finish_overdub(self):
+        if not self.is_overdubbing:
+            return
+        self.is_overdubbing = False
+        # Only undo and redo read it now: off to disk
+        layer = self.layers[-1]
+        layer.close()
+        layer.release()
+
+    def undo(self):
+        """Take the last overdub out of the mixdown; redo() puts it back"""
+        self._finish_overdub()
+        if not self.layers:
+            return "Nothing to undo"
+        layer = self.layers.pop()
+        self._mix_layer(layer, -1.0)
+        self.undone.append(layer)
+        return f"Layer {len(self.layers) + 1} undone"
+
+    def redo(self):
+        """Put the last undone overdub back into the mixdown"""
+        if self.is_overdubbing:
+            return "Stop overdubbing first"
+        if not self.undone:
+            return "Nothing to redo"
+        layer = self.undone.pop()
+        self._mix_layer(layer, 1.0)
+        self.layers.append(layer)
+        return f"Layer {len(self.layers)} redone"
+
+    def _mix_layer(self, layer, sign, block=65536):
+        """Add (sign 1) or subtract (-1) a whole layer in the mixdown, a block at a time, off the audio thread"""
+        scale = sign / INT16_SCALE if layer.dtype == np.int16 else sign
+        for start in range(0, self.loop_length, block):
+            end = min(start + block, self.loop_length)
+            self.loop_buffer[start:end] += layer.buffer[start:end] * np.float32(scale)
+        layer.release()
+        self.storage.sweep()
+
+    def _to_scratch(self, block=65536):
+        """Copy a loaded (mapped, read-only) loop into the scratch storage, so it can be overdubbed"""
+        loaded = self.loop_buffer
+        self.storage.clear()
+        for start in range(0, self.loop_length, block):
+            end = min(start + block, self.loop_length)
+            self.storage.scratch[start:end] = loaded[start:end]
+        self.loop_buffer = self.storage.scratch
+        self.storage.sweep()
+
+    def save_loop(self, path):
+        """Write the loop to a float32 WAV file, straight from the loop storage"""
+        if self.is_recording or self.is_counting_in or self.record_tail:
+            return "Stop recording first"
+        if self.loop_length == 0:
+            return "No loop to save"
+        try:
+            with WavWriter(path, self.sample_rate, self.channels) as writer:
+                writer.write(self.loop_buffer[:self.loop_length])
+        except OSError as error:
+            return f"Can't save loop: {error}"
+        # Writing read the whole loop into RAM; the pager drops what's outside its window
+        self.storage.sweep()
+        return f"Loop saved to {path} ({self.loop_length / self.sample_rate:.1f}s)"
+
+    def load_loop(self, path):
+        """
+        Load a loop from a WAV file, paused. A float32 file with the looper's
+        rate and channels is mapped, not read: it plays straight from the file.
+        Other formats are converted into the scratch storage
+        """
+        if self.is_recording or self.is_counting_in:
+            return "Stop recording first"
+        try:
+            with WavReader(path) as reader:
+                if reader.sample_rate != self.sample_rate:
+                    return f"Can't load {path}: it's {reader.sample_rate} Hz, the looper runs at {self.sample_rate} Hz"
+                frames = min(reader.frames, self.max_loop_samples)
+                if frames == 0:
+                    return f"Can't load {path}: no audio"
+                self._clear()
+                if (reader.format_tag, reader.bits, reader.channels) == (WAVE_FORMAT_IEEE_FLOAT, 32, self.channels):
+                    self.storage.map_wav(path, reader.data_offset, frames)
+                else:
+                    self._convert(reader, frames)
+        except (OSError, ValueError) as error:
+            return f"Can't load {path}: {error}"
+        self.loop_buffer = self.storage.buffer
+        self.loop_position = 0
+        self.loop_length = frames
+        cut = " (cut to the longest loop)" if frames < reader.frames else ""
+        return f"Loop loaded ({frames / self.sample_rate:.1f}s){cut} - Paused"
+
+    def _convert(self, reader, frames, block=65536):
+        """Read another sample format or channel count into the scratch storage"""
+        for start in range(0, frames, block):
+            audio = reader.read(start, min(block, frames - start))
+            if audio.shape[1] != self.channels:
+                # Down to mono, then out to every channel
+                audio = audio.mean(axis=1, keepdims=True)
+            self.storage.scratch[start:start + len(audio)] = audio
+
+    def _pager_state(self):
+        """Where the loop is being played or recorded, for the storage pager thread"""
+        if self.is_recording:
+            return self.record_position, self.record_position, True, True
+        return self.loop_position, self.loop_length, False, self.is_overdubbing
+
+    def _layer_pager_state(self):
+        """The overdub follows playback round the loop"""
+        return self.loop_position, self.loop_length, False, True
+
     def get_status(self):
         """Get current looper status"""
         if self.is_counting_in:
@@ -122,77 +329,161 @@ class Looper(Effect):
         if self.is_recording:
             duration = self.record_position / self.sample_rate
             return f"REC [{duration:.1f}s]"
-        elif self.is_playing and self.loop_length > 0:
+        layers = f" +{len(self.layers)} layers" if self.layers else ""
+        if self.is_playing and self.loop_length > 0:
             duration = self.loop_length / self.sample_rate
             position = self.loop_position / self.sample_rate
-            return f"PLAY [{position:.1f}/{duration:.1f}s]"
+            state = "DUB" if self.is_overdubbing else "PLAY"
+            return f"{state} [{position:.1f}/{duration:.1f}s]{layers}"
         elif self.loop_length > 0:
             duration = self.loop_length / self.sample_rate
-            return f"PAUSED [{duration:.1f}s]"
+            return f"PAUSED [{duration:.1f}s]{layers}"
         else:
             return "EMPTY"
 
+    def _process_count_in(self, audio, out, pos, frames):
+        """
+        Count-in / metronome handling, from `pos` up to the next click trigger
+        or the end of the count-in, whichever comes first
+        Returns the position reached
+        """
+        # If it's time to trigger a click
+        if self.count_in_samples_to_next_click <= 0 and self.count_in_beats_remaining > 0:
+            # Trigger click
+            self.click_pos = 0
+            # After triggering a click, schedule next click after beat interval
+            self.count_in_samples_to_next_click = self.beat_interval_samples
+            # Decrement beats remaining (this click counts as one beat)
+            self.count_in_beats_remaining -= 1
+            # If that was the last beat, schedule a short delay equal to click length before starting recording
+            if self.count_in_beats_remaining == 0:
+                self.count_in_start_delay_remaining = len(self.click_buffer)
+
+        # Run until the next click, or until the delay after the last click runs out
+        length = frames - pos
+        if self.count_in_beats_remaining > 0:
+            length = min(length, self.count_in_samples_to_next_click)
+        elif self.count_in_start_delay_remaining > 0:
+            length = min(length, self.count_in_start_delay_remaining)
+        end = pos + length
+
+        # Decrement timer to next click
+        self.count_in_samples_to_next_click -= length
+
+        # Mix click into output (count-in should be audible)
+        out[pos:end] = audio[pos:end]
+        if self.click_buffer is not None:
+            clicks = max(0, min(length, len(self.click_buffer) - self.click_pos))
+            out[pos:pos + clicks] += self.click_buffer[self.click_pos:self.click_pos + clicks, None]
+            self.click_pos += clicks
+
+        # If we have finished the final click and its delay, begin recording
+        if (self.count_in_beats_remaining == 0) and (self.count_in_start_delay_remaining > 0):
+            self.count_in_start_delay_remaining -= length
+            if self.count_in_start_delay_remaining == 0:
+                # Start recording from the next sample
+                self.is_counting_in = False
+                self.is_recording = True
+                self.is_playing = False
+                self.record_position = 0
+                self.record_skip = self.latency_frames
+
+        return end
+
+    def _process_recording(self, audio, out, pos, frames):
+        """Record input into the loop buffer until the block or the buffer runs out"""
+        if self.record_skip > 0:
+            # Still what was played before the count-in ended
+            end = pos + min(frames - pos, self.record_skip)
+            self.record_skip -= end - pos
+            out[pos:end] = audio[pos:end]
+            return end
+        length = min(frames - pos, self.max_loop_samples - self.record_position)
+        end = pos + length
+        self.loop_buffer[self.record_position:self.record_position + length] = audio[pos:end]
+        self.record_position += length
+        out[pos:end] = audio[pos:end]  # pass-through while recording
+        return end
+
+    def _record_tail(self, audio, frames):
+        """The end of a take arriving after its stop, written past the loop position"""
+        length = min(frames, self.record_tail)
+        self.loop_buffer[self.tail_position:self.tail_position + length] = audio[:length]
+        self.tail_position += length
+        self.record_tail -= length
+
+    def _process_playback(self, audio, out, pos, frames):
+        """Mix the loop into the input until the block ends or the loop wraps"""
+        length = min(frames - pos, self.loop_length - self.loop_position)
+        end = pos + length
+        mix = self.loop_buffer[self.loop_position:self.loop_position + length]
+        np.add(audio[pos:end], mix, out=out[pos:end])
+        layer = self.dub_layer
+        if self.is_overdubbing and layer is not None:
+            # The input now was played to what was heard `latency_frames` ago
+            start = (self.loop_position - self.latency_frames) % self.loop_length
+            split = min(length, self.loop_length - start)
+            self._overdub(audio[pos:pos + split], self.loop_buffer[start:start + split], layer[start:start + split])
+            if split < length:
+                rest = length - split
+                self._overdub(audio[pos + split:end], self.loop_buffer[:rest], layer[:rest])
+        # Advance loop position
+        self.loop_position = (self.loop_position + length) % self.loop_length
+        return end
+
+    def _overdub(self, audio, mix, layer):
+        """Add the input to the mixdown, heard from the next time round, and to its own layer"""
+        np.add(mix, audio, out=mix)
+        if layer.dtype == np.float32:
+            np.add(layer, audio, out=layer)
+            return
+        # int16 layer: summed in float, then rounded and clipped back
+        work = self._scratch('overdub', audio.shape)
+        work[...] = layer
+        work *= 1.0 / INT16_SCALE
+        work += audio
+        work *= INT16_SCALE
+        np.rint(work, out=work)
+        np.minimum(work, INT16_SCALE, out=work)
+        np.maximum(work, -INT16_SCALE - 1.0, out=work)
+        layer[...] = work
+
+    def _is_idle(self):
+        """EMPTY / PAUSED: nothing to add to the input"""
+        return not (self.is_counting_in or self.is_recording or self.record_tail
+                    or (self.is_playing and self.loop_length > 0))
+
     def process(self, audio, frames):
-        out = np.zeros_like(audio)
+        # Pass the input straight through without allocating while idle
+        if self._is_idle():
+            return audio
+        return super().process(audio, frames)
 
-        for i in range(frames):
-            input_sample = audio[i]
-            output_sample = input_sample
+    def process_into(self, audio, out, frames):
+        audio, out = self._channel_views(audio, out)
+        if self._is_idle():
+            out[:] = audio
+            return
+        if self.record_tail > 0:
+            self._record_tail(audio, frames)
 
-            # === Count-in / metronome handling ===
-            click_sample = 0.0
+        # Split the block only where the state changes, and handle each segment with slices
+        pos = 0
+        while pos < frames:
             if self.is_counting_in:
-                # If it's time to trigger a click
-                if self.count_in_samples_to_next_click <= 0 and self.count_in_beats_remaining > 0:
-                    # Trigger click
-                    self.click_pos = 0
-                    # After triggering a click, schedule next click after beat interval
-                    self.count_in_samples_to_next_click = self.beat_interval_samples
-                    # Decrement beats remaining (this click counts as one beat)
-                    self.count_in_beats_remaining -= 1
-                    # If that was the last beat, schedule a short delay equal to click length before starting recording
-                    if self.count_in_beats_remaining == 0:
-                        self.count_in_start_delay_remaining = len(self.click_buffer)
-
-                # Decrement timer to next click
-                self.count_in_samples_to_next_click -= 1
-
-                # If click is playing, add click buffer sample
-                if self.click_buffer is not None and self.click_pos < len(self.click_buffer):
-                    click_sample = float(self.click_buffer[self.click_pos])
-                    self.click_pos += 1
-
-                # If we have finished the final click and its delay, begin recording
-                if (self.count_in_beats_remaining == 0) and (self.count_in_start_delay_remaining > 0):
-                    self.count_in_start_delay_remaining -= 1
-                    if self.count_in_start_delay_remaining == 0:
-                        # Start recording now
-                        self.is_counting_in = False
-                        self.is_recording = True
-                        self.is_playing = False
-                        self.record_position = 0
-                # Mix click into output (count-in should be audible)
-                output_sample = input_sample + click_sample
-
-            else:
-                # === Recording behavior ===
-                if self.is_recording:
-                    # Record input into buffer
-                    if self.record_position < self.max_loop_samples:
-                        self.loop_buffer[self.record_position] = input_sample
-                        self.record_position += 1
-                    else:
-                        # Auto-stop if max length reached
-                        self.stop_recording()
-                    output_sample = input_sample  # pass-through while recording
-
-                # === Playback behavior ===
-                if self.is_playing and self.loop_length > 0:
-                    loop_sample = self.loop_buffer[self.loop_position]
-                    output_sample = input_sample + loop_sample  # Mix input with loop
-                    # Advance loop position
-                    self.loop_position = (self.loop_position + 1) % self.loop_length
-
-            out[i] = output_sample
-
-        return out
\ No newline at end of file
+                pos = self._process_count_in(audio, out, pos, frames)
+                continue
+
+            if self.is_recording:
+                if self.record_position < self.max_loop_samples:
+                    pos = self._process_recording(audio, out, pos, frames)
+                    continue
+                # Auto-stop if max length reached, playback starts on this sample
+                self.stop_recording()
+
+            if self.is_playing and self.loop_length > 0:
+                pos = self._process_playback(audio, out, pos, frames)
+                continue
+
+            out[pos:] = audio[pos:]
+            break
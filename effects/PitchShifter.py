@@ -0,0 +1,145 @@
+import numpy as np
+from config import PITCH_SEMITONES, PITCH_MIX, PITCH_FRAME_SIZE, PITCH_HOP
+from .base import Effect
+from .params import Param
+from .stft import StreamingSTFT
+
+
+class PitchShifter(Effect):
+    """
+    Pitch Shifter / Octaver: the same notes, higher or lower, mixed with the dry signal
+
+    Key Concepts:
+    - STFT: the signal as a stream of overlapping short spectra (see stft.py)
+    - Phase vocoder: how far each bin's phase turned since the last frame
+      tells the exact frequency of what's in it, far finer than the bins
+      are apart
+    - Bin shifting: each bin's magnitude moves to the bin `ratio` times as
+      high, and its phase is advanced at `ratio` times its true frequency,
+      so every partial comes out shifted, frame after frame, in step
+    - Latency: the shifted signal is one analysis frame late (21 ms at
+      48 kHz with 1024-sample frames), reported as latency_frames; the dry
+      signal isn't delayed
+
+    Every frame is worked on whole spectra at once, and everything it
+    needs is allocated when the effect is built
+    """
+
+    # The shift switches at a frame boundary: the vocoder has no ramp for it
+    PARAMS = {
+        'semitones': Param(-24.0, 24.0, ramp=None),
+        'mix': Param(0.0, 1.0),
+    }
+
+    def __init__(self, sample_rate, frame_size=PITCH_FRAME_SIZE, hop=PITCH_HOP):
+        # Pitch shifter parameters - set BEFORE super().__init__()
+        self.semitones = PITCH_SEMITONES   # -12 an octave down, +12 an octave up
+        self.mix = PITCH_MIX               # 0 dry only, 1 shifted only
+        self.frame_size = frame_size
+        self.hop = hop
+
+        super().__init__(sample_rate)
+
+    def reset(self):
+        self.stft = StreamingSTFT(self.frame_size, self.hop, self.channels)
+        self.latency_frames = self.stft.latency_frames
+        shape = (self.channels, self.stft.bins)
+        bins = np.arange(self.stft.bins, dtype=float)
+        # Phase a frequency of exactly one bin turns through in one hop
+        self.hop_phase = 2 * np.pi * self.hop / self.frame_size
+        # Per-bin constants come whole for every channel: numpy broadcasts through
+        # a buffered iterator, which allocates each time
+        self.bin_index = np.tile(bins, (self.channels, 1))
+        self.expected = self.bin_index * self.hop_phase
+
+        self.real = np.zeros(shape)
+        self.imag = np.zeros(shape)
+        self.magnitude = np.zeros(shape)
+        self.phase = np.zeros(shape)
+        self.last_phase = np.zeros(shape)
+        self.frequency = np.zeros(shape)   # True frequency, in bins
+        self.shifted_magnitude = np.zeros(shape)
+        self.shifted_frequency = np.zeros(shape)
+        self.synthesis_phase = np.zeros(shape)
+        self.work = np.zeros(shape)
+        # Output bin -> the input bin it takes, and 0/1 for whether it takes one at all
+        self.source = np.zeros(self.stft.bins, dtype=np.intp)
+        self.taken = np.zeros(shape)
+        self.bin_position = np.zeros(self.stft.bins)
+        self._mapped = None
+        self._map_bins()
+        # Bound once: a new bound method every block would be one more allocation
+        self._transform = self._shift
+
+    @property
+    def name(self):
+        return "Pitch Shifter"
+
+    def _map_bins(self):
+        """Output bin j takes input bin round(j / ratio), if that one lands back on j"""
+        ratio = 2.0 ** (self.semitones / 12.0)
+        self.ratio = ratio
+        self._mapped = self.semitones
+        position = self.bin_position
+        np.multiply(self.bin_index[0], 1.0 / ratio, out=position)
+        np.rint(position, out=position)
+        np.copyto(self.source, position, casting='unsafe')
+        # Shifting up leaves gaps; down, several inputs land on one output
+        # and the nearest wins. Either way no input bin is used twice
+        np.multiply(position, ratio, out=position)
+        np.rint(position, out=position)
+        np.equal(position, self.bin_index, out=self.taken, casting='unsafe')
+        # Past the top input bin there is nothing to take
+        self.taken[:, np.searchsorted(self.source, self.stft.bins):] = 0.0
+
+    def _shift(self, spectrum):
+        """One frame's spectrum (channels, bins), shifted in place"""
+        magnitude, phase, frequency, work = self.magnitude, self.phase, self.frequency, self.work
+        real, imag = self.real, self.imag
+        np.abs(spectrum, out=magnitude)
+        np.copyto(real, spectrum.real)
+        np.copyto(imag, spectrum.imag)
+        np.arctan2(imag, real, out=phase)
+
+        # Phase turned since the last frame, beyond what the bin's own frequency turns,
+        # wrapped to -pi..pi: how far off the bin's centre its partial is
+        np.subtract(phase, self.last_phase, out=frequency)
+        self.last_phase[...] = phase
+        frequency -= self.expected
+        np.multiply(frequency, 1.0 / (2 * np.pi), out=work)
+        np.rint(work, out=work)
+        work *= 2 * np.pi
+        frequency -= work
+        frequency *= 1.0 / self.hop_phase
+        frequency += self.bin_index
+
+        # Move every partial to `ratio` times its frequency
+        np.take(magnitude, self.source, axis=1, out=self.shifted_magnitude, mode='clip')
+        self.shifted_magnitude *= self.taken
+        np.take(frequency, self.source, axis=1, out=self.shifted_frequency, mode='clip')
+        self.shifted_frequency *= self.ratio * self.hop_phase
+
+        # Each output bin's phase runs on at its new frequency
+        synthesis_phase = self.synthesis_phase
+        synthesis_phase += self.shifted_frequency
+        np.remainder(synthesis_phase, 2 * np.pi, out=synthesis_phase)
+        np.cos(synthesis_phase, out=real)
+        real *= self.shifted_magnitude
+        np.copyto(spectrum.real, real)
+        np.sin(synthesis_phase, out=imag)
+        imag *= self.shifted_magnitude
+        np.copyto(spectrum.imag, imag)
+
+    def process_into(self, audio, out, frames):
+        audio, out = self._channel_views(audio, out)
+        self._update_params()
+        if self.semitones != self._mapped:
+            self._map_bins()
+
+        wet = self._scratch('wet', audio.shape)
+        self.stft.process(audio, wet, self._transform)
+
+        # out = dry + mix * (wet - dry)
+        wet -= audio
+        wet *= self._param('mix', audio.shape)
+        np.add(audio, wet, out=out)
@@ -1,5 +1,7 @@
 import numpy as np
 from .base import Effect
+from .circular import read_circular, write_circular
+from .params import Param
 
 class Reverb(Effect):
     """
@@ -15,6 +17,15 @@ class Reverb(Effect):
     and sophisticated diffusion networks
     """
     
+    # Damping switches at a block boundary: it only moves a lowpass inside the
+    # feedback loop, and each value has its own cached matrices
+    PARAMS = {
+        'room_size': Param(0.0, 1.0),
+        'damping': Param(0.0, 0.99, ramp=None),
+        'wet_level': Param(0.0, 1.0),
+        'dry_level': Param(0.0, 1.0),
+    }
+    
     def __init__(self, sample_rate):
         # Reverb parameters - set BEFORE super().__init__()
         self.room_size = 0.75      # 0-1: affects delay times
@@ -40,66 +51,152 @@ class Reverb(Effect):
             int(341 * sample_rate / 44100),
         ]
         
+        # Each further channel's delay lines are this much longer than the one
+        # before, so the channels' reflections don't line up (Freeverb's spread)
+        self.stereo_spread = int(23 * sample_rate / 44100)
+        
         super().__init__(sample_rate)
     
     def reset(self):
-        # Comb filter buffers (parallel)
-        self.comb_buffers = []
-        self.comb_positions = []
-        self.comb_filter_states = []  # For damping
+        # Every delay line has one column per channel and one write position
+        # Channel c reads delay + c * stereo_spread behind it, so the line is
+        # long enough for the last channel
+        spread = self.stereo_spread * (self.channels - 1)
+        self.comb_read_delays = [[d + c * self.stereo_spread for c in range(self.channels)]
+                                 for d in self.comb_delays]
+        self.allpass_read_delays = [[d + c * self.stereo_spread for c in range(self.channels)]
+                                    for d in self.allpass_delays]
         
-        for delay in self.comb_delays:
-            self.comb_buffers.append(np.zeros(delay, dtype='float32'))
-            self.comb_positions.append(0)
-            self.comb_filter_states.append(0.0)
+        # Comb filter buffers (parallel), stacked end to end in one array
+        # comb_sections[j] is comb j's view into the shared comb_buffer
+        lengths = [d + spread for d in self.comb_delays]
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        self.comb_buffer = np.zeros((sum(lengths), self.channels), dtype='float32')
+        self.comb_sections = [self.comb_buffer[o:o + n] for o, n in zip(offsets, lengths)]
+        self.comb_positions = [0] * len(self.comb_delays)
+        # For damping, one per comb and channel
+        self.comb_filter_states = np.zeros((len(self.comb_delays), self.channels), dtype='float32')
         
         # All-pass filter buffers (series)
         self.allpass_buffers = []
         self.allpass_positions = []
         
         for delay in self.allpass_delays:
-            self.allpass_buffers.append(np.zeros(delay, dtype='float32'))
+            self.allpass_buffers.append(np.zeros((delay + spread, self.channels), dtype='float32'))
             self.allpass_positions.append(0)
+        
+        # Per-channel read views, rebuilt with the buffers
+        self._columns = {}
+        
+        # Longest sub-block we can run without reading a sample written in the same sub-block
+        self.max_block = min(self.comb_delays + self.allpass_delays)
+        # Damping matrices only depend on the parameters, so a reset keeps them
+        if not hasattr(self, '_damping_cache'):
+            self._damping_cache = {}
     
     @property
     def name(self):
         return "Reverb"
     
-    def _process_comb_filter(self, input_sample, buffer, position, filter_state, index):
+    def _damping_matrices(self, length):
         """
-        Comb Filter: Feedback delay line with damping
+        Block form of the one-pole damping filter
         
-        Structure:
+        The recursion  s[n] = (1 - d) * x[n] + d * s[n-1]  unrolls over a block to
+            s = L @ x + p * s[-1]
+        with L[n, k] = (1 - d) * d^(n-k) for k <= n and p[n] = d^(n+1)
+        Cached per (block length, damping) so the recursion costs one matmul per block
+        p is returned as a column, ready for an outer product with the carried states
+        """
+        key = (length, self.damping)
+        if key not in self._damping_cache:
+            d = self.damping
+            lags = np.subtract.outer(np.arange(length), np.arange(length))
+            lower = (1 - d) * np.where(lags >= 0, d ** np.maximum(lags, 0), 0.0)
+            carry = d ** np.arange(1, length + 1)
+            self._damping_cache[key] = (
+                np.ascontiguousarray(lower, dtype='float32'),
+                np.ascontiguousarray(carry[:, None], dtype='float32'),
+            )
+        return self._damping_cache[key]
+    
+    def _channel_columns(self, length):
+        """
+        Views for reading every delay line channel by channel, cached per block length
+        Returns (comb delayed samples, comb reads, allpass delayed samples, allpass reads)
+        where each read is (buffer column, delayed column, read delay, buffer length)
+        """
+        entry = self._columns.get(length)
+        if entry is None:
+            delayed = np.zeros((length, len(self.comb_sections), self.channels), dtype='float32')
+            comb_reads = [[(section[:, c], delayed[:, j, c], delay, len(section))
+                           for c, delay in enumerate(self.comb_read_delays[j])]
+                          for j, section in enumerate(self.comb_sections)]
+            allpass_delayed = np.zeros((length, self.channels), dtype='float32')
+            allpass_reads = [[(buffer[:, c], allpass_delayed[:, c], delay, len(buffer))
+                              for c, delay in enumerate(self.allpass_read_delays[i])]
+                             for i, buffer in enumerate(self.allpass_buffers)]
+            entry = (delayed, comb_reads, allpass_delayed, allpass_reads)
+            self._columns[length] = entry
+        return entry
+    
+    def _process_comb_filters(self, block, room_size):
+        """
+        Comb Filters: Feedback delay lines with damping, all four at once
+        
+        Structure (per comb):
         Input → [+] → Delay → Damping Filter → [+] → Output
                 ↑                               ↓
                 └───────── Feedback ────────────┘
         
         The damping filter is a simple one-pole lowpass
         This simulates air absorption (high frequencies decay faster)
+        
+        Because the block is never longer than any comb delay, every delayed
+        sample read here was written by an earlier block
+        room_size is a number, or one per sample shaped like the comb states while it ramps
+        Returns the delayed samples, shape (length, combs, channels)
         """
-        # Read delayed sample
-        delayed = buffer[position]
+        length, channels = block.shape
+        combs = len(self.comb_sections)
+        delayed, comb_reads, _, _ = self._channel_columns(length)
+        filter_states = self._scratch('comb_states', (length, combs, channels))
+        carried = self._scratch('comb_carried', (length, combs, channels))
+        comb_input = self._scratch('comb_input', (length, combs, channels))
+        
+        # Read delayed samples: each comb and channel has its own read delay
+        for position, reads in zip(self.comb_positions, comb_reads):
+            for column, target, delay, size in reads:
+                read_circular(column, (position - delay) % size, target)
         
-        # Apply one-pole lowpass filter (damping)
+        # Apply one-pole lowpass filter (damping) to every comb and channel in one product
         # This is a SIMPLIFIED room absorption model
         # Real rooms absorb highs more than lows
-        filter_state = delayed * (1 - self.damping) + filter_state * self.damping
+        lower, carry = self._damping_matrices(length)
+        np.dot(lower, delayed.reshape(length, -1), out=filter_states.reshape(length, -1))
         
-        # Calculate feedback
-        feedback_gain = 0.7 * self.room_size
+        # Add the decaying tail of the states carried over from the previous block
+        # (an outer product: one decay curve times every comb and channel's state)
+        np.dot(carry, self.comb_filter_states.reshape(1, -1), out=carried.reshape(length, -1))
+        filter_states += carried
+        self.comb_filter_states[:] = filter_states[-1]
         
-        # Write: input + filtered feedback
-        buffer[position] = input_sample + filter_state * feedback_gain
-        
-        # Advance position
-        position = (position + 1) % len(buffer)
+        # Calculate feedback: 0.7 * room_size
+        filter_states *= room_size
+        filter_states *= 0.7
         
-        # Update filter state
-        self.comb_filter_states[index] = filter_state
+        # Write: input + filtered feedback
+        comb_input[:] = block[:, None, :]
+        filter_states += comb_input
+        for j, section in enumerate(self.comb_sections):
+            write_circular(section, self.comb_positions[j], filter_states[:, j])
+            
+            # Advance position
+            self.comb_positions[j] = (self.comb_positions[j] + length) % len(section)
         
-        return delayed, position
+        return delayed
     
-    def _process_allpass_filter(self, input_sample, buffer, position):
+    def _process_allpass_filter(self, block, index):
         """
         All-Pass Filter: Adds density without coloring
         
@@ -113,23 +210,33 @@ class Reverb(Effect):
         - They DON'T change frequency response (flat magnitude)
         - This makes reverb sound smooth, not metallic
         """
-        # Read delayed sample
-        delayed = buffer[position]
+        buffer = self.allpass_buffers[index]
+        position = self.allpass_positions[index]
+        length = len(block)
+        _, _, delayed, allpass_reads = self._channel_columns(length)
+        # Stages alternate between two output buffers, so a stage never overwrites its own input
+        output = self._scratch(('allpass_output', index % 2), block.shape)
+        
+        # Read delayed samples, each channel from its own delay
+        for column, target, delay, size in allpass_reads[index]:
+            read_circular(column, (position - delay) % size, target)
         
         # All-pass coefficient (typically 0.5-0.7)
         g = 0.5
         
         # All-pass formula
         # This specific structure maintains flat frequency response
-        output = -input_sample + delayed
-        buffer[position] = input_sample + delayed * g
+        np.subtract(delayed, block, out=output)
+        delayed *= g
+        delayed += block
+        write_circular(buffer, position, delayed)
         
         # Advance position
-        position = (position + 1) % len(buffer)
+        self.allpass_positions[index] = (position + length) % len(buffer)
         
-        return output, position
+        return output
     
-    def process(self, audio, frames):
+    def process_into(self, audio, out, frames):
         """
         Process with Schroeder reverb structure
         
@@ -140,41 +247,49 @@ class Reverb(Effect):
                 [Comb 4] ↗         └── Series diffusion
                   ↑
                   └── Parallel early reflections
+        
+        Runs in sub-blocks no longer than the shortest delay line, so each
+        stage is a handful of array operations instead of a per-sample loop
         """
-        out = np.empty_like(audio)
+        audio, out = self._channel_views(audio, out)
+        self._update_params()
+        # Numbers, or ramps over the whole block when a setting just changed
+        room_size = self._param('room_size', (frames, len(self.comb_sections), self.channels))
+        dry_level = self._param('dry_level', audio.shape)
+        wet_level = self._param('wet_level', audio.shape)
         
-        for i in range(frames):
-            input_sample = audio[i]
-            
-            # STAGE 1: Parallel comb filters (early reflections)
-            # These create the initial "room response"
-            comb_sum = 0.0
-            for j in range(len(self.comb_buffers)):
-                delayed, new_pos = self._process_comb_filter(
-                    input_sample,
-                    self.comb_buffers[j],
-                    self.comb_positions[j],
-                    self.comb_filter_states[j],
-                    j
-                )
-                self.comb_positions[j] = new_pos
-                comb_sum += delayed
-            
-            # Average the comb outputs
-            comb_output = comb_sum / len(self.comb_buffers)
-            
-            # STAGE 2: Series all-pass filters (diffusion)
-            # These make the reverb dense and smooth
-            allpass_output = comb_output
-            for j in range(len(self.allpass_buffers)):
-                allpass_output, new_pos = self._process_allpass_filter(
-                    allpass_output,
-                    self.allpass_buffers[j],
-                    self.allpass_positions[j]
-                )
-                self.allpass_positions[j] = new_pos
-            
-            # STAGE 3: Mix dry and wet
-            out[i] = input_sample * self.dry_level + allpass_output * self.wet_level
+        if frames <= self.max_block:
+            self._process_block(audio, out, room_size, dry_level, wet_level)
+        else:
+            for start in range(0, frames, self.max_block):
+                stop = min(start + self.max_block, frames)
+                self._process_block(audio[start:stop], out[start:stop], self._part(room_size, start, stop),
+                                    self._part(dry_level, start, stop), self._part(wet_level, start, stop))
+    
+    def _process_block(self, block, block_out, room_size, dry_level, wet_level):
+        """One sub-block through all three stages"""
+        # STAGE 1: Parallel comb filters (early reflections)
+        # These create the initial "room response"
+        # Average the comb outputs
+        delayed = self._process_comb_filters(block, room_size)
+        combs = delayed.shape[1]
+        comb_output = self._scratch('comb_output', block.shape)
+        column = self._scratch('comb_column', block.shape)
+        # Adding the strided comb columns directly would make numpy allocate
+        # iteration buffers, so each is copied out contiguously first
+        comb_output[:] = delayed[:, 0]
+        for j in range(1, combs):
+            column[:] = delayed[:, j]
+            comb_output += column
+        comb_output /= combs
+        
+        # STAGE 2: Series all-pass filters (diffusion)
+        # These make the reverb dense and smooth
+        allpass_output = comb_output
+        for j in range(len(self.allpass_buffers)):
+            allpass_output = self._process_allpass_filter(allpass_output, j)
         
-        return out
\ No newline at end of file
+        # STAGE 3: Mix dry and wet
+        np.multiply(block, dry_level, out=block_out)
+        allpass_output *= wet_level
+        block_out += allpass_output
@@ -1,5 +1,7 @@
 import numpy as np
 from .base import Effect
+from .lfo import LFO
+from .params import Param
 
 class Tremolo(Effect):
     """
@@ -11,82 +13,58 @@ class Tremolo(Effect):
     - Phase accumulation: tracking oscillator position
     """
     
+    PARAMS = {
+        'rate': Param(0.1, 20.0, ramp='exponential'),
+        'depth': Param(0.0, 1.0),
+        'waveform': Param(choices=LFO.WAVEFORMS),
+        'stereo_phase': Param(0.0, 1.0, ramp=None),
+    }
+    
     def __init__(self, sample_rate):
         # Tremolo parameters - set BEFORE super().__init__()
         self.rate = 5.0        # LFO frequency in Hz (how fast it wobbles)
         self.depth = 0.5       # 0.0 to 1.0 (how much volume change)
         self.waveform = 'sine' # 'sine', 'triangle', 'square'
+        self.stereo_phase = 0.0  # LFO phase offset per channel in cycles (0.5 = auto-pan on stereo)
         
         super().__init__(sample_rate)
     
     def reset(self):
-        self.phase = 0.0  # Current position in the LFO waveform (0 to 2π)
+        # Wavetable LFO keeps the phase (0 to 1 cycle) between blocks
+        # Every channel reads the same LFO, channel c at c * stereo_phase ahead
+        self.lfo = LFO(self.sample_rate)
+        self.channel_index = np.arange(self.channels, dtype=float)
+        self.phase_offsets = np.zeros(self.channels)
     
     @property
     def name(self):
         return "Tremolo"
     
-    def _generate_lfo_sample(self):
-        """
-        Generate one sample of the LFO waveform
-        
-        This is the heart of modulation effects!
-        The LFO creates a control signal that modulates another parameter
-        """
-        if self.waveform == 'sine':
-            # Sine wave: smooth, natural sounding
-            # Goes from -1 to +1
-            lfo = np.sin(self.phase)
-        
-        elif self.waveform == 'triangle':
-            # Triangle wave: linear ramps up and down
-            # Normalize phase to 0-1 range
-            phase_norm = self.phase / (2 * np.pi)
-            if phase_norm < 0.5:
-                lfo = 4 * phase_norm - 1  # Rising edge
-            else:
-                lfo = 3 - 4 * phase_norm  # Falling edge
-        
-        elif self.waveform == 'square':
-            # Square wave: abrupt on/off (helicopter effect)
-            lfo = 1.0 if np.sin(self.phase) >= 0 else -1.0
-        
-        else:
-            lfo = np.sin(self.phase)
-        
-        return lfo
-    
-    def process(self, audio, frames):
+    def process_into(self, audio, out, frames):
         """
-        Process audio buffer sample-by-sample
+        Process a whole audio buffer at once
         
-        Key insight: We need sample-by-sample processing for smooth modulation
-        Block processing would create audible steps
+        The LFO still produces one value per sample, so modulation is smooth,
+        but the whole block of values comes from one wavetable lookup
         """
-        out = np.empty_like(audio)
+        audio, out = self._channel_views(audio, out)
+        self._update_params()
         
-        # Calculate how much to advance phase per sample
-        # This determines the LFO frequency
-        phase_increment = 2 * np.pi * self.rate / self.sample_rate
+        # The LFO is the heart of modulation effects!
+        # It creates a control signal that modulates another parameter
+        self.lfo.rate = self.rate
+        self.lfo.waveform = self.waveform
+        np.multiply(self.channel_index, self.stereo_phase, out=self.phase_offsets)
+        rates = self._param('rate', frames) if self._params.ramping('rate') else None
+        amplitude = self.lfo.generate(frames, self._scratch('lfo', audio.shape, audio.dtype), self.phase_offsets,
+                                      rates)
         
-        for i in range(frames):
-            # Generate LFO value for this sample (-1 to +1)
-            lfo = self._generate_lfo_sample()
-            
-            # Convert LFO to amplitude multiplier
-            # Map from [-1, +1] to [1-depth, 1+depth]
-            # This creates the "tremolo" effect
-            amplitude = 1.0 + (lfo * self.depth)
-            
-            # Apply amplitude modulation
-            out[i] = audio[i] * amplitude
-            
-            # Advance the LFO phase
-            self.phase += phase_increment
-            
-            # Wrap phase to stay in 0 to 2π range
-            # Important: prevents numerical drift over time
-            if self.phase >= 2 * np.pi:
-                self.phase -= 2 * np.pi
+        # Convert LFO to amplitude multiplier
+        # Map from [-1, +1] to [1-depth, 1+depth]
+        # This creates the "tremolo" effect
+        # (depth is one value per sample while it moves to a new setting)
+        amplitude *= self._param('depth', audio.shape)
+        amplitude += 1.0
         
-        return out
\ No newline at end of file
+        # Apply amplitude modulation
+        np.multiply(audio, amplitude, out=out)
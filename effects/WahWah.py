@@ -1,7 +1,18 @@
 import numpy as np
 from .base import Effect
+from .lfo import LFO
+from .params import Param
 
 class WahWah(Effect):
+    # The filter settings switch at a block boundary rather than ramping: the
+    # sweep already steps the filter coefficients every sub_block samples
+    PARAMS = {
+        'lfo_freq': Param(0.05, 10.0, ramp='exponential'),
+        'min_freq': Param(50, 5000, ramp=None),
+        'max_freq': Param(100, 10000, ramp=None),
+        'q_factor': Param(0.5, 20.0, ramp=None),
+    }
+    
     def __init__(self, sample_rate):
         super().__init__(sample_rate)
         # Wah parameters
@@ -10,14 +21,19 @@ class WahWah(Effect):
         self.max_freq = 2500  # Maximum filter frequency
         self.q_factor = 5.0  # Resonance (higher = more pronounced wah)
         
+        # Coefficient cache resolution
+        self.table_size = 256  # Quantized center frequencies between min_freq and max_freq
+        self.sub_block = 16    # Samples per coefficient update
+        
     def reset(self):
-        # LFO phase
-        self.phase = 0.0
-        # Biquad filter state variables
-        self.x1 = 0.0
-        self.x2 = 0.0
-        self.y1 = 0.0
-        self.y2 = 0.0
+        # LFO (phase carried between blocks)
+        self.lfo = LFO(self.sample_rate)
+        # Biquad filter state variables x1, x2, y1, y2, one column per channel
+        self.state = np.zeros((4, self.channels))
+        # Coefficient table is built lazily on the first block; it only depends
+        # on the parameters, so a reset keeps it
+        if not hasattr(self, '_table_key'):
+            self._table_key = None
     
     @property
     def name(self):
@@ -45,34 +61,133 @@ class WahWah(Effect):
         
         return b0, b1, b2, a1, a2
     
-    def process(self, audio, frames):
-        out = np.empty_like(audio)
+    def _filter_response_table(self):
+        """
+        Precomputed block responses for every quantized center frequency
         
-        phase_increment = 2 * np.pi * self.lfo_freq / self.sample_rate
+        For a biquad with fixed coefficients, a sub-block of n samples is
+            y = H @ x + G @ [x1, x2, y1, y2]
+        where H is the lower-triangular matrix built from the impulse response
+        and G is the response to each state variable with zero input
+        Rebuilt only when min_freq, max_freq or q_factor change
+        """
+        key = (self.min_freq, self.max_freq, self.q_factor, self.sub_block, self.table_size)
+        if key == self._table_key:
+            return self._H, self._G
         
-        for i in range(frames):
-            # LFO creates sweep from min to max frequency
-            lfo = 0.5 * (1 + np.sin(self.phase))
-            center_freq = self.min_freq + lfo * (self.max_freq - self.min_freq)
-            
-            # Calculate filter coefficients for current center frequency
-            b0, b1, b2, a1, a2 = self._calculate_biquad_coeffs(center_freq)
-            
-            # Apply biquad filter (Direct Form II)
-            x = audio[i]
-            y = b0 * x + b1 * self.x1 + b2 * self.x2 - a1 * self.y1 - a2 * self.y2
-            
-            # Update state
-            self.x2 = self.x1
-            self.x1 = x
-            self.y2 = self.y1
-            self.y1 = y
-            
-            out[i] = y
-            
-            # Advance LFO phase
-            self.phase += phase_increment
-            if self.phase >= 2 * np.pi:
-                self.phase -= 2 * np.pi
+        n = self.sub_block
+        center_freqs = np.linspace(self.min_freq, self.max_freq, self.table_size)
+        b0, b1, b2, a1, a2 = self._calculate_biquad_coeffs(center_freqs)
         
-        return out
\ No newline at end of file
+        # Run all table entries at once, for 5 cases: an impulse, then each state variable set to 1
+        x = np.zeros((5, n))
+        x[0, 0] = 1.0
+        x1, x2, y1, y2 = (np.zeros((5, 1)) for _ in range(4))
+        x1[1] = x2[2] = y1[3] = y2[4] = 1.0
+        responses = np.empty((5, self.table_size, n))
+        for i in range(n):
+            y = b0 * x[:, i:i + 1] + b1 * x1 + b2 * x2 - a1 * y1 - a2 * y2
+            x2, x1 = x1, x[:, i:i + 1]
+            y2, y1 = y1, y
+            responses[:, :, i] = y
+        
+        # H[k, i, j] = h_k[i - j] for j <= i
+        lags = np.subtract.outer(np.arange(n), np.arange(n))
+        impulse = np.concatenate((responses[0], np.zeros((self.table_size, 1))), axis=1)
+        self._H = np.ascontiguousarray(np.where(lags >= 0, impulse[:, np.maximum(lags, 0)], 0.0))
+        self._G = np.ascontiguousarray(responses[1:].transpose(1, 2, 0))
+        self._table_key = key
+        return self._H, self._G
+    
+    def _block_layout(self, frames):
+        """
+        Sub-block geometry for a block of `frames` samples, cached for the last size seen
+        Returns (sub-block count, middle sample of each, last sample of each)
+        """
+        layout = getattr(self, '_layout', None)
+        if layout is None or layout[0] != (frames, self.sub_block):
+            n = self.sub_block
+            starts = np.arange(0, frames, n)
+            mids = np.minimum(starts + n // 2, frames - 1)
+            last = [n - 1] * len(starts)
+            last[-1] = int(frames - starts[-1] - 1)
+            layout = ((frames, n), len(starts), mids, last)
+            self._layout = layout
+        return layout[1:]
+    
+    def process_into(self, audio, out, frames):
+        audio, out = self._channel_views(audio, out)
+        self._update_params()
+        channels = self.channels
+        H, G = self._filter_response_table()
+        n = self.sub_block
+        blocks, mids, last = self._block_layout(frames)
+        
+        # LFO creates sweep from min to max frequency, one value per sample
+        self.lfo.rate = self.lfo_freq
+        rates = self._param('lfo_freq', frames) if self._params.ramping('lfo_freq') else None
+        lfo = self.lfo.generate(frames, self._scratch('lfo', frames, 'float64'), rates=rates)
+        lfo += 1
+        lfo *= 0.5
+        
+        # One coefficient update per sub-block, taken at its middle sample,
+        # interpolated between the two nearest table entries
+        frac = self._scratch('frac', blocks, 'float64')
+        whole = self._scratch('whole', blocks, 'float64')
+        index = self._scratch('index', blocks, np.intp)
+        index_next = self._scratch('index_next', blocks, np.intp)
+        lfo.take(mids, out=frac, mode='clip')
+        frac *= self.table_size - 1
+        np.floor(frac, out=whole)
+        np.minimum(whole, self.table_size - 2, out=whole)
+        frac -= whole
+        np.copyto(index, whole, casting='unsafe')
+        np.add(index, 1, out=index_next)
+        
+        # Spread each sub-block's fraction over its whole matrix, so the
+        # interpolation below runs on equal shapes with no broadcasting
+        frac_H = self._scratch('frac_H', (blocks, n * n), 'float64')
+        frac_G = self._scratch('frac_G', (blocks, n * 4), 'float64')
+        frac_H[:] = frac[:, None]
+        frac_G[:] = frac[:, None]
+        
+        H_blocks = self._scratch('H_blocks', (blocks, n, n), 'float64')
+        G_blocks = self._scratch('G_blocks', (blocks, n, 4), 'float64')
+        for table, interpolated, step, spread in (
+                (H, H_blocks, self._scratch('H_step', (blocks, n, n), 'float64'), frac_H),
+                (G, G_blocks, self._scratch('G_step', (blocks, n, 4), 'float64'), frac_G)):
+            table.take(index, axis=0, out=interpolated, mode='clip')
+            table.take(index_next, axis=0, out=step, mode='clip')
+            step -= interpolated
+            step.reshape(blocks, -1)[:] *= spread
+            interpolated += step
+        
+        x_blocks = self._scratch('x_blocks', (blocks, n, channels), 'float64')
+        padded = x_blocks.reshape(-1, channels)
+        padded[:frames] = audio
+        padded[frames:] = 0.0
+        
+        # Run the sub-blocks in order, carrying the x1/x2/y1/y2 state from one into the next
+        # Each product covers every channel: the columns of x, y and state
+        y_blocks = self._scratch('y_blocks', (blocks, n, channels), 'float64')
+        state = self.state
+        state_part = self._scratch('state_part', (n, channels), 'float64')
+        for b in range(blocks):
+            x = x_blocks[b]
+            y = y_blocks[b]
+            np.dot(H_blocks[b], x, out=y)
+            np.dot(G_blocks[b], state, out=state_part)
+            y += state_part
+            
+            end = last[b]
+            if end >= 1:
+                state[0] = x[end]
+                state[1] = x[end - 1]
+                state[2] = y[end]
+                state[3] = y[end - 1]
+            else:
+                state[1] = state[0]
+                state[0] = x[0]
+                state[3] = state[2]
+                state[2] = y[0]
+        out[:] = y_blocks.reshape(-1, channels)[:frames]
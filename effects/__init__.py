@@ -1,10 +1,58 @@
-from .Clean import Clean
-from .effect_chain import EffectChain
-from .Echo import Echo
-from .Gain import Gain
-from .WahWah import WahWah
-from .Reverb import Reverb
-from .Tremolo import Tremolo
-from .Looper import Looper
-
-__all__ = ['Clean', 'EffectChain', 'Echo', 'Gain', 'WahWah', 'Reverb', 'Tremolo', 'Looper']
\ No newline at end of file
+"""
+Effects, each imported the first time it's used
+
+`from effects import Reverb` works as always, but only Reverb's module is
+imported (PEP 562 module __getattr__), so loading the package is cheap.
+`from effects.Reverb import Reverb` works too. Importing a submodule binds
+it on the package under its own name, which for most effects is the class's
+name, so the package binds the class there instead: `effects.Reverb` is
+always the class, however it was first imported
+"""
+import importlib
+import sys
+import types
+
+# Class -> the module that defines it
+_MODULES = {
+    'Clean': '.Clean',
+    'EffectChain': '.effect_chain',
+    'Echo': '.Echo',
+    'Gain': '.Gain',
+    'WahWah': '.WahWah',
+    'Reverb': '.Reverb',
+    'Tremolo': '.Tremolo',
+    'Looper': '.Looper',
+    'Convolution': '.Convolution',
+    'PitchShifter': '.PitchShifter',
+    'NoiseGate': '.dynamics',
+    'Compressor': '.dynamics',
+    'PresetBank': '.preset_bank',
+    'LazyEffect': '.registry',
+}
+
+__all__ = list(_MODULES)
+
+
+class _Package(types.ModuleType):
+    """The package's module type: a submodule bound over a class's name binds the class"""
+
+    def __setattr__(self, name, value):
+        if name in _MODULES and isinstance(value, types.ModuleType):
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
+
+
+def __getattr__(name):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
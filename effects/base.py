@@ -1,15 +1,113 @@
+import math
+import numpy as np
+from .params import Parameters
+
 class Effect:
     """Base Class for all effects"""
 
+    # Declared parameters: attribute name -> params.Param
+    PARAMS = {}
+
     def __init__(self, sample_rate):
         self.sample_rate = sample_rate
+        # Per-channel state is sized for this many channels; follows the audio
+        self.channels = 1
+        self._params = Parameters(self)
         self.reset()
     def reset(self):
         """reset effect state"""
         pass
     def process(self, audio, frames):
-        raise NotImplementedError
+        """
+        Process one block and return the result as a new array
+        `audio` is (frames,) for mono or (frames, channels)
+        """
+        if type(self).process_into is Effect.process_into:
+            raise NotImplementedError
+        out = np.empty_like(audio)
+        self.process_into(audio, out, frames)
+        return out
+    def process_into(self, audio, out, frames):
+        """
+        Process one block into `out`, a preallocated array shaped like `audio`
+        `out` must not be the same array as `audio`
+
+        Effects that can run without allocating override this; the default
+        falls back to process() and copies its result
+        """
+        out[...] = self.process(audio, frames)
+    def load(self):
+        """Get ready to play; called when the effect is enabled. A built effect already is"""
+        pass
+    def ready(self):
+        """Whether load() is done"""
+        return True
+    def pointwise(self):
+        """
+        This effect as steps applied to each sample on its own, with its current
+        settings: ('scale', k) and ('curve', name), [] if it leaves audio as it
+        is, or None (the default) if it has memory. Chains run neighbouring
+        pointwise effects as one pass (see pointwise.py)
+        """
+        return None
+    def param_changes(self):
+        """How many parameter changes were set so far; a fused chain stage watches it"""
+        return self._params.changes
+    def param_names(self):
+        return list(self.PARAMS)
+    def set_param(self, name, value, ramp=True):
+        """
+        Change a declared parameter from any thread; returns the value as applied (clamped)
+        It takes effect at the start of the next block, ramped over that block
+        unless ramp=False. Raises AttributeError for an undeclared name
+        """
+        return self._params.set(name, value, ramp)
+    def get_param(self, name):
+        """Latest value set for a declared parameter, even if not applied yet"""
+        return self._params.get(name)
+    def _update_params(self):
+        """Audio thread, at the start of each block: apply queued parameter changes"""
+        self._params.update()
+    def _param(self, name, shape, axis=0):
+        """
+        A parameter over this block: a scalar when steady, else an array of
+        `shape` ramping to its new value along the time axis
+        """
+        return self._params.values(name, shape, axis)
+    @staticmethod
+    def _part(value, start, stop):
+        """A sub-block's share of a _param() value: ramps are sliced, numbers pass through"""
+        return value[start:stop] if isinstance(value, np.ndarray) else value
+    def _channel_views(self, audio, out):
+        """
+        (frames, channels) views of a block and its output buffer, with a 1-D
+        mono block as a single channel. Blocks may be either shape; when the
+        channel count changes, per-channel state is rebuilt with reset()
+        """
+        if audio.ndim == 1:
+            audio = audio.reshape(-1, 1)
+            out = out.reshape(-1, 1)
+        if audio.shape[1] != self.channels:
+            self.channels = audio.shape[1]
+            self.reset()
+        return audio, out
+    def _scratch(self, key, shape, dtype='float32'):
+        """
+        Preallocated work buffer, reused between blocks
+        Only reallocated when a bigger one than ever before is needed
+        """
+        buffers = self.__dict__.setdefault('_scratch_buffers', {})
+        entry = buffers.get(key)
+        if entry is not None and entry[1] == shape and entry[2] == dtype:
+            return entry[3]
+        size = math.prod(shape) if isinstance(shape, tuple) else shape
+        buffer = entry[0] if entry is not None else None
+        if buffer is None or buffer.size < size or entry[2] != dtype:
+            buffer = np.zeros(size, dtype=dtype)
+        view = buffer[:size].reshape(shape)
+        buffers[key] = (buffer, shape, dtype, view)
+        return view
     @property
     def name(self):
         """Effect name for display"""
-        return self.__class__.__name__
\ No newline at end of file
+        return self.__class__.__name__
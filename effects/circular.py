@@ -0,0 +1,29 @@
+"""
+Circular buffer block access
+
+A block that is no longer than the buffer touches at most two contiguous
+slices of it: up to the end, then from the start
+"""
+
+
+def read_circular(buffer, start, out):
+    """Copy len(out) samples starting at `start` from the circular buffer into out"""
+    length = len(out)
+    end = start + length
+    if end <= len(buffer):
+        out[:] = buffer[start:end]
+    else:
+        split = len(buffer) - start
+        out[:split] = buffer[start:]
+        out[split:] = buffer[:length - split]
+
+
+def write_circular(buffer, start, values):
+    """Write values into the circular buffer starting at `start`"""
+    end = start + len(values)
+    if end <= len(buffer):
+        buffer[start:end] = values
+    else:
+        split = len(buffer) - start
+        buffer[start:] = values[:split]
+        buffer[:end - len(buffer)] = values[split:]
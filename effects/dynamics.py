@@ -0,0 +1,257 @@
+"""
+Dynamics: a noise gate and a compressor, both driven by an envelope follower
+
+Both follow the level of the input and turn it down by a gain worked out
+from that level: the gate when it falls below the threshold (hiss and hum
+between notes, loud with a lot of drive), the compressor when it rises
+above it (evening out picking, more sustain). Level and gain are worked out
+a whole block at a time, where a textbook version loops over every sample:
+
+- Envelope: two one-pole lowpass filters on the rectified input, a fast
+  one (attack) and a slow one (release), and the envelope is the larger of
+  the two: it rises at the attack rate and, after a held note, falls at the
+  release rate. Each filter runs block-recursively like Reverb's damping,
+  one matrix product plus the state carried in from the last block
+- Gain computer: the gain in dB for every sample of the envelope at once,
+  in a handful of array operations
+
+The settings only change numbers in arrays of a fixed size, so a block
+costs the same whatever they are
+"""
+import math
+import numpy as np
+from config import (GATE_THRESHOLD_DB, GATE_RANGE_DB, GATE_ATTACK_MS, GATE_RELEASE_MS,
+                    COMPRESSOR_THRESHOLD_DB, COMPRESSOR_RATIO, COMPRESSOR_ATTACK_MS, COMPRESSOR_RELEASE_MS,
+                    COMPRESSOR_KNEE_DB, COMPRESSOR_MAKEUP_DB)
+from .base import Effect
+from .params import Param
+
+# Longest stretch the envelope runs as one matrix product; longer blocks go in pieces
+ENVELOPE_BLOCK = 128
+# Levels are floored here (-120 dB), so there is always a logarithm to take
+LEVEL_FLOOR = 1e-6
+# Below the gate's threshold, every dB quieter comes out this many dB quieter:
+# steep enough to shut, but with no edge to chatter on as the level crosses it
+GATE_SLOPE = 10.0
+
+
+def one_pole_matrices(length, attack, release):
+    """
+    Block form of the attack and release one-pole filters
+
+    The recursion  s[n] = (1 - a) * x[n] + a * s[n-1]  unrolls over a block to
+        s = L @ x + p * s[-1]
+    with L[n, k] = (1 - a) * a^(n-k) for k <= n and p[n] = a^(n+1)
+    Both filters' L are stacked into one (2 * length, length) matrix and
+    their p into a (2 * length, 2) one, so a block is two products
+    """
+    lags = np.subtract.outer(np.arange(length), np.arange(length))
+    lower = np.empty((2 * length, length))
+    carry = np.zeros((2 * length, 2))
+    for i, a in enumerate((attack, release)):
+        rows = slice(i * length, (i + 1) * length)
+        lower[rows] = (1 - a) * np.where(lags >= 0, a ** np.maximum(lags, 0), 0.0)
+        carry[rows, i] = a ** np.arange(1, length + 1)
+    return np.ascontiguousarray(lower, dtype='float32'), np.ascontiguousarray(carry, dtype='float32')
+
+
+class Envelope:
+    """
+    Attack/release envelope follower working on whole blocks
+
+    The two filters' last values are carried from block to block. Their
+    matrices are kept per block length until attack or release change
+    """
+
+    def __init__(self, sample_rate, attack_ms, release_ms):
+        self.sample_rate = sample_rate
+        self.attack_ms = attack_ms
+        self.release_ms = release_ms
+        self.state = np.zeros(2, dtype='float32')
+        self._both = np.zeros(2 * ENVELOPE_BLOCK, dtype='float32')
+        self._carried = np.zeros(2 * ENVELOPE_BLOCK, dtype='float32')
+        self._times = None
+        self._matrices = {}
+
+    def _coefficient(self, ms):
+        """Pole for a time constant: the filter covers 1 - 1/e of a step in `ms`"""
+        return math.exp(-1000.0 / (ms * self.sample_rate))
+
+    def _block_matrices(self, length):
+        times = (self.attack_ms, self.release_ms)
+        if times != self._times:
+            self._times = times
+            self._matrices = {}
+        matrices = self._matrices.get(length)
+        if matrices is None:
+            matrices = self._matrices[length] = one_pole_matrices(
+                length, self._coefficient(self.attack_ms), self._coefficient(self.release_ms))
+        return matrices
+
+    def process(self, level, out):
+        """Envelope of `level`, the rectified input (frames,), into out (frames,)"""
+        for start in range(0, len(level), ENVELOPE_BLOCK):
+            piece = level[start:start + ENVELOPE_BLOCK]
+            length = len(piece)
+            lower, carry = self._block_matrices(length)
+            both = self._both[:2 * length]
+            carried = self._carried[:2 * length]
+            np.dot(lower, piece, out=both)
+            np.dot(carry, self.state, out=carried)
+            both += carried
+            self.state[0] = both[length - 1]
+            self.state[1] = both[-1]
+            np.maximum(both[:length], both[length:], out=out[start:start + length])
+
+
+class _Dynamics(Effect):
+    """
+    Shared by the gate and the compressor: level, envelope, gain, applied
+
+    One envelope follows the loudest channel and sets the gain for all of
+    them, so a stereo image doesn't wander. Subclasses give the gain
+    computer, _gain_db()
+    """
+
+    def reset(self):
+        self.envelope = Envelope(self.sample_rate, self.attack_ms, self.release_ms)
+
+    def _gain_db(self, level_db, gain_db, frames):
+        """Gain in dB for every sample's envelope level in dB, into gain_db"""
+        raise NotImplementedError
+
+    def process_into(self, audio, out, frames):
+        audio, out = self._channel_views(audio, out)
+        self._update_params()
+        envelope = self.envelope
+        envelope.attack_ms = self.attack_ms
+        envelope.release_ms = self.release_ms
+
+        # Rectified level of the loudest channel. Channels go a column at a time
+        # here and below: numpy reduces or broadcasts across them through a
+        # buffered iterator, which allocates every block
+        rectified = self._scratch('rectified', audio.shape)
+        level = self._scratch('level', frames)
+        np.abs(audio, out=rectified)
+        np.copyto(level, rectified[:, 0])
+        for channel in range(1, self.channels):
+            np.maximum(level, rectified[:, channel], out=level)
+
+        # Envelope, in dB
+        level_db = self._scratch('level_db', frames)
+        envelope.process(level, level_db)
+        np.maximum(level_db, LEVEL_FLOOR, out=level_db)
+        np.log10(level_db, out=level_db)
+        level_db *= 20.0
+
+        # Gain: in dB from the gain computer, then as a factor
+        gain = self._scratch('gain', frames)
+        self._gain_db(level_db, gain, frames)
+        gain *= math.log(10.0) / 20.0
+        np.exp(gain, out=gain)
+        for channel in range(self.channels):
+            np.multiply(audio[:, channel], gain, out=out[:, channel])
+
+
+class NoiseGate(_Dynamics):
+    """
+    Noise Gate: silence between notes
+
+    Key Concepts:
+    - Threshold: below this level the input is taken to be noise
+    - Range: how far down the gate goes when shut (90 dB is silence)
+    - Attack: how fast it opens when a note starts; release: how slowly it
+      closes as the note dies away, so the tail isn't cut off
+    - Expander: rather than switching, the gate turns the level down
+      GATE_SLOPE dB for every dB under the threshold, so a note hovering
+      there fades rather than chatters
+    """
+
+    PARAMS = {
+        'threshold_db': Param(-90.0, 0.0),
+        'range_db': Param(0.0, 90.0, ramp=None),
+        'attack_ms': Param(0.1, 50.0, ramp=None),
+        'release_ms': Param(5.0, 2000.0, ramp=None),
+    }
+
+    def __init__(self, sample_rate):
+        # Gate parameters - set BEFORE super().__init__()
+        self.threshold_db = GATE_THRESHOLD_DB   # Level (dBFS) below which it closes
+        self.range_db = GATE_RANGE_DB           # Attenuation when fully closed
+        self.attack_ms = GATE_ATTACK_MS         # Opening time
+        self.release_ms = GATE_RELEASE_MS       # Closing time
+
+        super().__init__(sample_rate)
+
+    @property
+    def name(self):
+        return "Noise Gate"
+
+    def _gain_db(self, level_db, gain_db, frames):
+        # GATE_SLOPE dB down for each dB under the threshold, never more than the range
+        np.subtract(level_db, self._param('threshold_db', frames), out=gain_db)
+        np.minimum(gain_db, 0.0, out=gain_db)
+        gain_db *= GATE_SLOPE
+        np.maximum(gain_db, -self.range_db, out=gain_db)
+
+
+class Compressor(_Dynamics):
+    """
+    Compressor (feed-forward): loud notes turned down, quiet ones left alone
+
+    Key Concepts:
+    - Threshold: above this level the gain comes down
+    - Ratio: above the threshold, `ratio` dB more input gives 1 dB more
+      output (4:1 evens picking out, 20:1 is a limiter)
+    - Knee: the ratio comes in gradually over this many dB around the
+      threshold, rather than all at once
+    - Makeup gain: brings the compressed signal back up to level
+    - Feed-forward: the gain comes from the input's level, not the output's
+    """
+
+    PARAMS = {
+        'threshold_db': Param(-60.0, 0.0),
+        'ratio': Param(1.0, 20.0, ramp=None),
+        'attack_ms': Param(0.1, 100.0, ramp=None),
+        'release_ms': Param(5.0, 2000.0, ramp=None),
+        'knee_db': Param(0.0, 24.0, ramp=None),
+        'makeup_db': Param(0.0, 24.0),
+    }
+
+    def __init__(self, sample_rate):
+        # Compressor parameters - set BEFORE super().__init__()
+        self.threshold_db = COMPRESSOR_THRESHOLD_DB
+        self.ratio = COMPRESSOR_RATIO
+        self.attack_ms = COMPRESSOR_ATTACK_MS
+        self.release_ms = COMPRESSOR_RELEASE_MS
+        self.knee_db = COMPRESSOR_KNEE_DB
+        self.makeup_db = COMPRESSOR_MAKEUP_DB
+
+        super().__init__(sample_rate)
+
+    @property
+    def name(self):
+        return "Compressor"
+
+    def _gain_db(self, level_db, gain_db, frames):
+        """
+        Soft knee of width W: with o the level over the threshold, the
+        compressed amount is max(o - W/2, 0) plus t^2 / 2W, t being o + W/2
+        held to 0..W; above the knee that adds up to o, below it to 0.
+        A hard knee is a very narrow soft one, so every block takes the same steps
+        """
+        knee = max(self.knee_db, 1e-3)
+        over = gain_db
+        np.subtract(level_db, self._param('threshold_db', frames), out=over)
+        bend = self._scratch('knee', frames)
+        np.add(over, knee / 2, out=bend)
+        np.maximum(bend, 0.0, out=bend)
+        np.minimum(bend, knee, out=bend)
+        bend *= bend
+        bend *= 1.0 / (2 * knee)
+        over -= knee / 2
+        np.maximum(over, 0.0, out=over)
+        over += bend
+        # Everything over is turned down to 1/ratio of it
+        over *= 1.0 / self.ratio - 1.0
+        over += self._param('makeup_db', frames)
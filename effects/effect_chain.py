@@ -1,11 +1,30 @@
+import threading
+import time
 from .base import Effect
+from .pointwise import PointwiseStage
 
 class EffectChain(Effect):
-    """Manage multiple effects in series"""
+    """
+    Manage multiple effects in series
+
+    Switching an effect compiles the chain into a plan: the stages the audio
+    actually goes through. Effects that are off, and ones that leave audio as
+    it is (Clean), aren't in it; runs of neighbouring pointwise effects (see
+    pointwise.py) become one fused stage. The plan is a tuple, swapped in with
+    one assignment, so process_into always plays a whole plan, old or new
+    """
 
     def __init__(self, sample_rate):
         self.effects = []
         self.active_states = []
+        self.requested_states = []
+        # (index of its first effect, stage) per stage the audio goes through
+        self._plan = ()
+        # Switches come from the menu, effects finishing setup from the setup thread
+        self._compile_lock = threading.RLock()
+        self._reset_requested = False
+        # Optional engine.CallbackStats; a stage is timed under its first effect's index
+        self.stats = None
         super().__init__(sample_rate)
     
     @property
@@ -14,26 +33,68 @@ class EffectChain(Effect):
     
     def add_effect(self, effect, active=True):
         """add effect"""
-        self.effects.append(effect)
-        self.active_states.append(active)
+        with self._compile_lock:
+            self.effects.append(effect)
+            self.active_states.append(active)
+            self.requested_states.append(active)
+            self._compile()
     
     def toggle_effect(self, index):
-        """toggle effect"""
+        """toggle effect; takes effect at the start of the next block"""
         if 0 <= index < len(self.effects):
-            self.active_states[index] = not self.active_states[index]
+            with self._compile_lock:
+                self.requested_states[index] = not self.requested_states[index]
+                self._compile()
             return True
         return False
+
+    def _compile(self):
+        """Build the plan for the switches asked for and publish it"""
+        with self._compile_lock:
+            plan = []
+            run = []
+            for index, effect in enumerate(self.effects):
+                if not self.requested_states[index]:
+                    continue
+                if not effect.ready():
+                    # Dry until its setup is done; it may fuse with its neighbours after
+                    future = effect.load()
+                    if not future.done():
+                        future.add_done_callback(self._recompile)
+                steps = effect.pointwise()
+                if steps == []:
+                    continue
+                if steps is not None:
+                    run.append((index, effect))
+                    continue
+                self._end_run(run, plan)
+                plan.append((index, effect))
+            self._end_run(run, plan)
+            self.active_states = list(self.requested_states)
+            self._plan = tuple(plan)
+
+    @staticmethod
+    def _end_run(run, plan):
+        """Add a run of pointwise effects to the plan (fused if there's more than one) and empty it"""
+        if len(run) == 1:
+            plan.append(run[0])
+        elif run:
+            plan.append((run[0][0], PointwiseStage(effect for _, effect in run)))
+        run.clear()
+
+    def _recompile(self, future):
+        self._compile()
     
     def is_active(self, index):
-        """is effect active"""
+        """is effect active (or switched on and waiting for the next block)"""
         if 0 <= index < len(self.effects):
-            return self.active_states[index]
+            return self.requested_states[index]
         return False
     
     def get_status_display(self):
         lines = []
-        for i, (effect, active) in enumerate(zip(self.effects, self.active_states)):
-            status = "ON - " if active else "OFF - "
+        for i, effect in enumerate(self.effects):
+            status = "ON - " if self.is_active(i) else "OFF - "
             lines.append(f" {i+1}. [{status}] {effect.name}")
         return "\n".join(lines)
     
@@ -42,11 +103,37 @@ class EffectChain(Effect):
         for effect in self.effects:
             effect.reset()
     
-    def process(self, audio, frames):
-        """Processes audio thu active effects in series"""
-        out = audio.copy()
+    def request_reset(self):
+        """Reset all effects from another thread, at the start of the next block"""
+        self._reset_requested = True
+    
+    def process_into(self, audio, out, frames):
+        """
+        Processes audio thru the current plan's stages in series
+
+        Each stage writes into one of two preallocated scratch buffers in
+        turn (ping-pong), and the last stage writes straight into out
+        """
+        if self._reset_requested:
+            self._reset_requested = False
+            self.reset()
+        # Read once: a switch meanwhile publishes a new plan for the next block
+        plan = self._plan
+        if not plan:
+            out[:] = audio
+            return
 
-        for effect, active in zip(self.effects, self.active_states):
-            if active:
-                out = effect.process(out,frames)
-        return out
\ No newline at end of file
+        pingpong = (self._scratch('ping', audio.shape, audio.dtype), self._scratch('pong', audio.shape, audio.dtype))
+        src = audio
+        turn = 0
+        last = len(plan) - 1
+        for i, (index, stage) in enumerate(plan):
+            dst = out if i == last else pingpong[turn]
+            if self.stats is not None:
+                start = time.perf_counter()
+                stage.process_into(src, dst, frames)
+                self.stats.record_stage(index, time.perf_counter() - start)
+            else:
+                stage.process_into(src, dst, frames)
+            src = dst
+            turn ^= 1
@@ -0,0 +1,116 @@
+"""
+Impulse responses for the Convolution effect
+
+An impulse response (IR) is a recording of how a room or a speaker cabinet
+answers a single click; convolving a dry signal with it puts the signal in
+that room or through that cabinet. For block convolution the IR is cut into
+partitions of one block each, and every partition is kept as a spectrum.
+Computing those spectra means reading, resampling and transforming the
+whole IR, so they are cached on disk, keyed by the IR file's hash, the
+sample rate and the block size
+"""
+import hashlib
+import os
+import numpy as np
+from wavfile import WavReader
+
+# Bump when the cached layout changes, so old cache files are not read
+CACHE_VERSION = 1
+
+
+def synthetic_ir(sample_rate, seconds=1.5, rt60=1.2, seed=0):
+    """
+    A stand-in room when no IR file is configured: noise decaying by 60 dB
+    over rt60 seconds with the highs rolled off, shape (frames, 1)
+    """
+    rng = np.random.default_rng(seed)
+    frames = int(sample_rate * seconds)
+    t = np.arange(frames) / sample_rate
+    ir = rng.standard_normal(frames) * 10 ** (-3 * t / rt60)
+    # Gentle lowpass (one pole at 6 kHz): real rooms absorb the highs
+    spectrum = np.fft.rfft(ir)
+    freqs = np.fft.rfftfreq(frames, 1 / sample_rate)
+    spectrum /= np.sqrt(1 + (freqs / 6000.0) ** 2)
+    ir = np.fft.irfft(spectrum, frames)
+    ir /= np.sqrt(np.sum(ir ** 2))
+    return ir[:, None].astype('float32')
+
+
+def resample(ir, from_rate, to_rate):
+    """Band-limited resampling of an IR (frames, channels) by zero-padding or truncating its spectrum"""
+    if from_rate == to_rate:
+        return ir
+    frames = len(ir)
+    target = max(1, int(round(frames * to_rate / from_rate)))
+    spectrum = np.fft.rfft(ir, axis=0)
+    bins = target // 2 + 1
+    if bins <= len(spectrum):
+        spectrum = spectrum[:bins]
+    else:
+        spectrum = np.concatenate((spectrum, np.zeros((bins - len(spectrum), ir.shape[1]), spectrum.dtype)))
+    return (np.fft.irfft(spectrum, target, axis=0) * (target / frames)).astype('float32')
+
+
+def load_ir(path, sample_rate):
+    """Read an IR WAV file as float32 (frames, channels) at `sample_rate`"""
+    with WavReader(path) as reader:
+        ir = reader.read(0, reader.frames)
+        ir_rate = reader.sample_rate
+    return resample(ir, ir_rate, sample_rate)
+
+
+def partition_spectra(ir, block_size):
+    """
+    Spectra of the IR cut into block_size partitions, shape (partitions, channels, block_size + 1)
+
+    Each partition is zero-padded to two blocks before its transform, so
+    multiplying spectra gives linear rather than circular convolution
+    """
+    frames, channels = ir.shape
+    partitions = max(1, -(-frames // block_size))
+    whole = np.zeros((partitions * block_size, channels))
+    whole[:frames] = ir
+    padded = np.zeros((partitions, 2 * block_size, channels))
+    padded[:, :block_size] = whole.reshape(partitions, block_size, channels)
+    spectra = np.fft.rfft(padded, axis=1)
+    return np.ascontiguousarray(spectra.transpose(0, 2, 1), dtype='complex64')
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path(cache_dir, digest, sample_rate, block_size):
+    name = f"{digest[:32]}_{sample_rate}_{block_size}_v{CACHE_VERSION}.npy"
+    return os.path.join(os.path.expanduser(cache_dir), name)
+
+
+def cached_spectra(path, sample_rate, block_size, cache_dir):
+    """
+    Partition spectra for an IR file, from the disk cache when they're there
+    Returns (spectra, whether they came from the cache)
+    """
+    cached = cache_path(cache_dir, file_digest(path), sample_rate, block_size) if cache_dir else None
+    if cached is not None and os.path.exists(cached):
+        try:
+            return np.load(cached), True
+        except (OSError, ValueError):
+            pass  # Unreadable cache file: compute it again and overwrite it
+
+    spectra = partition_spectra(load_ir(path, sample_rate), block_size)
+    if cached is not None:
+        try:
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            # Write then rename, so a reader never sees a half-written file
+            temporary = f"{cached}.{os.getpid()}.tmp"
+            with open(temporary, 'wb') as f:
+                np.save(f, spectra)
+            os.replace(temporary, cached)
+        except OSError:
+            pass  # A read-only cache only costs load time
+    return spectra, False
@@ -0,0 +1,152 @@
+import numpy as np
+
+TABLE_SIZE = 2048
+HARMONICS = 64
+
+_tables = {}
+
+
+def _build_table(waveform):
+    """
+    Build one cycle of a band-limited waveform by additive synthesis
+
+    Triangle and square are summed from their odd harmonics, with Lanczos
+    sigma factors to smooth out the Gibbs ripple, then normalised to ±1
+    Phases match the old per-sample LFOs: sine and square start at 0 and
+    rise, triangle starts at -1 and peaks half way through the cycle
+    """
+    x = 2 * np.pi * np.arange(TABLE_SIZE) / TABLE_SIZE
+
+    if waveform == 'sine':
+        table = np.sin(x)
+    elif waveform in ('triangle', 'square'):
+        table = np.zeros(TABLE_SIZE)
+        for k in range(1, HARMONICS + 1, 2):
+            sigma = np.sinc(k / (HARMONICS + 1))
+            if waveform == 'triangle':
+                table -= sigma * np.cos(k * x) / k ** 2
+            else:
+                table += sigma * np.sin(k * x) / k
+        table /= np.abs(table).max()
+    else:
+        raise ValueError(f"Unknown LFO waveform: {waveform}")
+
+    # Guard point so interpolation at the end of the table never wraps
+    return np.append(table, table[0])
+
+
+def wavetable(waveform):
+    """Shared precomputed table for a waveform ('sine', 'triangle' or 'square')"""
+    if waveform not in _tables:
+        _tables[waveform] = _build_table(waveform)
+    return _tables[waveform]
+
+
+class LFO:
+    """
+    Wavetable oscillator with a block-at-a-time phase accumulator
+
+    Phase is kept in cycles (0 to 1) and carried between calls, so
+    consecutive blocks join up without a discontinuity
+    """
+
+    WAVEFORMS = ('sine', 'triangle', 'square')
+
+    def __init__(self, sample_rate, rate=1.0, waveform='sine', phase=0.0):
+        self.sample_rate = sample_rate
+        self.rate = rate          # Oscillator frequency in Hz
+        self.waveform = waveform
+        self.reset(phase)
+
+    def reset(self, phase=0.0):
+        self.phase = phase % 1.0
+
+    def _work_buffers(self, frames, channels=None):
+        """
+        Preallocated phase/index buffers, grown only when a longer block arrives
+        Views for the last block shape are kept so steady-state calls create nothing
+        channels=None means 1-D buffers; otherwise they are (frames, channels)
+        """
+        shape = (frames,) if channels is None else (frames, channels)
+        work = getattr(self, '_work', None)
+        if work is not None and work[0] == shape:
+            return work[1]
+        size = frames * (channels or 1)
+        if work is None or len(work[2]) < size:
+            storage = (np.empty(size), np.empty(size), np.empty(size),
+                       np.empty(size, dtype=np.intp), np.empty(size))
+        else:
+            storage = work[2:]
+        views = tuple(buffer[:size].reshape(shape) for buffer in storage)
+        # Sample index ramp, down every column when there are channels
+        views[0][:] = np.arange(frames) if channels is None else np.arange(frames)[:, None]
+        self._work = (shape, views) + storage
+        return views
+
+    def _rate_steps(self, frames):
+        """Preallocated (rates, running sum) buffers for per-sample phase increments"""
+        steps = getattr(self, '_steps', None)
+        if steps is None or len(steps[0]) != frames:
+            steps = self._steps = (np.empty(frames), np.empty(frames))
+        return steps
+
+    def generate(self, frames, out=None, offsets=None, rates=None):
+        """
+        Return the next `frames` LFO values in the range -1 to +1
+        Written into `out` (any float dtype, length `frames`) when given, without allocating
+
+        With `offsets` (one phase offset in cycles per channel) the result is
+        (frames, channels): the same oscillator read at a different phase for
+        each channel, e.g. 0.5 for the second channel of a stereo auto-pan
+
+        `rates` (Hz, one per sample) overrides `rate` for this block, so a
+        rate change can glide instead of jumping
+        """
+        # Unknown waveforms fall back to sine
+        table = wavetable(self.waveform if self.waveform in self.WAVEFORMS else 'sine')
+        increment = self.rate / self.sample_rate
+        channels = None if offsets is None else len(offsets)
+        ramp, position, whole, index, values = self._work_buffers(frames, channels)
+        if out is None:
+            out = np.empty(ramp.shape)
+        if out.dtype == values.dtype:
+            values = out
+
+        # Phase of every sample in the block, wrapped to one cycle
+        if rates is None:
+            np.multiply(ramp, increment, out=position)
+            advance = increment * frames
+        else:
+            # Each sample advances by its own increment: phase is the running sum
+            # of the increments before it
+            # (rates are copied to float64 first: cumsum would otherwise buffer the cast)
+            rates_copy, steps = self._rate_steps(frames)
+            np.copyto(rates_copy, rates)
+            np.cumsum(rates_copy, out=steps)
+            advance = float(steps[-1]) / self.sample_rate
+            steps -= rates_copy
+            steps /= self.sample_rate
+            position[...] = steps if channels is None else steps[:, None]
+        position += self.phase
+        if offsets is not None:
+            # Spread the offsets down the block first, so the add is shape for shape
+            whole[:] = offsets
+            position += whole
+        np.remainder(position, 1.0, out=position)
+        self.phase = (self.phase + advance) % 1.0
+
+        # Linear interpolation between neighbouring table entries
+        position *= TABLE_SIZE
+        np.floor(position, out=whole)
+        np.copyto(index, whole, casting='unsafe')
+        position -= whole
+        table.take(index, out=values, mode='clip')
+        index += 1
+        table.take(index, out=whole, mode='clip')
+        whole -= values
+        whole *= position
+        values += whole
+
+        if values is not out:
+            out[:] = values
+        return out
@@ -0,0 +1,244 @@
+"""
+Loop storage: a memory-mapped scratch file with a RAM working window
+
+A loop of many minutes doesn't fit in a Pi's RAM as a numpy array, and
+allocating one on every new recording is slow. Instead the loop lives in a
+sparse, already deleted temporary file mapped into memory: the audio thread
+reads and writes it as a plain array, and the kernel pages it in and out.
+
+To keep those page faults (disk reads) out of the audio callback, a pager
+thread follows the record or play position a few times a second. It asks
+the kernel to read ahead of the position, and writes back and releases
+everything outside the working window. While the loop is being written it
+also dirties the pages ahead itself, since the first write to a page of a
+file costs the filesystem far more than a block's deadline. The loop's start always stays
+resident, so playback can wrap round to it. Loops that fit in the window
+are never paged out at all
+"""
+import mmap
+import os
+import tempfile
+import threading
+import weakref
+import numpy as np
+
+# Seconds between pager passes
+PAGER_INTERVAL = 0.05
+
+_PAGE = mmap.PAGESIZE
+_CAN_ADVISE = hasattr(mmap.mmap, 'madvise') and hasattr(mmap, 'MADV_DONTNEED')
+
+
+def _subtract(ranges, keep):
+    """The parts of sorted (start, end) `ranges` that no range in `keep` covers"""
+    left = []
+    for start, end in ranges:
+        for kept_start, kept_end in keep:
+            if kept_end <= start or kept_start >= end:
+                continue
+            if kept_start > start:
+                left.append((start, kept_start))
+            start = max(start, kept_end)
+        if start < end:
+            left.append((start, end))
+    return left
+
+
+class LoopStorage:
+    """
+    (frames, channels) loop buffer backed by a scratch file, float32 unless
+    `dtype` says otherwise (overdub layers may be int16)
+
+    `buffer` is the array the audio thread uses. A loop loaded from a WAV
+    file replaces it with a copy-on-write map of that file until clear()
+    """
+
+    def __init__(self, frames, channels, window_frames, scratch_dir=None, dtype='float32'):
+        self.frames = frames
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self.frame_bytes = channels * self.dtype.itemsize
+        # Read ahead of the position and keep behind it, and the loop start kept for wrapping
+        self.ahead = max(1, window_frames // 2)
+        self.behind = max(1, window_frames // 8)
+        # The pager only does anything once the position has moved this far
+        self.step = max(1, window_frames // 32)
+
+        self._file = tempfile.TemporaryFile(dir=os.path.expanduser(scratch_dir) if scratch_dir else None)
+        size = frames * self.frame_bytes
+        # Truncating up makes a sparse file: no disk is used until samples are written
+        self._file.truncate(size)
+        self._scratch_map = mmap.mmap(self._file.fileno(), size)
+        self._scratch_bytes = np.frombuffer(self._scratch_map, dtype=np.uint8)
+        self.scratch = np.frombuffer(self._scratch_map, dtype=self.dtype).reshape(frames, channels)
+
+        # (map, bytes before the audio in it, file to write back to), swapped in one assignment
+        self._active = (self._scratch_map, 0, self._file.fileno())
+        self.buffer = self.scratch
+
+        self._state = None
+        self._kept = None   # Frame ranges held at the last pager pass
+        self._key = None
+        self._position = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def clear(self):
+        """Back to the scratch file; nothing is reallocated or zeroed, the length says what's valid"""
+        if _CAN_ADVISE:
+            # The old loop is garbage now: drop its pages unwritten, and its disk blocks where the filesystem can
+            try:
+                self._scratch_map.madvise(getattr(mmap, 'MADV_REMOVE', mmap.MADV_DONTNEED))
+            except OSError:
+                self._scratch_map.madvise(mmap.MADV_DONTNEED)
+        self._active = (self._scratch_map, 0, self._file.fileno())
+        self.buffer = self.scratch
+        self._kept = None
+
+    def map_wav(self, path, data_offset, frames):
+        """
+        Use float32 audio in a WAV file as the loop, mapped copy-on-write:
+        nothing is read until it plays, and changes never reach the file
+        """
+        start = data_offset - data_offset % mmap.ALLOCATIONGRANULARITY
+        size = data_offset - start + frames * self.frame_bytes
+        with open(path, 'rb') as f:
+            loaded = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_COPY, offset=start)
+        buffer = np.frombuffer(loaded, dtype='<f4', count=frames * self.channels,
+                               offset=data_offset - start).reshape(frames, self.channels)
+        # Private pages: nothing to write back
+        self._active = (loaded, data_offset - start, None)
+        self.buffer = buffer
+
+    def sweep(self):
+        """Release everything outside the window on the next pass, e.g. after the whole loop was read"""
+        self._kept = None
+
+    def start_pager(self, state):
+        """
+        Follow the loop from a background thread. `state` is a bound method
+        returning (position, length, recording, writing); the pager stops with its owner
+        """
+        if not _CAN_ADVISE or self._thread is not None:
+            return
+        self._state = weakref.WeakMethod(state)
+        self._thread = threading.Thread(target=self._run, name="Loop pager", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(PAGER_INTERVAL):
+            state = self._state()
+            if state is None:
+                return
+            self.page(*state())
+            del state
+
+    def _keep(self, position, length, recording):
+        """Frame ranges to hold in RAM: the loop start, and around the position"""
+        start, end = position - self.behind, position + self.ahead
+        keep = [(0, self.ahead), (start, end)]
+        if not recording:
+            # Playback wraps round the loop
+            if end > length:
+                keep.append((0, end - length))
+            if start < 0:
+                keep.append((length + start, length))
+        limit = self.frames if recording else length
+        clipped = []
+        for start, end in keep:
+            start, end = max(0, start), min(limit, end)
+            if end > start:
+                clipped.append((start, end))
+        clipped.sort()
+        return clipped
+
+    def page(self, position, length, recording, writing=False):
+        """
+        One pager pass: read (or, `writing`, dirty) ahead of the position, and
+        write back and release what has left the window since the last pass
+        """
+        fits = not recording and length <= self.ahead * 2 + self.behind
+        if fits and not writing:
+            self._kept = None
+            return  # Fits in the window: all of it stays resident
+        active = self._active
+        key = (id(active[0]), recording, writing)
+        changed = key != self._key or (self._kept is None and not fits)
+        if not changed and abs(position - self._position) < self.step:
+            return  # Hardly moved: the window is still ahead of it
+        self._position = position
+        self._key = key
+
+        if writing and active[2] is not None:
+            end = position + self.ahead
+            self._touch(position, min(end, self.frames if recording else length))
+            if not recording and end > length:
+                self._touch(0, min(end - length, length))  # Round the loop
+        if fits:
+            return
+        keep = self._keep(position, length, recording)
+        if not writing:
+            for start, end in keep:
+                self._advise(active, start, end)
+
+        # After a change, sweep everything that may have been touched
+        old = [(0, position if recording else length)] if changed else self._kept
+        for start, end in _subtract(old, keep):
+            self._release(active, start, end)
+        self._kept = keep
+
+    def _byte_range(self, active, start, end, inner=False):
+        """Page-aligned byte range of frames [start, end) in an active map"""
+        mapping, map_start, _ = active
+        first = map_start + start * self.frame_bytes
+        last = map_start + end * self.frame_bytes
+        if inner:
+            # Only whole pages inside the range, so nothing next to it is touched
+            first = -(-first // _PAGE) * _PAGE
+            last = last // _PAGE * _PAGE
+        else:
+            first = first // _PAGE * _PAGE
+            last = min(-(-last // _PAGE) * _PAGE, len(mapping))
+        return first, last - first
+
+    def _advise(self, active, start, end):
+        offset, size = self._byte_range(active, start, end)
+        if size > 0:
+            active[0].madvise(mmap.MADV_WILLNEED, offset, size)
+
+    def _touch(self, start, end):
+        """
+        Write every scratch page in frames [start, end) back to itself, so it's
+        already dirty when the audio thread writes it. Only each page's first
+        byte is rewritten: the least significant one of a sample, so even
+        racing the audio thread there is inaudible
+        """
+        first = start * self.frame_bytes // _PAGE * _PAGE
+        pages = self._scratch_bytes[first:end * self.frame_bytes:_PAGE]
+        # A ufunc really writes; assigning the array to itself is skipped
+        np.bitwise_or(pages, 0, out=pages)
+
+    def _release(self, active, start, end):
+        mapping, _, fileno = active
+        offset, size = self._byte_range(active, start, end, inner=True)
+        if size <= 0:
+            return
+        if fileno is not None:
+            # Recorded audio goes to the file before its pages are dropped, from the page cache too
+            mapping.flush(offset, size)
+            mapping.madvise(mmap.MADV_DONTNEED, offset, size)
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(fileno, offset, size, os.POSIX_FADV_DONTNEED)
+        else:
+            # Copy-on-write: unchanged pages are read from the file again when needed
+            mapping.madvise(mmap.MADV_DONTNEED, offset, size)
+
+    def release(self):
+        """Write back and drop every page from RAM, for storage that's kept but not played"""
+        if _CAN_ADVISE:
+            self._release(self._active, 0, self.frames)
+        self._kept = None
+
+    def close(self):
+        """Stop the pager; the map and file go with the last array using them"""
+        self._stop.set()
@@ -0,0 +1,147 @@
+"""
+Declared effect parameters, changed safely from other threads
+
+Any thread (the menu, the engine's command loop) calls Effect.set_param(),
+which only checks the value and appends it to a queue. The queue is a
+collections.deque, whose append and popleft are atomic in CPython, so there
+is no lock for the audio thread to wait on. The audio thread drains the queue
+once at the start of each block: a change always lands between blocks, never
+half way through one
+
+Smoothed parameters then move from the old value to the new one over that
+block, one ramp vector per block instead of per-sample Python. Gains use a
+linear ramp; rates and frequencies, which we hear on a log scale, an
+exponential one. Without a ramp, a gain that jumps between blocks puts a
+step in the waveform, heard as a click ("zipper noise" when it keeps
+happening while a knob turns)
+"""
+import math
+from collections import deque
+import numpy as np
+
+RAMPS = ('linear', 'exponential')
+
+
+class Param:
+    """
+    One declared parameter of an effect; its value lives in the effect's attribute of the same name
+
+    ramp: 'linear', 'exponential' (needs a positive minimum) or None to switch
+    at the block boundary. choices: the allowed values of a named setting,
+    which always switches
+    """
+
+    def __init__(self, minimum=None, maximum=None, ramp='linear', choices=None):
+        if choices is not None:
+            ramp = None
+        if ramp is not None and ramp not in RAMPS:
+            raise ValueError(f"Unknown ramp: {ramp}")
+        if ramp == 'exponential' and not (minimum is not None and minimum > 0):
+            raise ValueError("An exponential ramp needs a positive minimum")
+        self.minimum = minimum
+        self.maximum = maximum
+        self.ramp = ramp
+        self.choices = tuple(choices) if choices is not None else None
+
+    def check(self, name, value):
+        """Return the value clamped to the range, or raise ValueError for an invalid choice"""
+        if self.choices is not None:
+            if value not in self.choices:
+                raise ValueError(f"{name} must be one of: {', '.join(map(str, self.choices))}")
+            return value
+        if self.minimum is not None and value < self.minimum:
+            value = type(value)(self.minimum)
+        if self.maximum is not None and value > self.maximum:
+            value = type(value)(self.maximum)
+        return value
+
+
+class Parameters:
+    """
+    Queued changes and per-block ramps for one effect's declared parameters
+
+    set() and get() may be called from any thread; update() and values()
+    only from the thread that processes the effect
+    """
+
+    def __init__(self, effect):
+        self.effect = effect
+        self.declared = effect.PARAMS
+        self._queue = deque()
+        # Last value set per parameter, reported before the audio thread applies it
+        self._latest = {}
+        # Changes set so far, applied or not
+        self.changes = 0
+        # name -> (start, end) for parameters ramping in the current block
+        self._ramps = {}
+        # Block length -> ramp from 1/length up to exactly 1
+        self._units = {}
+
+    def set(self, name, value, ramp=True):
+        param = self.declared.get(name)
+        if param is None:
+            raise AttributeError(f"{self.effect.name} has no parameter '{name}'")
+        # Keep the attribute's type: a float stays a float, an int an int
+        value = param.check(name, type(getattr(self.effect, name))(value))
+        self._latest[name] = value
+        self._queue.append((name, value, ramp))
+        # Counted once queued, so whoever sees the count can find the change
+        self.changes += 1
+        return value
+
+    def get(self, name):
+        if name not in self.declared:
+            raise AttributeError(f"{self.effect.name} has no parameter '{name}'")
+        return self._latest.get(name, getattr(self.effect, name))
+
+    def update(self):
+        """Apply every queued change; smoothed ones ramp over the block about to be processed"""
+        ramps = self._ramps
+        if ramps:
+            ramps.clear()
+        queue = self._queue
+        while queue:
+            name, value, ramp = queue.popleft()
+            start = getattr(self.effect, name)
+            setattr(self.effect, name, value)
+            if ramp and self.declared[name].ramp is not None and value != start:
+                # Several changes in one block ramp from where the block started to the last one
+                if name in ramps:
+                    start = ramps[name][0]
+                ramps[name] = (start, value)
+
+    def ramping(self, name):
+        return name in self._ramps
+
+    def values(self, name, shape, axis=0):
+        """
+        The parameter over the block: its value when steady, otherwise the
+        ramp ending on the new value, as an array of `shape` with time along `axis`
+        """
+        ramp = self._ramps.get(name)
+        if ramp is None:
+            return getattr(self.effect, name)
+        start, end = ramp
+        length = shape if isinstance(shape, int) else shape[axis]
+        unit = self._units.get(length)
+        if unit is None:
+            unit = self._units[length] = (np.arange(1, length + 1) / length).astype('float32')
+
+        line = self.effect._scratch(('ramp', name), length)
+        if self.declared[name].ramp == 'exponential':
+            # start * (end / start) ** t
+            np.multiply(unit, math.log(end / start), out=line)
+            np.exp(line, out=line)
+            line *= start
+        else:
+            np.multiply(unit, end - start, out=line)
+            line += start
+
+        if isinstance(shape, int) or len(shape) == 1:
+            return line
+        # Spread down every other axis here, so the caller's ufunc runs shape for shape
+        spread = self.effect._scratch(('ramp', name, 'spread'), shape)
+        along = [1] * len(shape)
+        along[axis] = length
+        spread[...] = line.reshape(along)
+        return spread
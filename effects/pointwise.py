@@ -0,0 +1,120 @@
+"""
+Pointwise stages: neighbouring memoryless effects in a chain, run as one pass
+
+An effect with no memory (each output sample depends only on the same input
+sample) describes itself with Effect.pointwise() as a few steps: ('scale', k)
+multiplies by k, ('curve', name) runs a waveshaper curve. A chain joins the
+steps of a run of such effects into one program, multiplying neighbouring
+scales together, and applies it to the block in place
+
+At 128 frames an effect's own process_into() costs far more in Python than
+in arithmetic, so a run of N of them then costs about what one does
+"""
+import numpy as np
+from config import BUFFER_SIZE, CHANNELS
+from .waveshaper import Waveshaper
+
+
+class PointwiseStage:
+    """
+    A run of pointwise effects, fused into one program
+
+    A parameter change ramps over the block it lands in, which the effects'
+    own process_into() does: while one is on its way in, the effects run one
+    by one as usual, and the program is rebuilt from their new settings.
+    Should one of them stop being pointwise (Gain oversampling, say), they
+    keep running one by one until it is again
+    """
+
+    def __init__(self, effects, shape=(BUFFER_SIZE, CHANNELS)):
+        self.effects = list(effects)
+        self.program = []
+        self.fused = False
+        self._shapers = []   # One per curve step, kept across rebuilds with their work buffers
+        # Parameter changes each effect had seen when the program was built; -1 at first,
+        # as one may still be queued, so the first block runs them one by one and rebuilds
+        self._changes = [-1] * len(self.effects)
+        self._build()
+        # Work buffers, so the first real blocks allocate nothing. Only the program's own:
+        # the effects may be playing in the chain's previous plan on the audio thread
+        block = np.zeros(shape, dtype='float32')
+        self._work = np.zeros_like(block)
+        self._run(block, np.zeros_like(block))
+
+    @property
+    def name(self):
+        return " + ".join(effect.name for effect in self.effects)
+
+    def _build(self):
+        """The program from the effects' current settings, if they are all still pointwise"""
+        program = []
+        curves = 0
+        for effect in self.effects:
+            steps = effect.pointwise()
+            if steps is None:
+                self.fused = False
+                return
+            for op, value in steps:
+                if op == 'scale':
+                    if program and program[-1][0] == 'scale':
+                        program[-1] = ('scale', program[-1][1] * value)
+                    else:
+                        program.append(('scale', value))
+                    continue
+                if curves == len(self._shapers):
+                    self._shapers.append(Waveshaper(value))
+                shaper = self._shapers[curves]
+                shaper.curve = value
+                curves += 1
+                program.append(('curve', shaper))
+        # A gain of one is no step at all
+        self.program = [step for step in program if step != ('scale', 1.0)]
+        self.fused = True
+
+    def _run(self, audio, out):
+        """The fused program: each step over the whole block, in place in out"""
+        source = audio
+        for op, value in self.program:
+            if op == 'scale':
+                np.multiply(source, value, out=out)
+            else:
+                value.process(source, out)
+            source = out
+        if source is audio:
+            np.copyto(out, audio)
+
+    def _one_by_one(self, audio, out, frames):
+        """Each effect's own process_into(), through a work buffer, ending in out"""
+        work = self._work
+        if work.shape != audio.shape:
+            work = self._work = np.zeros(audio.shape, dtype='float32')
+        # Alternate between out and the work buffer so the last effect writes out
+        target = out if len(self.effects) % 2 else work
+        source = audio
+        for effect in self.effects:
+            effect.process_into(source, target, frames)
+            source = target
+            target = work if target is out else out
+
+    def process_into(self, audio, out, frames):
+        changes = self._changes
+        for index in range(len(changes)):
+            seen = self.effects[index].param_changes()
+            if seen != changes[index]:
+                break
+        else:
+            if self.fused:
+                self._run(audio, out)
+            else:
+                self._one_by_one(audio, out, frames)
+            return
+        # A change came in: apply it (and its ramp) the usual way, then rebuild.
+        # Counts are taken first, so a change arriving meanwhile is caught next block
+        for index in range(len(changes)):
+            changes[index] = self.effects[index].param_changes()
+        self._one_by_one(audio, out, frames)
+        self._build()
+
+    def reset(self):
+        for effect in self.effects:
+            effect.reset()
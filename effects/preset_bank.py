@@ -0,0 +1,192 @@
+import threading
+import time
+import numpy as np
+from config import BUFFER_SIZE, CHANNELS, PRESET_CROSSFADE_MS, PRESET_CROSSFADE_BUDGET
+from .base import Effect
+from .presets import build_preset_chain
+
+# Blocks of silence run through a chain before it goes live; the first builds
+# its work buffers, the rest time it
+WARMUP_BLOCKS = 8
+
+
+class PresetBank(Effect):
+    """
+    Whole preset chains, built ahead of time and switched with a crossfade
+
+    Key Concepts:
+    - Pre-warming: every chain is built, reset and run on silence before it
+      is needed, so its buffers exist and its state (echo lines, reverb
+      tails, filter memory) starts clean instead of where it was last left
+    - Equal-power crossfade: the old chain fades out along a cosine while the
+      new one fades in along a sine. sin^2 + cos^2 = 1, so two unrelated
+      signals keep the same loudness all through the fade, where a linear
+      fade dips by 3 dB in the middle
+    - Block-boundary switching: a switch asked for from the menu starts at
+      the beginning of the next block, never half way through one
+
+    Chains are built when the bank is, or with warm=False by warm_up() later
+    (on a background thread) or when first selected; until the first one is
+    ready, the bank passes audio through dry
+
+    Both chains run during a crossfade. When their measured cost together
+    would take more than the crossfade budget of the block deadline, the
+    switch fades the old chain out and then the new one in instead, running
+    one chain at a time
+    """
+
+    def __init__(self, sample_rate, presets, block_size=BUFFER_SIZE, channels=CHANNELS,
+                 crossfade_ms=PRESET_CROSSFADE_MS, budget=PRESET_CROSSFADE_BUDGET, warm=True):
+        if not presets:
+            raise ValueError("A preset bank needs at least one preset")
+        self.names = [name for name, _ in presets]
+        self.presets = [preset for _, preset in presets]
+        # Each published once it's built and warmed up
+        self.chains = [None] * len(presets)
+        self.block_size = block_size
+        self.crossfade_frames = max(1, int(round(crossfade_ms * sample_rate / 1000)))
+        self.budget = budget
+        # Seconds per block of each chain, measured while warming it up
+        self.costs = [0.0] * len(self.chains)
+
+        # Audio thread state: the chain playing, the one fading out and how far the fade is
+        self.current = 0
+        self.outgoing = None
+        self.fade_position = 0
+        self.dip = False        # This switch fades out, then in, instead of crossing
+        self.dip_in = False     # ...and has reached the fading in half
+        # The switch asked for, picked up at the start of the next block
+        self.pending = None
+        # The preset the menu last asked for
+        self.selected = 0
+        self._select_lock = threading.Lock()
+        self._warm_shape = (block_size, channels)
+
+        super().__init__(sample_rate)
+        # Sized for the stream from the start, so the first switch doesn't allocate
+        self.channels = channels
+        self.reset()
+        if warm:
+            self.warm_up()
+
+    @property
+    def name(self):
+        return f"Presets ({self.names[self.selected]})"
+
+    def reset(self):
+        """Fade curves and the outgoing chain's buffer for the current channel count"""
+        steps = (np.arange(1, self.crossfade_frames + 1) / self.crossfade_frames) * (np.pi / 2)
+        shape = (self.crossfade_frames, self.channels)
+        self.fade_in = np.ascontiguousarray(np.broadcast_to(np.sin(steps)[:, None], shape), dtype='float32')
+        self.fade_out = np.ascontiguousarray(np.broadcast_to(np.cos(steps)[:, None], shape), dtype='float32')
+        self._scratch('fading', (self.block_size, self.channels))
+
+    def warm_up(self):
+        """Build and warm up every chain not built yet; safe beside the audio thread and select()"""
+        for index in range(len(self.chains)):
+            with self._select_lock:
+                if self.chains[index] is None:
+                    self._prepare(index)
+
+    def _prepare(self, index):
+        """
+        Build a chain, or reset one that isn't playing, and run it on silence,
+        so it goes live with clean state and every work buffer allocated
+        Silence into a freshly reset chain leaves its state silent too
+        """
+        chain = self.chains[index]
+        if chain is None:
+            chain = build_preset_chain(self.presets[index], self.sample_rate)
+        chain.reset()
+        silence = np.zeros(self._warm_shape, dtype='float32')
+        out = np.zeros_like(silence)
+        times = []
+        for _ in range(WARMUP_BLOCKS):
+            start = time.perf_counter()
+            chain.process_into(silence, out, len(silence))
+            times.append(time.perf_counter() - start)
+        self.costs[index] = float(np.median(times[1:]))
+        self.chains[index] = chain
+
+    def crossfade_fits(self, index):
+        """Whether the current chain and chain `index` together fit in the crossfade budget"""
+        deadline = self.block_size / self.sample_rate
+        return self.costs[self.current] + self.costs[index] <= self.budget * deadline
+
+    def switching(self):
+        return self.pending is not None or self.outgoing is not None
+
+    def select(self, index):
+        """
+        Switch to preset `index`; call from any thread but the audio one
+        The chain is prepared here, then the audio thread crossfades to it
+        from the start of its next block. Returns a message for the menu
+        """
+        if not 0 <= index < len(self.chains):
+            raise ValueError(f"No preset {index + 1}, there are {len(self.chains)}")
+        with self._select_lock:
+            if self.switching():
+                target = self.pending if self.pending is not None else self.current
+                return f"Still switching to {self.names[target]}"
+            if index == self.current:
+                if self.chains[index] is None:
+                    self._prepare(index)
+                self.selected = index
+                return f"{self.names[index]} already playing"
+            # Only the current chain is running, so this one is safe to touch
+            self._prepare(index)
+            if self.chains[self.current] is None:
+                # Not built yet, so not running either; the crossfade needs it
+                self._prepare(self.current)
+            self.dip = not self.crossfade_fits(index)
+            self.selected = index
+            self.pending = index
+        return f"Switching to {self.names[index]}"
+
+    def process_into(self, audio, out, frames):
+        """Run the current chain; during a switch, fade between it and the previous one"""
+        audio, out = self._channel_views(audio, out)
+        pending = self.pending
+        if pending is not None and self.outgoing is None:
+            # Outgoing first, so switching() never sees a gap
+            self.outgoing = self.current
+            self.current = pending
+            self.pending = None
+            self.fade_position = 0
+            self.dip_in = False
+
+        outgoing = self.outgoing
+        if outgoing is None:
+            chain = self.chains[self.current]
+            if chain is None:
+                out[...] = audio  # Still being built
+            else:
+                chain.process_into(audio, out, frames)
+            return
+
+        position = self.fade_position
+        count = min(frames, self.crossfade_frames - position)
+        if self.dip and not self.dip_in:
+            # Old chain alone, fading to silence
+            self.chains[outgoing].process_into(audio, out, frames)
+            out[:count] *= self.fade_out[position:position + count]
+            out[count:] = 0.0
+        elif self.dip:
+            # New chain alone, fading up from silence
+            self.chains[self.current].process_into(audio, out, frames)
+            out[:count] *= self.fade_in[position:position + count]
+        else:
+            fading = self._scratch('fading', audio.shape)
+            self.chains[self.current].process_into(audio, out, frames)
+            self.chains[outgoing].process_into(audio, fading, frames)
+            out[:count] *= self.fade_in[position:position + count]
+            fading[:count] *= self.fade_out[position:position + count]
+            out[:count] += fading[:count]
+
+        self.fade_position = position + count
+        if self.fade_position >= self.crossfade_frames:
+            if self.dip and not self.dip_in:
+                self.dip_in = True
+                self.fade_position = 0
+            else:
+                self.outgoing = None
@@ -0,0 +1,73 @@
+"""
+Chain presets: which effects, in which order, with which parameters
+
+A preset is a list of (effect class name, {parameter: value}) pairs. In JSON
+each effect is its name, or an object with a name and parameter overrides:
+
+    {"effects": ["Echo", {"name": "Gain", "params": {"drive": 8.0, "curve": "tube"}}]}
+
+A presets file names several of them, in menu order:
+
+    {"presets": {"ambient": {"effects": [...]}, "crunch": {"effects": [...]}}}
+"""
+import json
+from .effect_chain import EffectChain
+from .registry import effect_class
+
+
+def build_chain(effect_names, sample_rate):
+    """Build an EffectChain with every named (registered) effect active, in order"""
+    chain = EffectChain(sample_rate)
+    for name in effect_names:
+        chain.add_effect(effect_class(name)(sample_rate), active=True)
+    return chain
+
+
+def parse_preset(entries, source="preset"):
+    """A preset from its JSON form: a list of effect names or {name, params} objects"""
+    if isinstance(entries, dict):
+        entries = entries.get('effects')
+    if not isinstance(entries, list):
+        raise ValueError(f"{source}: expected an 'effects' list")
+
+    preset = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {'name': entry}
+        if not isinstance(entry, dict) or 'name' not in entry:
+            raise ValueError(f"{source}: every effect needs a name, got {entry!r}")
+        preset.append((entry['name'], dict(entry.get('params', {}))))
+    return preset
+
+
+def load_preset(path):
+    """Read a chain preset as a list of (effect name, {parameter: value})"""
+    with open(path) as f:
+        return parse_preset(json.load(f), path)
+
+
+def load_presets(path):
+    """Read a presets file as a list of (preset name, preset)"""
+    with open(path) as f:
+        data = json.load(f)
+    presets = data.get('presets') if isinstance(data, dict) else None
+    if not isinstance(presets, dict) or not presets:
+        raise ValueError(f"{path}: expected a 'presets' object of named presets")
+    return [(name, parse_preset(entries, f"{path}: {name}")) for name, entries in presets.items()]
+
+
+def apply_params(effect, params):
+    """Set parameter overrides on an effect; they apply from the first block, without a ramp"""
+    for name, value in params.items():
+        try:
+            effect.set_param(name, value, ramp=False)
+        except AttributeError as error:
+            raise ValueError(str(error)) from None
+
+
+def build_preset_chain(preset, sample_rate):
+    """EffectChain with every effect of the preset active and its parameters set"""
+    chain = build_chain([name for name, _ in preset], sample_rate)
+    for effect, (_, params) in zip(chain.effects, preset):
+        apply_params(effect, params)
+    return chain
@@ -0,0 +1,230 @@
+"""
+Effect registry: every effect by name, imported and built only when needed
+
+Built-in effects are listed here as "module:class" strings, so nothing is
+imported until an effect is asked for. Other packages add effects through
+the "pypipedals.effects" entry point group, in their pyproject.toml:
+
+    [project.entry-points."pypipedals.effects"]
+    Fuzz = "my_pedals.fuzz:Fuzz"
+
+Entry points are only looked for when a name isn't a built-in one (or the
+whole list is asked for), and only loaded (imported) when their effect is
+first used. A plugin effect is an Effect subclass built as cls(sample_rate)
+
+LazyEffect stands in for an effect in the pedal lineup until it is first
+enabled; it is then imported, built and warmed up on a background setup
+thread, and passes audio through dry until it's ready. Startup only pays
+for the effects actually played first
+"""
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from config import BUFFER_SIZE, CHANNELS
+from .base import Effect
+
+ENTRY_POINT_GROUP = 'pypipedals.effects'
+
+# Where each class is defined: importing one doesn't import the others
+BUILTIN_EFFECTS = {
+    'Clean': 'effects.Clean:Clean',
+    'Echo': 'effects.Echo:Echo',
+    'Gain': 'effects.Gain:Gain',
+    'WahWah': 'effects.WahWah:WahWah',
+    'Reverb': 'effects.Reverb:Reverb',
+    'Tremolo': 'effects.Tremolo:Tremolo',
+    'Convolution': 'effects.Convolution:Convolution',
+    'PitchShifter': 'effects.PitchShifter:PitchShifter',
+    'NoiseGate': 'effects.dynamics:NoiseGate',
+    'Compressor': 'effects.dynamics:Compressor',
+}
+
+# Name -> "module:class", an entry point, or a class registered directly
+_registered = dict(BUILTIN_EFFECTS)
+_discovered = False
+_classes = {}
+_lock = threading.RLock()  # Re-entrant: a plugin may register more effects as it imports
+_executor = None
+
+
+def register(name, target):
+    """Add an effect: an Effect subclass, or a "module:class" string imported on first use"""
+    with _lock:
+        _registered[name] = target
+        _classes.pop(name, None)
+
+
+def _discover():
+    """Add plugin effects from entry points, once; a built-in name can't be taken over"""
+    global _discovered
+    if _discovered:
+        return
+    # Importing importlib.metadata alone takes longer than building most effects
+    from importlib.metadata import entry_points
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        _registered.setdefault(entry_point.name, entry_point)
+    _discovered = True
+
+
+def effect_names():
+    """Every registered effect name, built-ins first; nothing is imported"""
+    with _lock:
+        _discover()
+        return list(_registered)
+
+
+def _lookup(name):
+    """The registered name for `name`, matched case-insensitively; plugins are only looked for on a miss"""
+    for _ in range(2):
+        if name in _registered:
+            return name
+        for registered in _registered:
+            if registered.lower() == name.lower():
+                return registered
+        _discover()
+    raise ValueError(f"Unknown effect '{name}', choose from: {', '.join(_registered)}")
+
+
+def effect_class(name):
+    """The Effect subclass registered as `name`, imported the first time it's asked for"""
+    with _lock:
+        name = _lookup(name)
+        cls = _classes.get(name)
+        if cls is not None:
+            return cls
+        target = _registered[name]
+        if isinstance(target, type):
+            cls = target
+        elif isinstance(target, str):
+            module, _, attribute = target.partition(':')
+            cls = getattr(importlib.import_module(module), attribute)
+        else:
+            cls = target.load()  # An entry point
+        if not (isinstance(cls, type) and issubclass(cls, Effect)):
+            raise TypeError(f"Effect '{name}' ({target}) is not an Effect subclass")
+        _classes[name] = cls
+        return cls
+
+
+def setup_executor():
+    """The one background thread effects are imported, built and warmed up on"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="Effect setup")
+        return _executor
+
+
+def warm_up(effect, shape, blocks=4):
+    """
+    Run an effect on a few blocks of silence and reset it again, so its
+    tables and work buffers exist before the first real block
+    """
+    silence = np.zeros(shape, dtype='float32')
+    out = np.zeros_like(silence)
+    for _ in range(blocks):
+        effect.process_into(silence, out, shape[0])
+    effect.reset()
+
+
+class LazyEffect(Effect):
+    """
+    A registered effect, imported and built when first enabled
+
+    load() starts the setup thread on it; until it's done, process_into()
+    passes the audio through unchanged. Asking for its parameters waits for it
+
+    If building it fails, the exception is kept in `error` and shown in its
+    name; it goes on passing audio through, lists no parameters, and setting
+    or reading one raises ValueError saying why
+    """
+
+    def __init__(self, name, sample_rate, block_size=BUFFER_SIZE, channels=CHANNELS):
+        self.effect_name = name
+        self.effect = None
+        self._future = None
+        self.error = None
+        self._load_lock = threading.Lock()
+        self._warm_shape = (block_size, channels)
+        super().__init__(sample_rate)
+
+    @property
+    def name(self):
+        effect = self.effect
+        if effect is not None:
+            return effect.name
+        if self.error is not None:
+            return f"{self.effect_name} (failed: {self.error})"
+        return self.effect_name
+
+    def load(self):
+        """
+        Start importing and building the effect in the background; returns a
+        Future. `error` is set before any callback added to it runs
+        """
+        with self._load_lock:
+            if self._future is None:
+                self._future = setup_executor().submit(self._build)
+                self._future.add_done_callback(self._loaded)
+            return self._future
+
+    def _loaded(self, future):
+        if not future.cancelled():
+            self.error = future.exception()
+
+    def wait(self):
+        """The built effect, loading it first if nobody has yet"""
+        return self.load().result()
+
+    def ready(self):
+        return self.effect is not None
+
+    def _build(self):
+        effect = effect_class(self.effect_name)(self.sample_rate)
+        warm_up(effect, self._warm_shape)
+        # Published in one assignment, once it's ready to run
+        self.effect = effect
+        return effect
+
+    def reset(self):
+        effect = self.effect
+        if effect is not None:
+            effect.reset()
+
+    def _built(self):
+        """The built effect, waiting for it; ValueError if it couldn't be built"""
+        try:
+            return self.wait()
+        except Exception as error:
+            self.error = error
+            raise ValueError(f"{self.effect_name} failed to load: {error}") from error
+
+    def param_names(self):
+        try:
+            effect = self._built()
+        except ValueError:
+            return []
+        return effect.param_names()
+
+    def set_param(self, name, value, ramp=True):
+        return self._built().set_param(name, value, ramp)
+
+    def get_param(self, name):
+        return self._built().get_param(name)
+
+    def pointwise(self):
+        effect = self.effect
+        return effect.pointwise() if effect is not None else None
+
+    def param_changes(self):
+        effect = self.effect
+        return effect.param_changes() if effect is not None else 0
+
+    def process_into(self, audio, out, frames):
+        effect = self.effect
+        if effect is None:
+            # Still setting up: dry until it's ready
+            out[...] = audio
+        else:
+            effect.process_into(audio, out, frames)
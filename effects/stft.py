@@ -0,0 +1,184 @@
+"""
+Streaming short-time Fourier transform, for effects that work on spectra
+
+The input is cut into overlapping frames of `frame_size` samples, one every
+`hop` samples, whatever the host block size: a block may hold part of a hop
+or several. Each frame is windowed and transformed, the effect changes its
+spectrum, and the result is transformed back, windowed again and added to
+the frames before it (overlap-add). The synthesis window is scaled so the
+overlapping analysis x synthesis windows add up to exactly one, so a
+spectrum left as it is comes back as the input, `frame_size` samples late
+
+That latency is the price of the frequency resolution: bins are
+sample_rate / frame_size apart, and a frame can only be transformed once
+its last sample has arrived
+"""
+import numpy as np
+
+try:
+    # numpy.fft's own kernels: the public functions around them allocate on every
+    # call, and convert float32 to a frame-sized double temporary first. They are
+    # private, so each StreamingSTFT checks them before using them (_kernels)
+    from numpy.fft._pocketfft_umath import rfft_n_even as _rfft, irfft as _irfft
+except ImportError:
+    _rfft = _irfft = None
+
+
+def hann(size):
+    """Periodic Hann window: overlapped at any hop dividing size / 2, it sums to a constant"""
+    return 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(size) / size)
+
+
+def _kernels(frame_size):
+    """
+    numpy.fft's private kernels if they work here, else (None, None): they are
+    called on a test frame and must agree with the public functions, so a numpy
+    that changes them falls back to np.fft rather than failing mid-stream
+    """
+    if _rfft is None or _irfft is None:
+        return None, None
+    frame = np.random.default_rng(0).standard_normal(frame_size)
+    spectrum = np.empty(frame_size // 2 + 1, dtype='complex128')
+    back = np.empty(frame_size)
+    try:
+        _rfft(frame, 1, out=spectrum)
+        _irfft(spectrum, 1 / frame_size, out=back)
+    except Exception:
+        return None, None
+    if not (np.allclose(spectrum, np.fft.rfft(frame)) and np.allclose(back, frame)):
+        return None, None
+    return _rfft, _irfft
+
+
+def synthesis_window(analysis, hop):
+    """
+    The window applied after the inverse transform: the analysis window
+    divided by what analysis x synthesis adds up to at each point, over
+    every frame overlapping it, so that sum is one
+    """
+    size = len(analysis)
+    overlap = np.sum((analysis ** 2).reshape(size // hop, hop), axis=0)
+    return analysis / np.tile(overlap, size // hop)
+
+
+class StreamingSTFT:
+    """
+    Frames in, spectra to a callback, overlap-added audio out, at any block size
+
+    Input and output are rings of one frame per channel, in (channels,
+    frame_size) rows so each frame transforms in place. Every buffer is
+    allocated up front; the transforms work in double precision, which also
+    keeps phase-vocoder phases accurate over long notes
+
+    The ring slices each frame works on are cut once, for each of the
+    frame_size / hop places the rings can wrap, a row at a time; the
+    synthesis window is stored whole for every channel. numpy runs an
+    operation on mismatched shapes or strides through a buffered iterator,
+    which allocates each time, and so does every new view
+    """
+
+    def __init__(self, frame_size, hop, channels=1):
+        if frame_size % 2 or frame_size % hop or hop > frame_size // 2:
+            raise ValueError(f"frame size {frame_size} must be even, a multiple of the hop ({hop}) "
+                             "and at least two hops long")
+        self.frame_size = frame_size
+        self.hop = hop
+        self.channels = channels
+        self.bins = frame_size // 2 + 1
+        self.analysis_window = hann(frame_size)
+        self.synthesis_window = synthesis_window(self.analysis_window, hop)
+        self._synthesis_rows = np.tile(self.synthesis_window, (channels, 1))
+        self._rfft, self._irfft = _kernels(frame_size)
+        # A sample comes out once every frame holding it has been added up
+        self.latency_frames = frame_size
+        self.reset()
+
+    def reset(self):
+        size, channels = self.frame_size, self.channels
+        self.input = np.zeros((channels, size))
+        # Overlap-add ring, lined up with the input ring
+        self.output = np.zeros((channels, size))
+        self.frame = np.zeros((channels, size))
+        self.spectrum = np.zeros((channels, self.bins), dtype='complex128')
+        # The hop being played out while the next one comes in
+        self.ready = np.zeros((channels, self.hop))
+        # Where the incoming hop goes in the rings, and how much of it is in
+        self.position = 0
+        self.fill = 0
+        self._slices = [self._ring_slices(start) for start in range(0, size, self.hop)]
+        self._rows = list(zip(self.frame, self.spectrum))
+
+    def _ring_slices(self, start):
+        """
+        For a frame starting at `start` in the rings: (input, window, frame)
+        slices to window it, (output, frame) slices to add it back, and the
+        output hop it completes
+        """
+        split = self.frame_size - start
+        window = self.analysis_window
+        analysis, overlap_add = [], []
+        for samples, frame, total in zip(self.input, self.frame, self.output):
+            analysis += [(samples[start:], window[:split], frame[:split]),
+                         (samples[:start], window[split:], frame[split:])]
+            overlap_add += [(total[start:], frame[:split]), (total[:start], frame[split:])]
+        return analysis, overlap_add, self.output[:, start:start + self.hop]
+
+    def _forward(self):
+        rfft = self._rfft
+        if rfft is None:
+            np.fft.rfft(self.frame, out=self.spectrum)
+            return
+        # A row at a time: on one row the kernel needs no loop over the others
+        for frame, spectrum in self._rows:
+            rfft(frame, 1, out=spectrum)
+
+    def _inverse(self):
+        irfft = self._irfft
+        if irfft is None:
+            np.fft.irfft(self.spectrum, self.frame_size, out=self.frame)
+            return
+        scale = 1 / self.frame_size
+        for frame, spectrum in self._rows:
+            irfft(spectrum, scale, out=frame)
+
+    def _next_frame(self, transform):
+        """A whole hop is in: transform the newest frame and overlap-add it"""
+        # The oldest sample, where the frame starts; the rings wrap there
+        start = (self.position + self.hop) % self.frame_size
+        analysis, overlap_add, completed = self._slices[start // self.hop]
+        for samples, window, frame in analysis:
+            np.multiply(samples, window, out=frame)
+
+        self._forward()
+        transform(self.spectrum)
+        self._inverse()
+
+        self.frame *= self._synthesis_rows
+        for total, frame in overlap_add:
+            total += frame
+        # The frame's first hop has had every frame over it added: out it goes
+        self.ready[:] = completed
+        completed[...] = 0.0
+        self.position = start
+
+    def process(self, audio, out, transform):
+        """
+        Run a (frames, channels) block through; transform(spectrum) changes each
+        frame's (channels, bins) spectrum in place. `out` gets the result,
+        latency_frames late
+        """
+        frames = len(audio)
+        hop = self.hop
+        done = 0
+        # Pieces never cross a hop, so they never cross the end of the rings
+        while done < frames:
+            fill = self.fill
+            count = min(frames - done, hop - fill)
+            at = self.position + fill
+            self.input[:, at:at + count] = audio[done:done + count].T
+            out[done:done + count] = self.ready[:, fill:fill + count].T
+            self.fill = fill + count
+            done += count
+            if self.fill == hop:
+                self.fill = 0
+                self._next_frame(transform)
@@ -0,0 +1,229 @@
+import math
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+# Shaper tables cover inputs from -INPUT_RANGE to +INPUT_RANGE; every curve is
+# flat beyond that (tanh(8) is within 3e-7 of 1), so louder inputs are clamped
+INPUT_RANGE = 8.0
+TABLE_SIZE = 8192
+TUBE_BIAS = 0.25
+
+# Oversampling filter: windowed-sinc lowpass, this many taps per polyphase branch
+TAPS_PER_PHASE = 24
+KAISER_BETA = 7.0
+
+CURVES = ('tanh', 'tube', 'hardclip')
+
+_tables = {}
+_filters = {}
+
+
+def _build_table(curve):
+    """
+    Sample a transfer curve at TABLE_SIZE + 1 evenly spaced inputs
+
+    'tube' is tanh with the operating point shifted off centre, so positive
+    and negative peaks clip at different levels and even harmonics appear
+    It still passes through zero, so silence stays silent
+    """
+    x = np.linspace(-INPUT_RANGE, INPUT_RANGE, TABLE_SIZE + 1)
+
+    if curve == 'tanh':
+        table = np.tanh(x)
+    elif curve == 'tube':
+        table = np.tanh(x + TUBE_BIAS) - np.tanh(TUBE_BIAS)
+        table /= np.abs(table).max()
+    elif curve == 'hardclip':
+        table = np.clip(x, -1.0, 1.0)
+    else:
+        raise ValueError(f"Unknown waveshaper curve: {curve}")
+
+    return table.astype('float32')
+
+
+def shaper_table(curve):
+    """Shared precomputed table for a curve ('tanh', 'tube' or 'hardclip')"""
+    if curve not in _tables:
+        _tables[curve] = _build_table(curve)
+    return _tables[curve]
+
+
+def _build_filter(factor):
+    """
+    Lowpass prototype for `factor`x oversampling, cut off just below the
+    original Nyquist frequency, with unity gain at DC
+    """
+    length = factor * TAPS_PER_PHASE
+    cutoff = 0.45 / factor  # cycles per oversampled sample
+    n = np.arange(length) - (length - 1) / 2
+    taps = np.sinc(2 * cutoff * n) * np.kaiser(length, KAISER_BETA)
+    return taps / taps.sum()
+
+
+def _filter(factor):
+    if factor not in _filters:
+        _filters[factor] = _build_filter(factor)
+    return _filters[factor]
+
+
+def _tanh(signal, out):
+    np.tanh(signal, out=out)
+
+
+def _hardclip(signal, out):
+    np.clip(signal, -1.0, 1.0, out=out)
+
+
+# Curves numpy can evaluate in one vectorised call; that beats any table lookup
+_DIRECT = {'tanh': _tanh, 'hardclip': _hardclip}
+
+
+class Waveshaper:
+    """
+    Memoryless distortion by table lookup
+
+    The curve is looked up with linear interpolation between table entries,
+    so any transfer curve costs the same; with 8192 entries the error is
+    below 1e-6, far under the float32 noise floor of the rest of the chain
+    tanh and hard clip have a single numpy ufunc that is faster still, and
+    are computed directly unless `use_table` is set
+    """
+
+    def __init__(self, curve='tanh', use_table=False):
+        self.curve = curve
+        self.use_table = use_table
+        self._work = None
+
+    def _work_buffers(self, shape):
+        """Position/index buffers, kept for the last block shape like LFO's"""
+        work = self._work
+        if work is not None and work[0] == shape:
+            return work[1]
+        size = math.prod(shape)
+        if work is None or len(work[2]) < size:
+            storage = (np.empty(size, dtype='float32'), np.empty(size, dtype='float32'),
+                       np.empty(size, dtype=np.intp))
+        else:
+            storage = work[2:]
+        views = tuple(buffer[:size].reshape(shape) for buffer in storage)
+        self._work = (shape, views) + storage
+        return views
+
+    def process(self, signal, out):
+        """Shape `signal` into `out` (both float32, same shape)"""
+        direct = _DIRECT.get(self.curve)
+        if direct is not None and not self.use_table:
+            direct(signal, out)
+            return out
+
+        table = shaper_table(self.curve)
+        position, whole, index = self._work_buffers(signal.shape)
+
+        # Map -INPUT_RANGE..+INPUT_RANGE onto 0..TABLE_SIZE
+        np.multiply(signal, TABLE_SIZE / (2 * INPUT_RANGE), out=position)
+        position += TABLE_SIZE / 2
+        np.clip(position, 0.0, TABLE_SIZE, out=position)
+
+        # Linear interpolation between neighbouring table entries
+        np.floor(position, out=whole)
+        np.copyto(index, whole, casting='unsafe')
+        position -= whole
+        table.take(index, out=out, mode='clip')
+        index += 1
+        table.take(index, out=whole, mode='clip')
+        whole -= out
+        whole *= position
+        out += whole
+        return out
+
+
+class Oversampler:
+    """
+    Polyphase up/down sampling by an integer factor, for running a
+    nonlinearity at a higher rate so its harmonics above the original
+    Nyquist frequency are filtered out instead of aliasing back down
+
+    Upsampling computes each of the `factor` polyphase branches directly
+    from the input (no zero stuffing); downsampling only evaluates the
+    filter at the samples that are kept. Filter history is carried between
+    blocks, so consecutive blocks join up exactly
+
+    Latency of an up/down round trip is `latency` samples at the original rate
+    """
+
+    def __init__(self, factor, channels=1):
+        self.factor = factor
+        self.channels = channels
+        taps = _filter(factor).astype('float32')
+        # Branch p of the interpolator uses taps p, p + factor, ...; reversed
+        # so a window of input (oldest first) times the column gives the output
+        self._up_taps = np.ascontiguousarray((taps * factor).reshape(TAPS_PER_PHASE, factor)[::-1])
+        self._down_taps = np.ascontiguousarray(taps[::-1])
+        self.latency = TAPS_PER_PHASE - 1
+        self._views = None
+        self.reset()
+
+    def reset(self):
+        # One row of filter history per channel
+        self._up_history = np.zeros((self.channels, TAPS_PER_PHASE - 1), dtype='float32')
+        self._down_history = np.zeros((self.channels, len(self._down_taps) - 1), dtype='float32')
+        self._views = None
+
+    def _block_views(self, frames):
+        """
+        Filter windows over [history, block] for one block size, as strided
+        views so the FIR sums are a single (stacked) matrix product each
+        Every channel is a row, and each product covers all of them
+
+        Built once per block size; steady-state calls create nothing
+        """
+        if self._views is not None and self._views[0] == frames:
+            return self._views[1]
+        factor = self.factor
+        channels = self.channels
+        up_keep = self._up_history.shape[1]
+        down_keep = self._down_history.shape[1]
+
+        up_ext = np.zeros((channels, up_keep + frames), dtype='float32')
+        up_ext[:, :up_keep] = self._up_history
+        down_ext = np.zeros((channels, down_keep + frames * factor), dtype='float32')
+        down_ext[:, :down_keep] = self._down_history
+        upsampled = np.zeros((channels, frames, factor), dtype='float32')
+        down_out = np.zeros((channels, frames, 1), dtype='float32')
+
+        size = up_ext.itemsize
+        up_windows = as_strided(up_ext, (channels, frames, TAPS_PER_PHASE),
+                                (up_ext.strides[0], size, size))
+        # Each kept output ends on the last branch of its input sample
+        down_windows = as_strided(down_ext[:, factor - 1:], (channels, frames, len(self._down_taps)),
+                                  (down_ext.strides[0], factor * size, size))
+        views = (up_ext[:, up_keep:], up_ext[:, frames:], up_ext[:, :up_keep], up_windows,
+                 upsampled, upsampled.reshape(channels, frames * factor),
+                 down_ext[:, down_keep:], down_ext[:, frames * factor:], down_ext[:, :down_keep],
+                 down_windows, down_out, down_out[:, :, 0].T, self._down_taps[:, None])
+        self._up_history = up_ext[:, :up_keep]
+        self._down_history = down_ext[:, :down_keep]
+        self._views = (frames, views)
+        return views
+
+    def process(self, audio, out, shape):
+        """
+        Upsample `audio` (frames, channels), run `shape(signal, out)` on the
+        oversampled block in place, then filter and decimate the result into `out`
+        """
+        frames = len(audio)
+        (up_new, up_tail, up_head, up_windows, upsampled, flat,
+         down_new, down_tail, down_head, down_windows, down_out, down_frames,
+         down_taps) = self._block_views(frames)
+
+        up_new[:] = audio.T
+        np.matmul(up_windows, self._up_taps, out=upsampled)
+        up_head[:] = up_tail
+
+        shape(flat, flat)
+        down_new[:] = flat
+
+        np.matmul(down_windows, down_taps, out=down_out)
+        down_head[:] = down_tail
+        out[:] = down_frames
+        return out
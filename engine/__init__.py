@@ -0,0 +1,10 @@
+from .stats import CallbackStats
+from .allocations import AllocationMonitor
+from .ring import Ring, SharedRing
+from .process import Engine, EngineProcess
+from .remote import RemoteChain, RemoteLooper, RemotePresets
+from .simulated import SimulatedStream
+from .recorder import SessionRecorder
+
+__all__ = ['CallbackStats', 'AllocationMonitor', 'Ring', 'SharedRing', 'Engine', 'EngineProcess',
+           'RemoteChain', 'RemoteLooper', 'RemotePresets', 'SimulatedStream', 'SessionRecorder']
@@ -0,0 +1,58 @@
+"""
+Debug mode that flags memory allocations inside the audio callback
+
+tracemalloc's peak counter is reset before each callback and read after
+it, which catches buffers that are allocated and freed again within the
+same callback. Small Python objects (scalars, array views) come and go all
+the time, so only peaks above a threshold are flagged, and the first few
+callbacks are skipped while effects size their scratch buffers
+"""
+import tracemalloc
+
+
+class AllocationMonitor:
+    """Wraps an audio callback and counts callbacks that allocated block-sized memory"""
+
+    def __init__(self, threshold_bytes=1024, warmup=16):
+        self.threshold_bytes = threshold_bytes
+        self.warmup = warmup
+        self.callbacks = 0
+        self.flagged = 0
+        self.worst_bytes = 0
+        self.worst_trace = None
+
+    def wrap(self, callback):
+        """Return callback wrapped with allocation tracking (starts tracemalloc)"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(8)
+
+        def monitored(indata, outdata, frames, time_data, status):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            callback(indata, outdata, frames, time_data, status)
+            _, peak = tracemalloc.get_traced_memory()
+            self._record(peak - before)
+
+        return monitored
+
+    def _record(self, grown):
+        self.callbacks += 1
+        if self.callbacks <= self.warmup or grown < self.threshold_bytes:
+            return
+        self.flagged += 1
+        if grown > self.worst_bytes:
+            self.worst_bytes = grown
+            # Where the memory still held after the callback came from
+            snapshot = tracemalloc.take_snapshot()
+            largest = snapshot.statistics('traceback')[:1]
+            self.worst_trace = largest[0].traceback.format() if largest else None
+
+    def format_summary(self):
+        """Human readable report for the Menu"""
+        checked = max(0, self.callbacks - self.warmup)
+        lines = [f"allocation debug: {self.flagged} of {checked} callbacks allocated "
+                 f">= {self.threshold_bytes} bytes (worst {self.worst_bytes} bytes)"]
+        if self.worst_trace:
+            lines.append("largest live allocation at the worst callback:")
+            lines.extend("    " + line for line in self.worst_trace)
+        return "\n".join(lines)
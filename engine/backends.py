@@ -0,0 +1,77 @@
+"""
+Audio backends: what opens the stream the callback runs on
+
+Each backend is a function opening a duplex stream with the
+sounddevice.Stream interface (a context manager calling
+`callback(indata, outdata, frames, time, status)` once per block), and one
+describing its devices. 'sounddevice' is the sound card through PortAudio;
+'simulated' is SimulatedStream, which needs no device at all: it runs the
+callback on the same wall-clock schedule with synthetic or file input
+(SIMULATED_INPUT) and counts every deadline the callback misses
+
+Others can be added with register_backend()
+"""
+from config import SIMULATED_INPUT, SIMULATED_LOOPBACK_MS
+from .simulated import SimulatedStream, simulated_input
+
+_backends = {}
+
+
+def register_backend(name, open_stream, query_devices):
+    """
+    Add a backend: open_stream(callback, sample_rate, block_size, channels,
+    devices, **options) returns the stream, query_devices() a description
+    """
+    _backends[name] = (open_stream, query_devices)
+
+
+def backend_names():
+    return list(_backends)
+
+
+def _backend(name):
+    try:
+        return _backends[name]
+    except KeyError:
+        raise ValueError(f"Unknown audio backend '{name}', choose from: {', '.join(_backends)}") from None
+
+
+def open_stream(backend, callback, sample_rate, block_size, channels, devices=(None, None), **options):
+    """Open (not start) a duplex float32 stream on `backend`; use it as a context manager"""
+    return _backend(backend)[0](callback, sample_rate, block_size, channels, devices, **options)
+
+
+def query_devices(backend):
+    """The backend's devices, for printing"""
+    return _backend(backend)[1]()
+
+
+def _open_sounddevice(callback, sample_rate, block_size, channels, devices, **options):
+    import sounddevice as sd
+    return sd.Stream(samplerate=sample_rate, blocksize=block_size, dtype="float32", channels=channels,
+                     callback=callback, device=devices, latency="low", **options)
+
+
+def _sounddevice_devices():
+    import sounddevice as sd
+    return str(sd.query_devices())
+
+
+def _open_simulated(callback, sample_rate, block_size, channels, devices, **options):
+    # Late blocks are lost, as on a sound card, unless the caller wants every one processed
+    options.setdefault('drop_late', True)
+    if 'input_signal' not in options:
+        options['input_signal'] = simulated_input(SIMULATED_INPUT, sample_rate, channels)
+    if 'loopback' not in options and SIMULATED_LOOPBACK_MS is not None:
+        options['loopback'] = int(round(SIMULATED_LOOPBACK_MS * sample_rate / 1000))
+    return SimulatedStream(sample_rate, block_size, callback, channels, **options)
+
+
+def _simulated_devices():
+    source = SIMULATED_INPUT or "silence"
+    loopback = f", output looped back after {SIMULATED_LOOPBACK_MS:g} ms" if SIMULATED_LOOPBACK_MS is not None else ""
+    return f"Simulated stream: input from {source}{loopback}"
+
+
+register_backend('sounddevice', _open_sounddevice, _sounddevice_devices)
+register_backend('simulated', _open_simulated, _simulated_devices)
@@ -0,0 +1,245 @@
+"""
+Round-trip latency: play a test signal out and find it again in the input
+
+With the output wired back to the input (a loopback cable, or the simulated
+stream's `loopback`), a known signal is played and the input recorded. The
+lag where the two cross-correlate best is the round trip: every buffer in
+the driver, the converters and the callback's own blocks included. An
+exponential sine sweep (chirp) or a maximum length sequence (MLS) both
+correlate to a single sharp peak, which noise barely moves
+
+The result is stored per device, sample rate and block size, and the looper
+uses it to line recordings up with what the player heard (see Looper.set_latency)
+
+    python -m engine.latency
+    python -m engine.latency --simulated 10 --signal mls
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import numpy as np
+from config import SAMPLE_RATE, BUFFER_SIZE, CHANNELS, INPUT_DEVICE, OUTPUT_DEVICE, AUDIO_BACKEND
+from config import SIMULATED_LOOPBACK_MS, LATENCY_FILE, LATENCY_SIGNAL, LATENCY_REPEATS
+from .backends import open_stream
+
+SIGNALS = ('chirp', 'mls')
+
+# Feedback taps of a maximal length shift register per MLS order
+MLS_TAPS = {10: (10, 7), 11: (11, 9), 12: (12, 6, 4, 1), 13: (13, 4, 3, 1), 14: (14, 5, 3, 1),
+            15: (15, 14), 16: (16, 15, 13, 4), 17: (17, 14), 18: (18, 11)}
+
+# Correlation peak over the RMS of the rest below which there's no clear return
+MIN_CLARITY = 12.0
+# Frames either side of the peak left out of that RMS: the peak's own width
+PEAK_WIDTH = 64
+
+
+def chirp(sample_rate, seconds=0.5, low=100.0, high=10000.0, level=0.5):
+    """Exponential sine sweep from `low` to `high` Hz, with short fades at both ends"""
+    length = int(seconds * sample_rate)
+    t = np.arange(length) / sample_rate
+    rate = np.log(high / low)
+    sweep = np.sin(2 * np.pi * low * seconds / rate * (np.exp(t / seconds * rate) - 1.0))
+    fade = min(length // 2, int(0.005 * sample_rate))
+    ramp = np.hanning(2 * fade)
+    sweep[:fade] *= ramp[:fade]
+    sweep[length - fade:] *= ramp[fade:]
+    return (sweep * level).astype('float32')
+
+
+def mls(order=15, level=0.5):
+    """Maximum length sequence of 2**order - 1 samples at +-level, from a shift register"""
+    taps = MLS_TAPS[order]
+    state = [1] * order
+    bits = np.empty(2 ** order - 1, dtype='float32')
+    for i in range(len(bits)):
+        bits[i] = state[-1]
+        feedback = 0
+        for tap in taps:
+            feedback ^= state[tap - 1]
+        state = [feedback] + state[:-1]
+    return (bits * 2.0 - 1.0) * np.float32(level)
+
+
+def test_signal(name, sample_rate, level=0.5):
+    """The named test signal, about half a second of it"""
+    if name == 'chirp':
+        return chirp(sample_rate, level=level)
+    if name == 'mls':
+        # The shortest sequence of at least half a second
+        order = min(max(10, int(np.ceil(np.log2(sample_rate / 2 + 1)))), max(MLS_TAPS))
+        return mls(order, level)
+    raise ValueError(f"Unknown test signal '{name}', choose from: {', '.join(SIGNALS)}")
+
+
+def find_delay(sent, received):
+    """
+    Lag in frames at which `sent` best matches `received`, and how clearly:
+    the correlation peak over the RMS of the correlation everywhere else
+    """
+    size = 1 << int(len(sent) + len(received) - 1).bit_length()
+    spectrum = np.fft.rfft(received, size) * np.conj(np.fft.rfft(sent, size))
+    # Non-negative lags only: the return can't come before the signal went out.
+    # Absolute value, since some interfaces invert the polarity
+    correlation = np.abs(np.fft.irfft(spectrum, size)[:len(received)])
+    lag = int(np.argmax(correlation))
+    rest = np.concatenate((correlation[:max(0, lag - PEAK_WIDTH)], correlation[lag + PEAK_WIDTH:]))
+    floor = np.sqrt(np.mean(rest ** 2)) if len(rest) else 0.0
+    clarity = correlation[lag] / floor if floor > 0 else np.inf
+    return lag, float(clarity)
+
+
+class LatencyProbe:
+    """
+    Stream callback that plays the test signal `repeats` times, each followed
+    by `max_frames` of silence for it to come back in, and records the input
+    """
+
+    def __init__(self, signal, max_frames, repeats=3, channel=0):
+        self.signal = signal
+        self.channel = channel
+        self.period = len(signal) + max_frames
+        self.repeats = repeats
+        self.play = np.zeros(self.period * repeats, dtype='float32')
+        for run in range(repeats):
+            self.play[run * self.period:run * self.period + len(signal)] = signal
+        self.captured = np.zeros_like(self.play)
+        self.position = 0
+        self.done = threading.Event()
+
+    def __call__(self, indata, outdata, frames, time_data, status):
+        position = self.position
+        count = max(0, min(frames, len(self.play) - position))
+        outdata[:count] = self.play[position:position + count, None]
+        outdata[count:] = 0.0
+        self.captured[position:position + count] = indata[:count, self.channel]
+        self.position += frames
+        if count < frames:
+            self.done.set()
+
+    def delays(self):
+        """(lag, clarity) of every run"""
+        return [find_delay(self.signal, self.captured[run * self.period:(run + 1) * self.period])
+                for run in range(self.repeats)]
+
+
+def measure_latency(open_stream, sample_rate, signal='chirp', repeats=3, max_seconds=0.5, channel=0):
+    """
+    Measure the round trip through a stream: `open_stream(callback)` opens
+    it, as a context manager. Returns a dict of the result; raises
+    RuntimeError if the signal doesn't come back clearly
+    """
+    sent = test_signal(signal, sample_rate)
+    probe = LatencyProbe(sent, int(max_seconds * sample_rate), repeats, channel)
+    timeout = len(probe.play) / sample_rate + 5.0
+    with open_stream(probe) as stream:
+        reported = getattr(stream, 'latency', None)
+        if not probe.done.wait(timeout):
+            raise RuntimeError(f"The stream didn't play the test signal within {timeout:.0f}s")
+
+    runs = probe.delays()
+    lags = [lag for lag, _ in runs]
+    clarity = min(clarity for _, clarity in runs)
+    if clarity < MIN_CLARITY:
+        raise RuntimeError(f"No clear return of the test signal (clarity {clarity:.1f}): "
+                           "is the output wired back to the input, and the volume up?")
+    frames = int(np.median(lags))
+    if isinstance(reported, (int, float)):
+        reported = (float(reported), float(reported))
+    return {
+        'frames': frames,
+        'ms': frames / sample_rate * 1000,
+        'spread': max(lags) - min(lags),
+        'clarity': clarity,
+        'signal': signal,
+        'runs': lags,
+        'reported': list(reported) if reported is not None else None,
+    }
+
+
+def format_report(result, sample_rate, block_size):
+    """The measured round trip, next to what buffering alone accounts for"""
+    buffering = 2 * block_size / sample_rate * 1000
+    lines = [f"Round-trip latency: {result['ms']:.1f} ms ({result['frames']} frames)"]
+    if 'spread' in result:
+        lines[0] += f", {result['signal']}, spread {result['spread']} frames over {len(result['runs'])} runs"
+    lines.append(f"  buffering: 2 blocks of {block_size} frames = {buffering:.1f} ms")
+    reported = result.get('reported')
+    if reported:
+        in_ms, out_ms = reported[0] * 1000, reported[1] * 1000
+        lines.append(f"  stream reports: in {in_ms:.1f} + out {out_ms:.1f} = {in_ms + out_ms:.1f} ms; "
+                     f"{result['ms'] - in_ms - out_ms:+.1f} ms measured beyond that")
+    return "\n".join(lines)
+
+
+def device_key(input_device, output_device, sample_rate, block_size, backend='sounddevice'):
+    """What a latency is stored under: it changes with the devices, rate and block size"""
+    devices = f"{input_device}->{output_device}" if backend == 'sounddevice' else backend
+    return f"{devices}@{sample_rate}/{block_size}"
+
+
+def load_latency(path, key):
+    """The stored measurement for `key`, or None"""
+    try:
+        with open(os.path.expanduser(path)) as f:
+            return json.load(f).get(key)
+    except (OSError, ValueError):
+        return None
+
+
+def save_latency(path, key, result):
+    """Store a measurement under `key`, keeping the other devices'"""
+    path = os.path.expanduser(path)
+    try:
+        with open(path) as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        stored = {}
+    stored[key] = {'frames': result['frames'], 'ms': round(result['ms'], 3), 'signal': result['signal'],
+                   'reported': result['reported'], 'measured': time.strftime('%Y-%m-%d %H:%M:%S')}
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(stored, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the round-trip latency over a loopback cable")
+    parser.add_argument('--signal', choices=SIGNALS, default=LATENCY_SIGNAL, help="test signal")
+    parser.add_argument('--repeats', type=int, default=LATENCY_REPEATS, help="runs to take the median of")
+    parser.add_argument('--channel', type=int, default=0, help="input channel the cable comes back in on")
+    parser.add_argument('--simulated', type=float, nargs='?', metavar='MS',
+                        const=SIMULATED_LOOPBACK_MS or 10.0,
+                        default=SIMULATED_LOOPBACK_MS if AUDIO_BACKEND == 'simulated' else None,
+                        help="measure a simulated stream with this loopback delay instead of the sound card")
+    parser.add_argument('--no-save', action='store_true', help=f"don't store the result in {LATENCY_FILE}")
+    args = parser.parse_args(argv)
+
+    backend = 'simulated' if args.simulated is not None else AUDIO_BACKEND
+    options = {}
+    if backend == 'simulated':
+        # Silence in, apart from the cable, and every block processed
+        options = {'input_signal': None, 'drop_late': False}
+        if args.simulated is not None:
+            options['loopback'] = int(round(args.simulated * SAMPLE_RATE / 1000))
+
+    def open_test_stream(callback):
+        return open_stream(backend, callback, SAMPLE_RATE, BUFFER_SIZE, CHANNELS, (INPUT_DEVICE, OUTPUT_DEVICE),
+                           **options)
+
+    try:
+        result = measure_latency(open_test_stream, SAMPLE_RATE, args.signal, args.repeats, channel=args.channel)
+    except RuntimeError as error:
+        print(error)
+        return 1
+    print(format_report(result, SAMPLE_RATE, BUFFER_SIZE))
+    if not args.no_save:
+        key = device_key(INPUT_DEVICE, OUTPUT_DEVICE, SAMPLE_RATE, BUFFER_SIZE, backend)
+        save_latency(LATENCY_FILE, key, result)
+        print(f"Stored for {key} in {LATENCY_FILE}; the looper compensates for it from the next start")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,311 @@
+"""
+DSP engine in its own process
+
+The audio callback then only copies blocks in and out of shared-memory
+rings, so nothing else in the interpreter it runs in (the menu's input(),
+printing, a future UI) can hold the GIL while a block is due. The engine
+process runs the effects with real-time scheduling and pinned to a CPU
+where the OS allows it, and takes menu commands from a separate small
+shared-memory queue between blocks
+
+Output is `latency_frames` behind the input: the output ring starts with
+that much silence, which is the time the engine has to turn a block around
+"""
+import os
+import threading
+import time
+import multiprocessing
+import numpy as np
+from effects import EffectChain, Looper, PresetBank
+from effects.registry import effect_class
+from .ring import SharedRing
+
+COMMAND_DTYPE = np.dtype([('sequence', 'i4'), ('target', 'S8'), ('method', 'S24'),
+                          ('name', 'S24'), ('index', 'i4'), ('value', 'f8')])
+REPLY_DTYPE = np.dtype([('sequence', 'i4'), ('ok', '?'), ('value', 'f8'), ('message', 'S256')])
+QUEUE_SIZE = 64
+
+LOOPER_METHODS = ('start_recording', 'stop_recording', 'stop_playback', 'toggle_playback',
+                  'clear_loop', 'get_status', 'start_overdub', 'stop_overdub', 'undo', 'redo')
+LOOPER_STATE = ('is_recording', 'is_counting_in', 'is_playing', 'is_overdubbing', 'loop_length')
+
+
+def set_realtime(priority, cpu):
+    """
+    Give the calling process SCHED_FIFO `priority` and pin it to `cpu`, as far
+    as the OS and our permissions allow. Returns a description of what was applied
+    """
+    applied = []
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, {cpu})
+            applied.append(f"pinned to CPU {cpu}")
+        except OSError as e:
+            applied.append(f"CPU affinity not set ({e.strerror})")
+    if priority and hasattr(os, 'sched_setscheduler'):
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+            applied.append(f"SCHED_FIFO priority {priority}")
+        except OSError as e:
+            # Needs root, CAP_SYS_NICE or an rtprio entry in limits.conf
+            applied.append(f"real-time scheduling not allowed ({e.strerror})")
+    return ", ".join(applied) or "default scheduling"
+
+
+class Engine:
+    """
+    The effects, chain and looper, processed the way PyPiPedals.audio_callback
+    does, with the menu's selection and looper controls arriving as commands
+    """
+
+    def __init__(self, effect_names, sample_rate, max_frames, channels=1, presets=None):
+        self.effects = [effect_class(name)(sample_rate) for name in effect_names]
+        self.effect_chain = EffectChain(sample_rate)
+        for effect in self.effects:
+            self.effect_chain.add_effect(effect, active=False)
+        self.looper = Looper(sample_rate)
+        self.presets = PresetBank(sample_rate, presets, max_frames, channels) if presets else None
+        self.current_effect_idx = 0
+        self.chain_mode = False
+        self.preset_mode = False
+        self.effect_out = np.zeros((max_frames, channels), dtype="float32")
+
+    def warm_up(self, frames, blocks=4):
+        """
+        Run every effect on a few blocks of silence and reset it again, so
+        coefficient tables and work buffers exist before the first real block
+        """
+        silence = np.zeros(self.effect_out[:frames].shape, dtype="float32")
+        out = np.zeros_like(silence)
+        for effect in self.effects:
+            for _ in range(blocks):
+                effect.process_into(silence, out, frames)
+            effect.reset()
+
+    def get_current_effect(self):
+        if self.preset_mode:
+            return self.presets
+        if self.chain_mode:
+            return self.effect_chain
+        return self.effects[self.current_effect_idx]
+
+    def process_into(self, audio, out, frames):
+        effect_out = self.effect_out[:frames]
+        self.get_current_effect().process_into(audio, effect_out, frames)
+        self.looper.process_into(effect_out, out, frames)
+
+    def handle(self, target, method, name, index, value):
+        """Apply one command; returns (ok, value, message) for the reply"""
+        if target == 'engine' and method == 'select':
+            if not 0 <= index < len(self.effects):
+                return False, 0.0, "invalid effect number"
+            self.current_effect_idx = index
+            self.chain_mode = bool(value)
+            self.preset_mode = False
+            return True, 0.0, ""
+        if target == 'presets' and self.presets is not None:
+            bank = self.presets
+            if method == 'names':
+                return True, 0.0, ",".join(bank.names)
+            if method == 'select':
+                if not 0 <= index < len(bank.names):
+                    return False, 0.0, f"No preset {index + 1}, there are {len(bank.names)}"
+                if bank.switching():
+                    return True, 0.0, "Still switching, try again"
+                self.preset_mode = True
+                # Preparing the chain takes a few blocks' worth of work: do it beside
+                # the block loop, which picks the switch up once it's ready
+                threading.Thread(target=bank.select, args=(index,), daemon=True).start()
+                return True, 0.0, f"Switching to {bank.names[index]}"
+        if target == 'chain':
+            if method == 'toggle_effect':
+                return self.effect_chain.toggle_effect(index), 0.0, ""
+            if method == 'is_active':
+                return True, float(self.effect_chain.is_active(index)), ""
+            if method == 'get_status_display':
+                return True, 0.0, self.effect_chain.get_status_display()
+            if method == 'reset':
+                self.effect_chain.reset()
+                return True, 0.0, ""
+        if target == 'looper':
+            if method in LOOPER_METHODS:
+                return True, 0.0, getattr(self.looper, method)()
+            if method == 'get' and name in LOOPER_STATE:
+                return True, float(getattr(self.looper, name)), ""
+            if method == 'set_latency':
+                return True, 0.0, self.looper.set_latency(index)
+        if target == 'effect' and 0 <= index < len(self.effects):
+            effect = self.effects[index]
+            if method == 'name':
+                return True, 0.0, effect.name
+            if method == 'params':
+                return True, 0.0, ",".join(effect.PARAMS)
+            # Values are set as numbers; a set is queued like any other and lands
+            # at the start of the next block. Named settings come back as the message
+            if method in ('get', 'set') and name in effect.PARAMS:
+                try:
+                    if method == 'set':
+                        effect.set_param(name, value)
+                    current = effect.get_param(name)
+                except (TypeError, ValueError) as error:
+                    return False, 0.0, str(error)[:256]
+                if isinstance(current, str):
+                    return True, 0.0, current
+                return True, float(current), ""
+            if method in ('get', 'set'):
+                return False, 0.0, f"{effect.name} has no parameter '{name}'"
+        return False, 0.0, f"unknown command {target}.{method}"
+
+
+def run_engine(specs, effect_names, sample_rate, block_size, channels, priority, cpu, poll_seconds,
+               parent_pid, presets=None):
+    """Engine process main loop"""
+    realtime = set_realtime(priority, cpu)
+    audio_in, audio_out, commands, replies = (SharedRing.attach(spec) for spec in specs)
+    engine = Engine(effect_names, sample_rate, block_size, channels, presets)
+    engine.warm_up(block_size)
+
+    # The audio rings hold interleaved samples, frames * channels at a time
+    block = np.zeros((block_size, channels), dtype="float32")
+    out = np.zeros((block_size, channels), dtype="float32")
+    command = np.zeros(1, dtype=COMMAND_DTYPE)
+    reply = np.zeros(1, dtype=REPLY_DTYPE)
+
+    # First reply tells the parent we are ready
+    reply[0] = (0, True, 0.0, realtime.encode())
+    replies.write(reply)
+
+    running = True
+    while running:
+        # Commands are applied between blocks, never in the middle of one
+        while commands.read_into(command):
+            sequence, target, method, name, index, value = command[0].tolist()
+            target, method, name = target.decode(), method.decode(), name.decode()
+            if target == 'engine' and method == 'quit':
+                running = False
+                break
+            ok, value, message = engine.handle(target, method, name, index, value)
+            reply[0] = (sequence, ok, value, message.encode()[:REPLY_DTYPE['message'].itemsize])
+            replies.write(reply)
+
+        frames = min(audio_in.available(), audio_out.space()) // channels
+        frames = min(frames, block_size)
+        if frames == 0:
+            if os.getppid() != parent_pid:
+                break  # parent went away without telling us
+            time.sleep(poll_seconds)
+            continue
+
+        audio_in.read_into(block[:frames].reshape(-1))
+        engine.process_into(block[:frames], out[:frames], frames)
+        audio_out.write(out[:frames].reshape(-1))
+
+    for ring in (audio_in, audio_out, commands, replies):
+        ring.close()
+
+
+class EngineProcess:
+    """
+    Parent side of the engine process
+
+    exchange() is all the audio callback calls; call() sends a command from
+    the menu and waits for the engine's reply
+    """
+
+    def __init__(self, effect_names, sample_rate, block_size, ring_blocks=8, prefill_blocks=1,
+                 priority=None, cpu=None, poll_seconds=0.0002, channels=1, presets=None):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.channels = channels
+        self.latency_frames = prefill_blocks * block_size
+        capacity = max(ring_blocks, prefill_blocks + 2) * block_size * channels
+        self.audio_in = SharedRing(capacity)
+        self.audio_out = SharedRing(capacity)
+        self.commands = SharedRing(QUEUE_SIZE, COMMAND_DTYPE)
+        self.replies = SharedRing(QUEUE_SIZE, REPLY_DTYPE)
+
+        self.underruns = 0  # callbacks that got less than a full block back
+        self.overruns = 0   # callbacks whose input did not fit in the ring
+        self._late = 0
+        self.realtime = None
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._command = np.zeros(1, dtype=COMMAND_DTYPE)
+        self._reply = np.zeros(1, dtype=REPLY_DTYPE)
+
+        specs = [ring.spec for ring in (self.audio_in, self.audio_out, self.commands, self.replies)]
+        self._process = multiprocessing.Process(
+            target=run_engine, name="PyPiPedals engine", daemon=True,
+            args=(specs, list(effect_names), sample_rate, block_size, channels, priority, cpu,
+                  poll_seconds, os.getpid(), presets))
+
+    def start(self, timeout=30.0):
+        """Start the engine process and wait until its effects are built"""
+        self.audio_out.write(np.zeros(self.latency_frames * self.channels, dtype="float32"))
+        self._process.start()
+        _, _, self.realtime = self._wait_reply(0, timeout)
+        return self.realtime
+
+    def exchange(self, audio, out):
+        """
+        Audio callback side: hand one input block to the engine and fill
+        `out` with the next processed block, or silence if it isn't ready
+        Both are (frames, channels) and C-contiguous, as sounddevice passes them
+        """
+        audio = audio.reshape(-1)
+        out = out.reshape(-1)
+        # Whole blocks only, so the channels stay interleaved in step
+        if self.audio_in.space() >= len(audio):
+            self.audio_in.write(audio)
+        else:
+            self.overruns += 1
+        # Output that missed its callback is dropped when it turns up,
+        # so one late block is a glitch rather than latency for good
+        if self._late:
+            self._late -= self.audio_out.discard(self._late)
+        got = self.audio_out.read_into(out)
+        if got < len(out):
+            out[got:] = 0.0
+            self.underruns += 1
+            self._late += len(out) - got
+
+    def call(self, target, method, name='', index=0, value=0.0, timeout=1.0):
+        """Send one command and return the engine's (ok, value, message) reply"""
+        with self._lock:
+            self._sequence += 1
+            self._command[0] = (self._sequence, target.encode(), method.encode(), name.encode(),
+                                index, value)
+            while not self.commands.write(self._command):
+                time.sleep(0.001)
+            return self._wait_reply(self._sequence, timeout)
+
+    def _wait_reply(self, sequence, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.replies.read_into(self._reply):
+                reply_sequence, ok, value, message = self._reply[0].tolist()
+                if reply_sequence == sequence:
+                    return ok, value, message.decode()
+                continue  # late reply to a call that timed out
+            if not self._process.is_alive():
+                raise RuntimeError("Engine process has stopped")
+            time.sleep(0.001)
+        raise TimeoutError(f"No reply from the engine process within {timeout}s")
+
+    def format_summary(self):
+        return (f"Engine process: {self.realtime}\n"
+                f"  latency {self.latency_frames} frames "
+                f"({self.latency_frames / self.sample_rate * 1000:.1f} ms), "
+                f"underruns {self.underruns}, overruns {self.overruns}")
+
+    def stop(self, timeout=2.0):
+        """Ask the engine to quit, then release the shared memory"""
+        if self._process.is_alive():
+            self._command[0] = (0, b'engine', b'quit', b'', 0, 0.0)
+            self.commands.write(self._command)
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join()
+        for ring in (self.audio_in, self.audio_out, self.commands, self.replies):
+            ring.close()
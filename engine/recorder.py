@@ -0,0 +1,140 @@
+"""
+Session recorder: the dry input and the final output of every block, to disk
+
+The audio callback never touches a file. record() copies the input and the
+output side by side into a preallocated ring (see ring.py) and returns; a
+writer thread drains the ring in large chunks into two WAV files, one for
+the dry input and one for the processed output, written sequentially.
+
+The ring holds `headroom_seconds` of audio: how long the disk may stall (an
+SD card flushing, say) before blocks are lost, plus the WRITE_SECONDS chunk
+the writer waits to fill. A block that doesn't fit is dropped from both
+files, so they stay in step with each other, and counted
+"""
+import math
+import os
+import threading
+import time
+import numpy as np
+from wavfile import WavWriter
+from .ring import Ring
+
+# Audio the writer thread moves per write
+WRITE_SECONDS = 0.5
+
+
+class SessionRecorder:
+    """Records sessions from the audio callback through a ring and a writer thread"""
+
+    def __init__(self, sample_rate, block_size, channels, headroom_seconds, directory,
+                 sample_format='float32'):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.directory = directory
+        self.sample_format = sample_format
+        # The headroom plus the chunk the writer waits for, in whole blocks: with
+        # only the headroom, a ring no bigger than a chunk would have to fill up
+        # before every write, and drop blocks each time
+        chunk = int(WRITE_SECONDS * sample_rate)
+        blocks = math.ceil((headroom_seconds * sample_rate + chunk) / block_size)
+        self.ring = Ring(blocks * block_size, ('float32', (2 * channels,)))
+        self.headroom = (self.ring.capacity - chunk) / sample_rate
+
+        # Writer thread buffers: a chunk off the ring, then each side contiguous for the file
+        self._chunk = np.zeros((chunk, 2 * channels), dtype='float32')
+        self._dry = np.zeros((chunk, channels), dtype='float32')
+        self._wet = np.zeros((chunk, channels), dtype='float32')
+
+        self.recording = False
+        # Counted by the callback: queued in the ring, and dropped because it was full
+        self.frames = 0
+        self.dropped = 0
+        self.written = 0      # Frames in each file so far, counted by the writer
+        self.paths = None
+        self.error = None
+        self._writers = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def record(self, indata, outdata, frames):
+        """Audio thread: queue this block's input and output; never blocks or allocates"""
+        if not self.recording:
+            return
+        if self.ring.write_parts((indata[:frames], outdata[:frames])):
+            self.frames += frames
+        else:
+            self.dropped += 1
+
+    def start(self):
+        """Open a new pair of session files and start recording into them"""
+        if self.recording:
+            return "Already recording the session"
+        if self._thread is not None:
+            self.stop()  # Stopped by a write error: close those files first
+        directory = os.path.expanduser(self.directory)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        paths = tuple(os.path.join(directory, f"session-{stamp}-{side}.wav") for side in ('dry', 'wet'))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            writers = [WavWriter(path, self.sample_rate, self.channels, self.sample_format) for path in paths]
+        except OSError as error:
+            return f"Can't record the session: {error}"
+
+        # Whatever an earlier session left unread is gone with it
+        self.ring.discard(self.ring.available())
+        self.paths, self._writers = paths, writers
+        self.frames = self.dropped = self.written = 0
+        self.error = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._write, name="Session writer", daemon=True)
+        self._thread.start()
+        # Last: the callback starts queueing once the writer is there to drain it
+        self.recording = True
+        return f"Recording the session to {paths[0]} and {os.path.basename(paths[1])}"
+
+    def stop(self):
+        """Stop recording; everything already queued is written before the files are closed"""
+        if self._thread is None:
+            return "Not recording the session"
+        self.recording = False
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        for writer in self._writers:
+            writer.close()
+        self._writers = None
+        return f"Session saved ({self.written / self.sample_rate:.1f}s, {self.dropped} blocks dropped)"
+
+    def _write(self):
+        """Writer thread: drain the ring in large chunks until stopped, then drain what's left"""
+        dry, wet = self._writers
+        channels = self.channels
+        full = len(self._chunk)
+        while True:
+            stopping = self._stop.wait(WRITE_SECONDS / 4)
+            # Large writes only, unless it's the end
+            while self.ring.available() >= full or (stopping and self.ring.available() > 0):
+                count = self.ring.read_into(self._chunk)
+                np.copyto(self._dry[:count], self._chunk[:count, :channels])
+                np.copyto(self._wet[:count], self._chunk[:count, channels:])
+                try:
+                    dry.write(self._dry[:count])
+                    wet.write(self._wet[:count])
+                except OSError as error:
+                    # Disk full or gone: stop recording and say so in the status
+                    self.error = str(error)
+                    self.recording = False
+                    return
+                self.written += count
+            if stopping:
+                return
+
+    def get_status(self):
+        """Status line for the menu"""
+        if self.error is not None:
+            return f"ERROR ({self.error}), {self.dropped} blocks dropped"
+        if not self.recording:
+            return "off"
+        minutes, seconds = divmod(int(self.frames / self.sample_rate), 60)
+        fill = self.ring.available() / self.ring.capacity
+        return f"REC {minutes}:{seconds:02d}, ring {fill:.0%}, {self.dropped} blocks dropped"
@@ -0,0 +1,163 @@
+"""
+Stand-ins for the effect chain and looper when the DSP runs in the engine
+process. They offer the methods Menu uses and forward each one as a command
+"""
+
+
+class RemoteEffect:
+    """An effect in the engine process, by index"""
+
+    def __init__(self, engine, index):
+        self.engine = engine
+        self.index = index
+        _, _, self.name = engine.call('effect', 'name', index=index)
+
+    def load(self):
+        """The engine process builds its effects up front"""
+        pass
+
+    def param_names(self):
+        message = self.engine.call('effect', 'params', index=self.index)[2]
+        return message.split(",") if message else []
+
+    def get_param(self, name):
+        ok, value, message = self.engine.call('effect', 'get', name=name, index=self.index)
+        if not ok:
+            raise AttributeError(message)
+        # Named settings (a waveform, a curve) come back as the message
+        return message or value
+
+    def set_param(self, name, value):
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError(f"only numeric parameters can be set in the engine process, not '{value}'")
+        ok, value, message = self.engine.call('effect', 'set', name=name, index=self.index, value=value)
+        if not ok:
+            raise AttributeError(message)
+        return message or value
+
+
+class RemoteChain:
+    """The engine's EffectChain"""
+
+    def __init__(self, engine, count):
+        self.engine = engine
+        self.effects = [RemoteEffect(engine, index) for index in range(count)]
+
+    @property
+    def name(self):
+        return "Effect Chain"
+
+    def toggle_effect(self, index):
+        return self.engine.call('chain', 'toggle_effect', index=index)[0]
+
+    def is_active(self, index):
+        return bool(self.engine.call('chain', 'is_active', index=index)[1])
+
+    def get_status_display(self):
+        return self.engine.call('chain', 'get_status_display')[2]
+
+    def reset(self):
+        self.engine.call('chain', 'reset')
+
+    # The engine applies commands between blocks anyway
+    request_reset = reset
+
+
+class RemotePresets:
+    """The engine's PresetBank"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.names = engine.call('presets', 'names')[2].split(",")
+        self.selected = 0
+
+    @property
+    def name(self):
+        return f"Presets ({self.names[self.selected]})"
+
+    def select(self, index):
+        ok, _, message = self.engine.call('presets', 'select', index=index)
+        if not ok:
+            raise ValueError(message)
+        if message.startswith("Switching"):
+            self.selected = index
+        return message
+
+
+class RemoteLooper:
+    """The engine's Looper; state is read back from the engine on every access"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    @property
+    def name(self):
+        return "Looper"
+
+    def _command(self, method):
+        return self.engine.call('looper', method)[2]
+
+    def _state(self, name):
+        return self.engine.call('looper', 'get', name=name)[1]
+
+    def start_recording(self):
+        return self._command('start_recording')
+
+    def stop_recording(self):
+        return self._command('stop_recording')
+
+    def stop_playback(self):
+        return self._command('stop_playback')
+
+    def toggle_playback(self):
+        return self._command('toggle_playback')
+
+    def clear_loop(self):
+        return self._command('clear_loop')
+
+    def start_overdub(self):
+        return self._command('start_overdub')
+
+    def stop_overdub(self):
+        return self._command('stop_overdub')
+
+    def undo(self):
+        return self._command('undo')
+
+    def redo(self):
+        return self._command('redo')
+
+    def set_latency(self, frames):
+        return self.engine.call('looper', 'set_latency', index=frames)[2]
+
+    def save_loop(self, path):
+        # Commands carry names of 24 bytes at most, too short for a path
+        return "Saving loops isn't available with the engine process"
+
+    def load_loop(self, path):
+        return "Loading loops isn't available with the engine process"
+
+    def get_status(self):
+        return self._command('get_status')
+
+    @property
+    def is_recording(self):
+        return bool(self._state('is_recording'))
+
+    @property
+    def is_counting_in(self):
+        return bool(self._state('is_counting_in'))
+
+    @property
+    def is_playing(self):
+        return bool(self._state('is_playing'))
+
+    @property
+    def is_overdubbing(self):
+        return bool(self._state('is_overdubbing'))
+
+    @property
+    def loop_length(self):
+        return int(self._state('loop_length'))
@@ -0,0 +1,157 @@
+"""
+Lock-free single-producer / single-consumer ring, in this process or in shared memory
+
+Used to pass audio blocks and small command records between the audio
+callback process and the DSP engine process without locks, pipes or
+pickling, and audio from the callback to a writer thread. The producer only ever stores the write count and the consumer
+only ever stores the read count, both as free-running 64-bit totals; each
+side reads the other's count to see how much data or space there is
+
+Relies on aligned 64-bit loads and stores being atomic, and on the data
+copy becoming visible before the count store that publishes it. Both hold
+on x86-64; on weakly ordered CPUs (ARM) the second one is not guaranteed
+by the hardware, so a torn block is possible there, though never a crash
+"""
+from multiprocessing import shared_memory
+import numpy as np
+from effects.circular import read_circular, write_circular
+
+# Write and read counts on separate cache lines so the two sides don't contend
+_WRITE_OFFSET = 0
+_READ_OFFSET = 64
+_HEADER_SIZE = 128
+
+
+def _attach(name):
+    """
+    Open an existing block without registering it with this process's
+    resource tracker, which would otherwise unlink it when this process exits
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always registers; engine processes started through
+        # multiprocessing share the creator's tracker, so that is harmless
+        return shared_memory.SharedMemory(name=name)
+
+
+class Ring:
+    """
+    Ring of `capacity` items of `dtype` (a sample type, a structured record,
+    or a subarray such as ('float32', (channels,)) for frames of audio)
+
+    Exactly one thread may write and one may read; preallocated, so neither
+    side allocates
+    """
+
+    def __init__(self, capacity, dtype='float32', buffer=None):
+        self.capacity = int(capacity)
+        self.dtype = np.dtype(dtype)
+        if buffer is None:
+            buffer = np.zeros(self.size(self.capacity, self.dtype), dtype=np.uint8)
+        self._written = np.ndarray(1, dtype=np.uint64, buffer=buffer, offset=_WRITE_OFFSET)
+        self._read = np.ndarray(1, dtype=np.uint64, buffer=buffer, offset=_READ_OFFSET)
+        self._data = np.ndarray(self.capacity, dtype=self.dtype, buffer=buffer, offset=_HEADER_SIZE)
+
+    @staticmethod
+    def size(capacity, dtype):
+        """Bytes of memory a ring needs, counts included"""
+        return _HEADER_SIZE + int(capacity) * np.dtype(dtype).itemsize
+
+    def available(self):
+        """Items written and not yet read"""
+        return int(self._written[0]) - int(self._read[0])
+
+    def space(self):
+        """Items that can be written without overwriting unread data"""
+        return self.capacity - self.available()
+
+    def write(self, values):
+        """
+        Producer side: append as many of `values` as fit
+        Returns how many were written; the rest are dropped
+        """
+        written = int(self._written[0])
+        count = min(len(values), self.capacity - (written - int(self._read[0])))
+        if count <= 0:
+            return 0
+        write_circular(self._data, written % self.capacity, values[:count] if count < len(values) else values)
+        self._written[0] = written + count
+        return count
+
+    def read_into(self, out):
+        """
+        Consumer side: fill `out` with the oldest unread items
+        Returns how many were read (less than len(out) when the ring runs dry)
+        """
+        read = int(self._read[0])
+        count = min(len(out), int(self._written[0]) - read)
+        if count <= 0:
+            return 0
+        read_circular(self._data, read % self.capacity, out[:count] if count < len(out) else out)
+        self._read[0] = read + count
+        return count
+
+    def write_parts(self, parts):
+        """
+        Producer side: append one block given as column groups that sit side
+        by side in each item (e.g. input and output channels of a frame ring)
+        All or nothing: returns False, writing nothing, when it doesn't fit
+        """
+        written = int(self._written[0])
+        count = len(parts[0])
+        if count > self.capacity - (written - int(self._read[0])):
+            return False
+        start = written % self.capacity
+        column = 0
+        for part in parts:
+            width = part.shape[1]
+            write_circular(self._data[:, column:column + width], start, part)
+            column += width
+        self._written[0] = written + count
+        return True
+
+    def discard(self, count):
+        """Consumer side: skip up to `count` unread items; returns how many were skipped"""
+        read = int(self._read[0])
+        count = min(count, int(self._written[0]) - read)
+        if count <= 0:
+            return 0
+        self._read[0] = read + count
+        return count
+
+
+class SharedRing(Ring):
+    """
+    Ring in shared memory, for two processes
+
+    Create it in one process, pass `spec` to the other and open it there with
+    SharedRing.attach(spec). Exactly one process may write and one may read
+    """
+
+    def __init__(self, capacity, dtype='float32', _shm=None):
+        self.owner = _shm is None
+        size = self.size(capacity, dtype)
+        self._shm = shared_memory.SharedMemory(create=True, size=size) if self.owner else _shm
+        super().__init__(capacity, dtype, self._shm.buf)
+        if self.owner:
+            self._written[0] = 0
+            self._read[0] = 0
+
+    @property
+    def spec(self):
+        """Picklable description for SharedRing.attach in another process"""
+        return (self._shm.name, self.capacity, self.dtype.descr if self.dtype.fields else self.dtype.str)
+
+    @classmethod
+    def attach(cls, spec):
+        name, capacity, dtype = spec
+        return cls(capacity, dtype, _shm=_attach(name))
+
+    def close(self):
+        """Release this process's mapping; the creator also removes the block"""
+        # numpy views keep the buffer exported; drop them before closing
+        self._written = self._read = self._data = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
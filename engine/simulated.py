@@ -0,0 +1,214 @@
+"""
+Simulated audio stream: stands in for sounddevice.Stream without a sound card
+
+A thread calls the callback once per block on the same wall-clock schedule
+a real device would, feeding it a test signal (or silence) and optionally
+keeping what it writes to the output. With `loopback` it also plays the
+part of a loopback cable: the output comes back into the input that many
+frames later, for measuring latency (see latency.py) without a sound card
+
+Every callback that takes longer than its block's worth of time (the
+deadline) is counted and logged, and the next callback is told with an
+output_underflow flag, as a sound card would. With `drop_late` the blocks
+whose time passed meanwhile are lost as well, instead of being caught up
+"""
+import collections
+import threading
+import time
+import numpy as np
+
+# Deadline misses kept in the log; older ones are only counted
+MISS_LOG_SIZE = 1000
+
+
+class CallbackFlags:
+    """The xrun flags of sounddevice.CallbackFlags; true if any is set"""
+
+    def __init__(self, output_underflow=False):
+        self.input_underflow = False
+        self.input_overflow = False
+        self.output_underflow = output_underflow
+        self.output_overflow = False
+
+    def __bool__(self):
+        return self.input_underflow or self.input_overflow or self.output_underflow or self.output_overflow
+
+    def __repr__(self):
+        return "<CallbackFlags: output underflow>" if self.output_underflow else "<CallbackFlags>"
+
+
+# Passed to the callback after a block that missed its deadline
+UNDERFLOW = CallbackFlags(output_underflow=True)
+
+
+def simulated_input(source, sample_rate, channels, seconds=4.0):
+    """
+    Input for the simulated stream: None for silence, 'sine' or 'noise', or
+    the path of a WAV file at the stream's sample rate. Returns None or a
+    (frames, channels) float32 array
+    """
+    if source is None:
+        return None
+    frames = int(seconds * sample_rate)
+    if source == 'sine':
+        t = np.arange(frames) / sample_rate
+        mono = 0.3 * np.sin(2 * np.pi * 110.0 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 0.5 * t))
+    elif source == 'noise':
+        mono = np.random.default_rng(0).normal(0.0, 0.1, frames)
+    else:
+        from wavfile import WavReader
+        with WavReader(source) as reader:
+            if reader.sample_rate != sample_rate:
+                raise ValueError(f"{source} is {reader.sample_rate} Hz, the stream runs at {sample_rate} Hz")
+            audio = reader.read(0, reader.frames)
+        if audio.shape[1] == channels:
+            return np.ascontiguousarray(audio, dtype='float32')
+        mono = audio.mean(axis=1)
+    return np.repeat(mono.astype('float32')[:, None], channels, axis=1)
+
+
+class SimulatedStream:
+    """Context manager with the parts of the sounddevice.Stream interface PyPiPedals uses"""
+
+    def __init__(self, samplerate, blocksize, callback, channels=1, dtype="float32",
+                 input_signal=None, loop=True, record=False, loopback=None, drop_late=False, **unused):
+        # **unused swallows device/latency so this is a drop-in for sd.Stream
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.callback = callback
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self.input_signal = None if input_signal is None else np.asarray(input_signal, dtype=self.dtype)
+        self.loop = loop
+        self.record = record
+        self.recorded = []
+        # Round trip of the simulated cable, at least a block: output is only heard once written
+        self.loopback = None if loopback is None else max(int(loopback), blocksize)
+        # (input, output) seconds, as sounddevice reports them; the simulated delay is all on the output
+        self.latency = (0.0, (self.loopback or 0) / samplerate)
+        self.drop_late = drop_late
+        self.deadline = blocksize / samplerate
+        self.callbacks = 0
+        # Deadline accounting: misses, blocks lost to them (drop_late) and callback time
+        self.misses = 0
+        self.dropped = 0
+        self.worst = 0.0
+        self.busy = 0.0
+        self.miss_log = collections.deque(maxlen=MISS_LOG_SIZE)  # (callback, seconds in, duration)
+        self.active = False
+        self._thread = None
+
+    def start(self):
+        self.active = True
+        self._thread = threading.Thread(target=self._run, name="Simulated audio", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.active = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    close = stop
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _next_input(self, indata, position):
+        """Fill indata from the test signal; returns False once a non-looping signal ends"""
+        signal = self.input_signal
+        if signal is None:
+            return True
+        if position >= len(signal) and not self.loop:
+            return False
+        offset = position % len(signal)
+        end = min(offset + self.blocksize, len(signal))
+        count = end - offset
+        indata[:count] = signal[offset:end, None] if signal.ndim == 1 else signal[offset:end]
+        if count < self.blocksize:
+            indata[count:] = 0.0
+        return True
+
+    def _loop_back(self, indata, line, position):
+        """Add the output from `loopback` frames ago to indata, from the delay line"""
+        start = (position - self.loopback) % len(line)
+        count = min(self.blocksize, len(line) - start)
+        indata[:count] += line[start:start + count]
+        indata[count:] += line[:self.blocksize - count]
+
+    def _run(self):
+        frames = self.blocksize
+        indata = np.zeros((frames, self.channels), dtype=self.dtype)
+        outdata = np.zeros((frames, self.channels), dtype=self.dtype)
+        period = frames / self.samplerate
+        position = 0
+        next_time = started = time.perf_counter()
+        status = None
+        line = None
+        if self.loopback is not None:
+            # Whole blocks, so each block's output goes in without wrapping
+            line = np.zeros((-(-(self.loopback + frames) // frames) * frames, self.channels), dtype=self.dtype)
+
+        while self.active:
+            if not self._next_input(indata, position):
+                self.active = False
+                break
+            if line is not None:
+                if self.input_signal is None:
+                    indata.fill(0.0)
+                self._loop_back(indata, line, position)
+            outdata.fill(0.0)
+            start = time.perf_counter()
+            self.callback(indata, outdata, frames, None, status)
+            duration = time.perf_counter() - start
+            self.busy += duration
+            if duration > self.worst:
+                self.worst = duration
+            status = None
+            if duration > self.deadline:
+                # The card would have run out of output: it says so in the next callback
+                self.misses += 1
+                self.miss_log.append((self.callbacks, start - started, duration))
+                status = UNDERFLOW
+            if line is not None:
+                start = position % len(line)
+                line[start:start + frames] = outdata
+            if self.record:
+                self.recorded.append(outdata.copy())
+            self.callbacks += 1
+            position += frames
+
+            # Sleep until the next block is due; if we're late, carry straight on
+            next_time += period
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif self.drop_late and delay < -period:
+                # Whole blocks whose time has passed are gone, as on a sound card
+                lost = int(-delay / period)
+                self.dropped += lost
+                status = UNDERFLOW
+                position += lost * frames
+                next_time += lost * period
+
+    def format_summary(self, misses=5):
+        """Deadline misses so far, with the last few of them"""
+        if not self.callbacks:
+            return "Simulated stream: no callbacks yet"
+        deadline = self.deadline * 1e3
+        lines = [f"Simulated stream: {self.callbacks} callbacks, {self.misses} over the {deadline:.2f} ms deadline "
+                 f"({self.misses / self.callbacks:.3%}), {self.dropped} blocks dropped",
+                 f"  callback mean {self.busy / self.callbacks * 1e3:.3f} ms, worst {self.worst * 1e3:.3f} ms"]
+        for callback, at, duration in list(self.miss_log)[-misses:]:
+            lines.append(f"  missed: callback {callback} at {at:.1f}s took {duration * 1e3:.2f} ms")
+        return "\n".join(lines)
+
+    def output(self):
+        """Everything the callback wrote so far, as one (frames, channels) array"""
+        if not self.recorded:
+            return np.zeros((0, self.channels), dtype=self.dtype)
+        return np.concatenate(self.recorded)
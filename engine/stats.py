@@ -0,0 +1,111 @@
+"""
+Callback timing instrumentation
+
+The audio callback is the only writer: it stores one row per callback into
+preallocated numpy arrays and bumps an integer index, so recording takes no
+lock and allocates no arrays. Readers (the Menu thread) take a copy of the
+filled rows and do all the statistics on their own time
+"""
+import time
+import numpy as np
+
+# Status flags counted from the sounddevice CallbackFlags object
+XRUN_FLAGS = ('input_underflow', 'input_overflow', 'output_underflow', 'output_overflow')
+
+
+class CallbackStats:
+    """Ring of per-callback timings, with one timing slot per named stage"""
+
+    def __init__(self, sample_rate, stage_names, capacity=4096):
+        self.sample_rate = sample_rate
+        self.stage_names = list(stage_names)
+        self.capacity = capacity
+
+        self.starts = np.zeros(capacity)
+        self.durations = np.zeros(capacity)
+        self.frames = np.zeros(capacity, dtype=np.int64)
+        self.stage_times = np.zeros((capacity, len(self.stage_names)))
+        self.xruns = dict.fromkeys(XRUN_FLAGS, 0)
+
+        # Total callbacks recorded; the row being written is count % capacity
+        self.count = 0
+        self._start = 0.0
+
+    def begin(self):
+        """Mark the start of a callback"""
+        self._start = time.perf_counter()
+        self.stage_times[self.count % self.capacity].fill(0.0)
+
+    def record_stage(self, index, seconds):
+        """Add time spent in a stage (effect) during the current callback"""
+        self.stage_times[self.count % self.capacity, index] += seconds
+
+    def time_stage(self, index, effect, audio, out, frames):
+        """Run effect.process_into(audio, out, frames) and record how long it took"""
+        start = time.perf_counter()
+        effect.process_into(audio, out, frames)
+        self.stage_times[self.count % self.capacity, index] += time.perf_counter() - start
+
+    def end(self, frames, status=None):
+        """Finish the current callback row and count any xrun flags"""
+        row = self.count % self.capacity
+        self.starts[row] = self._start
+        self.durations[row] = time.perf_counter() - self._start
+        self.frames[row] = frames
+        if status:
+            for flag in XRUN_FLAGS:
+                if getattr(status, flag, False):
+                    self.xruns[flag] += 1
+        self.count += 1
+
+    def snapshot(self):
+        """Copy of the filled rows, oldest first"""
+        count = self.count
+        filled = min(count, self.capacity)
+        order = (np.arange(count - filled, count)) % self.capacity
+        return {
+            'starts': self.starts[order],
+            'durations': self.durations[order],
+            'frames': self.frames[order],
+            'stage_times': self.stage_times[order],
+        }
+
+    def summary(self):
+        """p50/p99 load and timings over the rows currently held, plus xrun totals"""
+        rows = self.snapshot()
+        result = {'callbacks': self.count, 'xruns': dict(self.xruns)}
+        if len(rows['durations']) == 0:
+            return result
+
+        deadlines = rows['frames'] / self.sample_rate
+        load = rows['durations'] / deadlines
+        result.update({
+            'load_p50': float(np.percentile(load, 50)),
+            'load_p99': float(np.percentile(load, 99)),
+            'load_max': float(load.max()),
+            'overruns': int((load > 1.0).sum()),
+            'stages': {
+                name: {
+                    'p50_us': float(np.percentile(rows['stage_times'][:, i], 50) * 1e6),
+                    'p99_us': float(np.percentile(rows['stage_times'][:, i], 99) * 1e6),
+                }
+                for i, name in enumerate(self.stage_names)
+            },
+        })
+        return result
+
+    def format_summary(self):
+        """Human readable summary for the Menu"""
+        s = self.summary()
+        xruns = ", ".join(f"{flag} {n}" for flag, n in s['xruns'].items())
+        if 'load_p50' not in s:
+            return f"No callbacks recorded yet\nxruns: {xruns}"
+        lines = [
+            f"callbacks: {s['callbacks']}  overruns: {s['overruns']}",
+            f"load p50 {s['load_p50']:.1%}  p99 {s['load_p99']:.1%}  max {s['load_max']:.1%}",
+            f"xruns: {xruns}",
+        ]
+        for name, t in s['stages'].items():
+            if t['p99_us'] > 0:
+                lines.append(f"    {name:<12} p50 {t['p50_us']:8.1f} us  p99 {t['p99_us']:8.1f} us")
+        return "\n".join(lines)
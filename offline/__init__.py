@@ -0,0 +1,3 @@
+from wavfile import WavReader, WavWriter
+
+__all__ = ['WavReader', 'WavWriter']
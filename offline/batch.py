@@ -0,0 +1,188 @@
+"""
+Batch renderer: push many files through the same effect chain on a process pool
+
+    python -m offline.batch preset.json stems/ rendered/
+    python -m offline.batch preset.json stems.txt rendered/ --workers 1 2 4
+
+The preset is JSON naming the effects in chain order, each with optional
+parameter overrides:
+
+    {"effects": ["Echo", {"name": "Gain", "params": {"drive": 8.0, "curve": "tube"}}]}
+
+Inputs are every .wav file in a directory, or a manifest listing one path per
+line (relative to the manifest, # for comments). Every worker process builds
+its own chain, resets it between files and streams each file through it in
+fixed-size chunks, so a worker's memory stays bounded however long the files
+are. Given several worker counts, the whole batch is rendered once per count
+to compare throughput
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config import SAMPLE_RATE
+from effects.presets import load_preset, build_preset_chain
+from wavfile import WavReader, WavWriter
+from .render import DEFAULT_CHUNK_SIZE, render_stream
+
+try:
+    import resource
+except ImportError:  # Not on Windows
+    resource = None
+
+# Set up in each worker process by _init_worker
+_worker = {}
+
+
+def find_inputs(source):
+    """Input WAV paths from a directory or a manifest file"""
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(source, name) for name in os.listdir(source)
+            if name.lower().endswith('.wav')
+        )
+    base = os.path.dirname(source)
+    with open(source) as f:
+        lines = (line.strip() for line in f)
+        return [os.path.join(base, line) for line in lines if line and not line.startswith('#')]
+
+
+def output_paths(inputs, output_dir):
+    """One output per input, same file name, in output_dir"""
+    outputs = [os.path.join(output_dir, os.path.basename(path)) for path in inputs]
+    seen = {}
+    for path, output in zip(inputs, outputs):
+        if output in seen:
+            raise ValueError(f"{seen[output]} and {path} would both be written to {output}")
+        seen[output] = path
+    return outputs
+
+
+def _init_worker(preset, chunk_size, sample_format):
+    _worker.update(preset=preset, chunk_size=chunk_size, sample_format=sample_format, chains={})
+
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _render_one(input_path, output_path):
+    """Worker side: render one file with this worker's chain for its sample rate"""
+    start = time.perf_counter()
+    with WavReader(input_path) as reader:
+        chains = _worker['chains']
+        chain = chains.get(reader.sample_rate)
+        if chain is None:
+            chain = chains[reader.sample_rate] = build_preset_chain(_worker['preset'], reader.sample_rate)
+        else:
+            # Don't let the previous file's echo and reverb tails into this one
+            chain.reset()
+        with WavWriter(output_path, reader.sample_rate, reader.channels, _worker['sample_format']) as writer:
+            frames = render_stream(reader, writer, chain, chunk_size=_worker['chunk_size'], channel=None)
+        audio_seconds = frames / reader.sample_rate
+    return {
+        'input': input_path,
+        'output': output_path,
+        'audio_seconds': audio_seconds,
+        'wall_seconds': time.perf_counter() - start,
+        'worker': os.getpid(),
+        'max_rss_mb': _max_rss_mb(),
+    }
+
+
+def render_batch(preset, inputs, output_dir, workers, chunk_size=DEFAULT_CHUNK_SIZE,
+                 sample_format='float32', progress=None):
+    """
+    Render every input through the preset's chain with `workers` processes
+
+    Returns totals plus per-file results; a file that fails is listed under
+    'failed' with its error and doesn't stop the others. `progress` is called
+    with each file's result as it finishes
+    """
+    # Catch bad presets here rather than once per worker
+    build_preset_chain(preset, SAMPLE_RATE)
+    outputs = output_paths(inputs, output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Longest files first, so one long file doesn't start last and run alone
+    jobs = sorted(zip(inputs, outputs), key=lambda job: os.path.getsize(job[0]), reverse=True)
+
+    results, failed = [], []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(preset, chunk_size, sample_format)) as pool:
+        futures = {pool.submit(_render_one, *job): job[0] for job in jobs}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as error:
+                failed.append({'input': futures[future], 'error': str(error)})
+                continue
+            results.append(result)
+            if progress is not None:
+                progress(result)
+    wall_seconds = time.perf_counter() - start
+
+    audio_seconds = sum(r['audio_seconds'] for r in results)
+    peaks = {}
+    for r in results:
+        if r['max_rss_mb'] is not None:
+            peaks[r['worker']] = max(peaks.get(r['worker'], 0.0), r['max_rss_mb'])
+    return {
+        'workers': workers,
+        'files': len(results),
+        'failed': failed,
+        'audio_seconds': audio_seconds,
+        'wall_seconds': wall_seconds,
+        'throughput': audio_seconds / wall_seconds if wall_seconds > 0 else float('inf'),
+        'max_worker_rss_mb': max(peaks.values()) if peaks else None,
+        'results': results,
+    }
+
+
+def format_stats(stats, baseline=None):
+    """One report line; `baseline` is a run with fewer workers to show the speedup against"""
+    line = (f"{stats['workers']:>3} workers: {stats['files']} files, {stats['audio_seconds']:.1f}s of audio "
+            f"in {stats['wall_seconds']:.2f}s = {stats['throughput']:.1f} audio-s per wall-s")
+    if baseline is not None:
+        line += f" ({stats['throughput'] / baseline['throughput']:.2f}x)"
+    if stats['max_worker_rss_mb'] is not None:
+        line += f", worker peak RSS {stats['max_worker_rss_mb']:.0f} MB"
+    return line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render many WAV files through one effect chain preset")
+    parser.add_argument('preset', help="chain preset JSON")
+    parser.add_argument('inputs', help="directory of WAV files, or a manifest listing one per line")
+    parser.add_argument('output_dir', help="where rendered files go, under the same names")
+    parser.add_argument('--workers', type=int, nargs='+', default=[os.cpu_count() or 1],
+                        help="worker processes; give several to compare throughput")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="frames per block")
+    parser.add_argument('--pcm16', action='store_true', help="write 16-bit PCM instead of float32")
+    parser.add_argument('--verbose', action='store_true', help="print every file as it finishes")
+    args = parser.parse_args(argv)
+
+    preset = load_preset(args.preset)
+    inputs = find_inputs(args.inputs)
+    if not inputs:
+        parser.error(f"no WAV files found in {args.inputs}")
+
+    def progress(result):
+        print(f"  {result['output']}: {result['audio_seconds']:.1f}s in {result['wall_seconds']:.2f}s")
+
+    baseline = None
+    for workers in args.workers:
+        stats = render_batch(preset, inputs, args.output_dir, workers, args.chunk_size,
+                             'pcm16' if args.pcm16 else 'float32', progress if args.verbose else None)
+        print(format_stats(stats, baseline))
+        for failure in stats['failed']:
+            print(f"  FAILED {failure['input']}: {failure['error']}")
+        baseline = baseline or stats
+
+
+if __name__ == "__main__":
+    main()
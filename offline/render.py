@@ -0,0 +1,124 @@
+"""
+Offline renderer: stream a WAV file through an EffectChain, no audio device needed
+
+    python -m offline.render in.wav out.wav --effects Echo Reverb
+    python -m offline.render in.wav out.wav --effects WahWah \\
+        --looper-event 2.0:start_recording --looper-event 10.0:stop_recording
+"""
+import argparse
+import time
+from effects import Looper
+from effects.presets import build_chain
+from effects.registry import effect_names as registered_effects
+from wavfile import WavReader, WavWriter
+
+DEFAULT_CHUNK_SIZE = 65536  # frames per process() call
+
+LOOPER_COMMANDS = ('start_recording', 'stop_recording', 'stop_playback', 'toggle_playback', 'clear_loop')
+
+
+def render_stream(reader, writer, chain, looper=None, looper_events=None, chunk_size=DEFAULT_CHUNK_SIZE, channel=0):
+    """
+    Process every frame of `reader` into `writer`
+
+    Looper events are (seconds, command) pairs. The chain always gets whole
+    chunks; only the looper's part of a chunk is split at each event, so
+    commands land on the exact sample, as they would between callbacks,
+    and effects that work in fixed-size pieces see the same blocks either way
+    With channel=None every channel is processed, as one (frames, channels) block
+    """
+    events = sorted(
+        (int(round(seconds * reader.sample_rate)), command)
+        for seconds, command in (looper_events or [])
+    )
+
+    pos = 0
+    while pos < reader.frames:
+        end = min(pos + chunk_size, reader.frames)
+        frames = end - pos
+
+        audio = reader.read(pos, frames)
+        if channel is not None:
+            audio = audio[:, channel]
+        out = chain.process(audio, frames)
+        if looper is None:
+            writer.write(out)
+        else:
+            start = pos
+            while start < end:
+                while events and events[0][0] <= start:
+                    getattr(looper, events.pop(0)[1])()
+                stop = min(end, events[0][0]) if events else end
+                writer.write(looper.process(out[start - pos:stop - pos], stop - start))
+                start = stop
+        pos = end
+
+    return pos
+
+
+def render_file(input_path, output_path, effect_names, chunk_size=DEFAULT_CHUNK_SIZE,
+                looper_events=None, sample_format='float32', channel=0):
+    """
+    Render one file and return timing stats
+
+    The input is memory-mapped, so memory use is bounded by `chunk_size`
+    rather than the length of the file
+    """
+    for _, command in looper_events or []:
+        if command not in LOOPER_COMMANDS:
+            raise ValueError(f"Unknown looper command '{command}'")
+
+    start = time.perf_counter()
+    with WavReader(input_path) as reader:
+        if not 0 <= channel < reader.channels:
+            raise ValueError(f"{input_path} has no channel {channel}")
+        chain = build_chain(effect_names, reader.sample_rate)
+        looper = Looper(reader.sample_rate) if looper_events else None
+
+        with WavWriter(output_path, reader.sample_rate, 1, sample_format) as writer:
+            frames = render_stream(reader, writer, chain, looper, looper_events, chunk_size, channel)
+        sample_rate = reader.sample_rate
+    wall_seconds = time.perf_counter() - start
+
+    audio_seconds = frames / sample_rate
+    return {
+        'frames': frames,
+        'audio_seconds': audio_seconds,
+        'wall_seconds': wall_seconds,
+        'realtime_factor': audio_seconds / wall_seconds if wall_seconds > 0 else float('inf'),
+    }
+
+
+def parse_looper_event(text):
+    seconds, _, command = text.partition(':')
+    if command not in LOOPER_COMMANDS:
+        raise argparse.ArgumentTypeError(f"command must be one of: {', '.join(LOOPER_COMMANDS)}")
+    return float(seconds), command
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render a WAV file through PyPiPedals effects offline")
+    parser.add_argument('input', help="input WAV file")
+    parser.add_argument('output', help="output WAV file (mono)")
+    parser.add_argument('--effects', nargs='+', default=[], metavar='EFFECT',
+                        help=f"effects in chain order: {', '.join(registered_effects())}")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="frames per block")
+    parser.add_argument('--channel', type=int, default=0, help="input channel to process")
+    parser.add_argument('--pcm16', action='store_true', help="write 16-bit PCM instead of float32")
+    parser.add_argument('--looper-event', type=parse_looper_event, action='append', default=[],
+                        metavar='SECONDS:COMMAND', help=f"looper command at a time, one of: {', '.join(LOOPER_COMMANDS)}")
+    args = parser.parse_args(argv)
+
+    stats = render_file(
+        args.input, args.output, args.effects,
+        chunk_size=args.chunk_size,
+        looper_events=args.looper_event,
+        sample_format='pcm16' if args.pcm16 else 'float32',
+        channel=args.channel,
+    )
+    print(f"Rendered {stats['audio_seconds']:.1f}s of audio in {stats['wall_seconds']:.2f}s "
+          f"({stats['realtime_factor']:.1f}x real time)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Minimal WAV reading/writing, for offline rendering, recording and the looper's files
+
+Reading memory-maps the data chunk, so only the frames being processed are
+paged in, however long the file is. Writing streams blocks straight to disk
+and fills in the RIFF sizes on close
+"""
+import struct
+import numpy as np
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# (format tag, bits per sample) -> numpy dtype of one sample on disk
+_DTYPES = {
+    (WAVE_FORMAT_PCM, 16): np.dtype('<i2'),
+    (WAVE_FORMAT_PCM, 32): np.dtype('<i4'),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype('<f4'),
+    (WAVE_FORMAT_IEEE_FLOAT, 64): np.dtype('<f8'),
+}
+
+
+class WavReader:
+    """Memory-mapped WAV file, read as float32 blocks of shape (frames, channels)"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            riff, _, wave = struct.unpack('<4sI4s', f.read(12))
+            if riff != b'RIFF' or wave != b'WAVE':
+                raise ValueError(f"{path} is not a RIFF/WAVE file")
+
+            fmt = None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    raise ValueError(f"{path} has no data chunk")
+                chunk_id, chunk_size = struct.unpack('<4sI', header)
+                if chunk_id == b'fmt ':
+                    fmt = f.read(chunk_size)
+                elif chunk_id == b'data':
+                    data_offset = f.tell()
+                    data_size = chunk_size
+                    break
+                else:
+                    f.seek(chunk_size, 1)
+                # Chunks are padded to an even length
+                if chunk_size % 2:
+                    f.seek(1, 1)
+
+        if fmt is None:
+            raise ValueError(f"{path} has no fmt chunk")
+
+        format_tag, self.channels, self.sample_rate, _, _, self.bits = struct.unpack('<HHIIHH', fmt[:16])
+        if format_tag == WAVE_FORMAT_EXTENSIBLE:
+            # Real format tag is the first two bytes of the SubFormat GUID
+            format_tag = struct.unpack('<H', fmt[24:26])[0]
+
+        frame_bytes = self.channels * self.bits // 8
+        # Some writers leave the data size at 0 or 0xFFFFFFFF when streaming
+        file_size = self._file_size(path)
+        if data_size in (0, 0xFFFFFFFF) or data_offset + data_size > file_size:
+            data_size = file_size - data_offset
+        self.frames = data_size // frame_bytes
+        self.data_offset = data_offset
+        self.format_tag = format_tag
+
+        if format_tag == WAVE_FORMAT_PCM and self.bits == 24:
+            # No 24-bit numpy type: map raw bytes and widen each block on read
+            self._data = np.memmap(path, dtype=np.uint8, mode='r', offset=data_offset,
+                                   shape=(self.frames, self.channels, 3))
+            self._scale = 1.0 / 2 ** 23
+        elif (format_tag, self.bits) in _DTYPES:
+            dtype = _DTYPES[(format_tag, self.bits)]
+            self._data = np.memmap(path, dtype=dtype, mode='r', offset=data_offset,
+                                   shape=(self.frames, self.channels))
+            self._scale = 1.0 / 2 ** (self.bits - 1) if format_tag == WAVE_FORMAT_PCM else 1.0
+        else:
+            raise ValueError(f"Unsupported WAV format {format_tag} with {self.bits} bits")
+
+    @staticmethod
+    def _file_size(path):
+        with open(path, 'rb') as f:
+            f.seek(0, 2)
+            return f.tell()
+
+    @property
+    def duration(self):
+        return self.frames / self.sample_rate
+
+    def read(self, start, frames):
+        """Read frames [start, start + frames) as float32, shape (frames, channels)"""
+        raw = self._data[start:start + frames]
+        if raw.ndim == 3:
+            # Sign-extend little-endian 24-bit samples into int32
+            raw = raw.astype(np.int32)
+            raw = raw[..., 0] | (raw[..., 1] << 8) | (raw[..., 2] << 16)
+            raw = np.where(raw >= 1 << 23, raw - (1 << 24), raw)
+        out = raw.astype(np.float32)
+        if self._scale != 1.0:
+            out *= self._scale
+        return out
+
+    def close(self):
+        # Drop the map; numpy closes it once no views remain
+        self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class WavWriter:
+    """Streaming WAV writer, float32 or 16-bit PCM"""
+
+    def __init__(self, path, sample_rate, channels=1, sample_format='float32'):
+        if sample_format not in ('float32', 'pcm16'):
+            raise ValueError(f"Unsupported sample format: {sample_format}")
+        self.path = path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_format = sample_format
+        self.frames = 0
+
+        if sample_format == 'float32':
+            self._format_tag, self._bits = WAVE_FORMAT_IEEE_FLOAT, 32
+        else:
+            self._format_tag, self._bits = WAVE_FORMAT_PCM, 16
+
+        self._file = open(path, 'wb')
+        self._write_header(0)
+
+    def _write_header(self, data_size):
+        block_align = self.channels * self._bits // 8
+        # RIFF sizes are 32-bit: past 4 GB mark the size unknown, readers then use the file size
+        if 36 + data_size > 0xFFFFFFFF:
+            data_size = 0xFFFFFFFF
+        self._file.write(struct.pack(
+            '<4sI4s4sIHHIIHH4sI',
+            b'RIFF', min(36 + data_size, 0xFFFFFFFF), b'WAVE',
+            b'fmt ', 16, self._format_tag, self.channels, self.sample_rate,
+            self.sample_rate * block_align, block_align, self._bits,
+            b'data', data_size,
+        ))
+
+    def write(self, audio):
+        """Append a block, shape (frames,) for mono or (frames, channels)"""
+        audio = np.asarray(audio).reshape(len(audio), self.channels)
+        if self.sample_format == 'float32':
+            data = audio.astype('<f4', copy=False)
+        else:
+            data = (np.clip(audio, -1.0, 1.0) * 32767.0).round().astype('<i2')
+        # Written straight from the array's memory: no bytes copy, however long the block
+        self._file.write(np.ascontiguousarray(data).data)
+        self.frames += len(audio)
+
+    def close(self):
+        if self._file is None:
+            return
+        self._file.seek(0)
+        self._write_header(self.frames * self.channels * self._bits // 8)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()